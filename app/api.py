@@ -1,10 +1,12 @@
 import boto3
 import logging
 import operator
+import time
 import ujson as json
 
 from botocore.client import Config
-from django.db.models import Q, Count, Exists, OuterRef, Case, When, Value, BooleanField
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Q, F, Count, Case, When, Value, BooleanField, Func, FloatField
 from rest_framework.generics import ListAPIView, GenericAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -20,20 +22,26 @@ from django.contrib.auth.hashers import check_password, make_password
 from django.utils import timezone
 from django.db import transaction
 
+from apps.core.api import MapDevicesMixin, MapTileMixin, NearbyDevicesMixin
 from apps.core.data import FULLNESS
-from apps.core.helpers import filter_queryset_by_bounds, filter_queryset_by_fullness
+from apps.core.helpers import (
+    filter_queryset_by_bounds, filter_queryset_by_fullness, get_map_clustering_grid_size, cluster_queryset_by_grid,
+    CompanyDeviceProfile,
+)
 from apps.core.models import City, Country
+from apps.core.renderers import UJSONRenderer
+from apps.core.serializers import CitySerializer
 from app.helpers import validate_user_license
 from app.models import (
-    Container, MobileAppUserLanguage, MobileAppTranslation, ROUTE_POINT_STATUS_NOT_COLLECTED,
-    RoutePoints, ContainerAuthToken, TrashbinJobModel, TrashbinData, EnergyEfficiencyForContainer, Error,
+    Container, MobileAppUserLanguage, MobileAppTranslation, ContainerAuthToken, TrashbinJobModel, TrashbinData,
+    EnergyEfficiencyForContainer,
 )
 from app.tasks import notify_about_trashbin_message, calculate_energy_efficiency
 from apps.trashbins.models import CompanyTrashbinsLicense
 from apps.trashbins.trashbin_data_parsing import is_trashbin_data_with_satellites, parse_trashbin_data_packet
-from apps.trashbins.tasks import generate_trashbin_status_notifications
+from apps.trashbins.tasks import schedule_trashbin_status_notifications
 from app.serializers import (
-    ContainerSerializer, CitySerializer, ApiAuthTokenSerializer, MobileAppTranslationSerializer,
+    ContainerMapSerializer, ContainerNearbySerializer, ApiAuthTokenSerializer, MobileAppTranslationSerializer,
 )
 from app.authentication import token_is_expired
 from app.permissions import IsContainerAuthenticated
@@ -42,52 +50,71 @@ from app.permissions import IsContainerAuthenticated
 logger = logging.getLogger('app_main')
 
 
-class ContainerListAPIView(GenericAPIView):
-    serializer_class = ContainerSerializer
+class ContainerListAPIView(MapDevicesMixin, GenericAPIView):
+    renderer_classes = (UJSONRenderer,)
+    map_layer_name = 'containers'
+    device_type = CompanyDeviceProfile.TRASHBIN
 
     def get(self, request):
+        return self.get_conditional_map_response(self.build_map_response)
+
+    def build_map_response(self):
+        cursor = time.time()
+        grid_size = get_map_clustering_grid_size(self.request.query_params.get('zoom', None))
+        if grid_size is not None:
+            clusters = cluster_queryset_by_grid(
+                self.filter_queryset(self.get_base_queryset()), grid_size,
+                errors_count=Count('pk', filter=Q(has_active_errors=True)),
+                low_battery_count=Count('pk', filter=Q(
+                    battery__lte=settings.LOW_BATTERY_STATUS_ICON_LEVEL_THRESHOLD, is_master=True)))
+            return Response({'containers': [], 'stations': [], 'clusters': clusters, 'cursor': cursor, 'full': True})
+
+        since = self.get_changes_since()
         containers_queryset = self.filter_queryset(self.get_queryset())
-        satellites_ids = list(containers_queryset.filter(is_master=False).values('id', 'master_bin_id'))
-        master_ids = list(containers_queryset.filter(satellites_count__gt=0).values_list('id', flat=True))
-        all_master_ids = list(set(master_ids + [p['master_bin_id'] for p in satellites_ids]))
-        all_stations = Container.objects.filter(id__in=all_master_ids).prefetch_related('satellites')
-        result_stations = []
-        for station in all_stations:
-            # Usage of station.satellites.all() is important here to actually hit the cache set up with prefetch_related
-            station_satellites = [satellite.id for satellite in station.satellites.all()]
-            result_station = {
-                'location': {'x': station.location.x, 'y': station.location.y},
-                'master': station.id,
-                'satellites': station_satellites,
-            }
-            result_stations.append(result_station)
-
-        serializer = self.get_serializer(containers_queryset, many=True)
-        return Response({'containers': serializer.data, 'stations': result_stations})
+        if since is not None:
+            containers_queryset = containers_queryset.filter(mtime__gt=since)
+        containers = ContainerMapSerializer(containers_queryset).data
+        master_ids = {c['id'] for c in containers if c['satellites_count'] > 0} | \
+            {c['master_bin_id'] for c in containers if not c['is_master'] and c['master_bin_id'] is not None}
+        stations_queryset = Container.objects.filter(master_bin_id__in=master_ids)\
+            .values('master_bin_id')\
+            .annotate(
+                satellites=ArrayAgg('id', ordering='id'),
+                location_x=Func('master_bin__location', function='ST_X', output_field=FloatField()),
+                location_y=Func('master_bin__location', function='ST_Y', output_field=FloatField()))\
+            .order_by('master_bin_id')
+        result_stations = [{
+            'location': {'x': station['location_x'], 'y': station['location_y']},
+            'master': station['master_bin_id'],
+            'satellites': station['satellites'],
+        } for station in stations_queryset]
+
+        result = {'containers': containers, 'stations': result_stations, 'cursor': cursor, 'full': since is None}
+        if since is not None:
+            changed_ids = self.scope_queryset(self.get_base_queryset()).filter(mtime__gt=since)\
+                .values_list('id', flat=True)
+            result['removed'] = self.get_removed_ids(since, changed_ids, [c['id'] for c in containers])
+        return Response(result)
+
+    def get_base_queryset(self):
+        if not self.has_map_access():
+            return Container.objects.none()
+        return Container.objects.all()
 
     def get_queryset(self):
-        if not (self.request.uac.is_superadmin or (
-                self.request.uac.has_per_company_access and self.request.uac.company)):
-            base_qs = Container.objects.none()
-        else:
-            base_qs = Container.objects.select_related('city', 'sector')
-        not_collected_route_points = RoutePoints.objects.filter(
-            container=OuterRef('pk'), status=ROUTE_POINT_STATUS_NOT_COLLECTED)
-        active_errors = Error.objects.filter(container=OuterRef('pk'), actual=1)
-        return base_qs.annotate(
-            satellites_count=Count('satellites'),
-            any_active_routes=Exists(not_collected_route_points),
+        # Route & error flags are denormalized into the container, see refresh_devices_map_flags()
+        return self.get_base_queryset().annotate(
+            any_active_routes=F('on_active_route'),
             low_battery_level=Case(
                 When(
                     Q(battery__lte=settings.LOW_BATTERY_STATUS_ICON_LEVEL_THRESHOLD) & Q(is_master=True),
                     then=Value(True)),
                 default=Value(False),
                 output_field=BooleanField()),
-            any_active_errors=Exists(active_errors))
+            any_active_errors=F('has_active_errors'))
 
     def filter_queryset(self, queryset):
-        if self.request.uac.company:
-            queryset = queryset.filter(company=self.request.uac.company)
+        queryset = self.scope_queryset(queryset)
 
         params = self.request.query_params
 
@@ -120,6 +147,23 @@ class ContainerListAPIView(GenericAPIView):
         return filter_queryset_by_bounds(queryset, bounds)
 
 
+class ContainerTileAPIView(MapTileMixin, ContainerListAPIView):
+    tile_fields = (
+        'id', 'serial_number', 'fullness', 'battery', 'is_master', 'master_bin_id', 'satellites_count',
+        'any_active_routes', 'low_battery_level', 'any_active_errors',
+    )
+
+    def get(self, request, z, x, y):
+        return self.get_tile(request, z, x, y)
+
+
+class ContainerNearbyAPIView(NearbyDevicesMixin, ContainerListAPIView):
+    nearby_serializer_class = ContainerNearbySerializer
+
+    def get(self, request):
+        return self.get_nearby(request)
+
+
 class CitiesListAPIView(ListAPIView):
     serializer_class = CitySerializer
 
@@ -230,7 +274,7 @@ def get_trashbin_auth_token(request):
     else:
         def password_setter(raw_password):
             container.password = make_password(raw_password)
-            container.save(update_fields=['password'])
+            container.save(update_fields=['password', 'mtime'])
         if not check_password(password, container.password, password_setter):
             container = None
     if container is not None:
@@ -319,7 +363,7 @@ class TrashbinDataView(APIView):
                 trashbin_data = TrashbinData.objects.create(trashbin=request.user, data_json=json_data)
                 parse_trashbin_data_packet(json_data, trashbin.id)
             notify_about_trashbin_message.delay(trashbin_data.id)
-            generate_trashbin_status_notifications.delay(trashbin.id)
+            schedule_trashbin_status_notifications(trashbin.id)
             return Response({}, status=status.HTTP_200_OK)
         except Exception as e:
             logger.exception('%s (%s)' % (str(e), type(e)))
@@ -1,24 +1,30 @@
+import asyncio
 import ujson as json
 import logging
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from channels.generic.websocket import WebsocketConsumer
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
 from rest_framework.authtoken.models import Token
-from asgiref.sync import async_to_sync
 from channels.auth import login, logout
 from datetime import datetime
 from push_notifications.models import GCMDevice
+from redis.exceptions import RedisError
 
-from apps.core.tasks import NotificationPriorities, notification_levels_resolver, create_notification
+from apps.core.middleware import UserAccessControl
+from apps.core.tasks import (
+    NotificationPriorities, notification_levels_resolver, create_notifications_bulk, get_device_state_group_name,
+    get_notifications_group_name, get_unread_notifications_count, get_driver_group_name, get_driver_command_id,
+)
 from app.models import (
-    Route, RoutesDrivers, RoutePoints, Routes,
+    Route, RoutesDrivers, RoutePoints, Routes, refresh_devices_map_flags, split_route_points_devices,
     ROUTE_STATUS_STARTED_BY_USER, ROUTE_STATUS_ABORTED_BY_USER, ROUTE_STATUS_MOVING_HOME, ROUTE_STATUS_COMPLETE_BY_USER,
     ROUTE_POINT_STATUS_COLLECTED, ROUTE_POINT_STATUS_ERROR,
 )
 from app.helpers import send_push, validate_user_license
-from app.redis_client import RedisClient
+from app.redis_client import RedisClient, AsyncRedisClient
 from app.shared import RouteNotificationTypes
 
 
@@ -37,73 +43,80 @@ def _validate_auth_token(token_value):
     return token if validation_result is None or validation_result else None
 
 
-class MobileApiConsumer(WebsocketConsumer):
+class MobileApiConsumer(AsyncWebsocketConsumer):
+    """Commands are handled by the sync methods, each of them is run in the thread pool as a whole."""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.redis_client = RedisClient()
+        self.redis_client = AsyncRedisClient()
+        self.driver_id = None
+        self.presence_refresh = None
 
-    def connect(self):
+    async def connect(self):
         if 'token' not in self.scope['url_route']['kwargs']:
             return
 
-        token = _validate_auth_token(self.scope['url_route']['kwargs']['token'])
+        token = await database_sync_to_async(_validate_auth_token)(self.scope['url_route']['kwargs']['token'])
         if token is None:
             return
 
-        async_to_sync(login)(self.scope, token.user)
-        self.scope["session"].save()
+        await login(self.scope, token.user)
+        await database_sync_to_async(self.scope["session"].save)()
+        self.driver_id = token.user.id
 
-        async_to_sync(self.channel_layer.group_add)(settings.MOBILE_API_CONSUMERS_GROUP_NAME, self.channel_name)
+        await self.channel_layer.group_add(get_driver_group_name(self.driver_id), self.channel_name)
 
-        self.accept()
+        await self.accept()
 
-        self.redis_client.mark_driver_online(token.user.id)
-        route_to_send = self.redis_client.get_route_to_send(token.user.id)
-        if route_to_send is not None:
-            self.send(route_to_send)
-            self.redis_client.clear_route_to_send(token.user.id)
+        pending_commands = await self.redis_client.mark_driver_online(self.driver_id, self.channel_name)
+        self.presence_refresh = asyncio.ensure_future(self._refresh_presence())
+        for command in pending_commands:
+            await self.send(command)
 
-    def disconnect(self, close_code):
-        session_user_id = self._get_session_user().id
-        async_to_sync(self.channel_layer.group_discard)(settings.MOBILE_API_CONSUMERS_GROUP_NAME, self.channel_name)
-        if session_user_id is not None:
-            self.redis_client.mark_driver_offline(session_user_id)
-            async_to_sync(logout)(self.scope)
+    async def disconnect(self, close_code):
+        if self.driver_id is not None:
+            await self.channel_layer.group_discard(get_driver_group_name(self.driver_id), self.channel_name)
+            await logout(self.scope)
+            # Presence is missing if marking the driver online failed on connect
+            if self.presence_refresh is not None:
+                self.presence_refresh.cancel()
+                await self.redis_client.mark_driver_offline(self.driver_id, self.channel_name)
+
+    async def _refresh_presence(self):
+        while True:
+            await asyncio.sleep(settings.ONLINE_MOBILE_USERS_TTL_SECONDS / 3)
+            try:
+                await self.redis_client.refresh_driver_online(self.driver_id, self.channel_name)
+            except Exception:
+                logger.exception(f'Failed to refresh presence of driver with ID {self.driver_id}')
 
-    def receive(self, text_data=None, bytes_data=None):
+    async def receive(self, text_data=None, bytes_data=None):
         try:
             payload = json.loads(text_data)
             cmd_method_name = f"_cmd_{payload['action']}" if 'action' in payload else None
             if hasattr(self, cmd_method_name):
-                getattr(self, cmd_method_name)(payload)
+                cmd_method = getattr(self, cmd_method_name)
+                if asyncio.iscoroutinefunction(cmd_method):
+                    await cmd_method(payload)
+                else:
+                    await database_sync_to_async(cmd_method)(payload)
             else:
                 logger.warning(f'Unexpected JSON payload received: "{str(payload)}"')
         except Exception:
             logger.exception(f'Failure on receive, payload is: "{text_data}"')
-            self.close()
-
-    def new_route(self, event):
-        session_user = self._get_session_user()
-        if session_user.id != event['driver_id']:
-            return
+            await self.close()
 
+    async def driver_command(self, event):
+        # Command is left queued to be replayed on the next connect until acknowledged
         try:
-            self.send(event['command'])
-            self.redis_client.clear_route_to_send(session_user.id)
+            await self.send(event['command'])
         except Exception as e:
-            logger.warning(f'Failed to send route to "{str(session_user)}": {type(e).__name__} - {str(e)}')
-            self.redis_client.set_route_to_send(session_user.id, event['command'])
-            send_push(session_user.id, settings.NEW_ROUTE_PUSH_MESSAGE_CODE)
-
-    def abort_route(self, event):
-        session_user = self._get_session_user()
-        if session_user.id != event['driver_id']:
-            return
+            logger.warning(f'Failed to send {event["action"]} command to "{self.scope["user"]}": '
+                           f'{type(e).__name__} - {str(e)}')
+            if event['action'] == 'new_route':
+                await database_sync_to_async(send_push)(self.driver_id, settings.NEW_ROUTE_PUSH_MESSAGE_CODE)
 
-        try:
-            self.send(event['command'])
-        except Exception as e:
-            logger.warning(f'Failed to abort route for "{str(session_user)}": {type(e).__name__} - {str(e)}')
+    async def _cmd_ack(self, msg):
+        await self.redis_client.ack_driver_command(self.driver_id, msg['command_id'])
 
     def _cmd_start_route(self, msg):
         route = Route.objects.get(pk=msg['route_id'])
@@ -113,6 +126,7 @@ class MobileApiConsumer(WebsocketConsumer):
 
         route.status = ROUTE_STATUS_STARTED_BY_USER
         route.save()
+        self._drop_route_commands(route.id, ('new_route',))
         try:
             existing_driver = RoutesDrivers.objects.get(
                 driver_id=session_user_id, route=route, base_route=route.parent_route,
@@ -129,9 +143,9 @@ class MobileApiConsumer(WebsocketConsumer):
         route = self._close_route_and_update_status(msg['route_id'], ROUTE_STATUS_ABORTED_BY_USER)
         recipients = self._get_route_notification_recipients(route)
         if recipients:
-            create_notification(
-                route, recipient=recipients, verb=RouteNotificationTypes.ROUTE_ABORTED_BY_USER.value,
-                level=notification_levels_resolver[NotificationPriorities.MEDIUM].value)
+            create_notifications_bulk(
+                route, recipients, RouteNotificationTypes.ROUTE_ABORTED_BY_USER.value,
+                notification_levels_resolver[NotificationPriorities.MEDIUM].value)
 
     def _cmd_collection(self, msg):
         route_id = msg['route_id']
@@ -141,14 +155,15 @@ class MobileApiConsumer(WebsocketConsumer):
             filter(user_id=driver_id, route_id=route_id). \
             filter(Q(container_id=msg['container_id']) | Q(sensor_id=msg['container_id']))
         points_qs.update(status=point_status, mtime=datetime.now(), comment=msg['comment'], fullness=msg['fullness'])
+        refresh_devices_map_flags(*split_route_points_devices(points_qs.values_list('container_id', 'sensor_id')))
         self._update_route_track(route_id, msg['track'] if 'track' in msg else 0)
         if point_status == ROUTE_POINT_STATUS_ERROR and points_qs.count() > 0:
             route_point = points_qs.first()
             recipients = self._get_route_notification_recipients(route_point.route)
             if recipients:
-                create_notification(
-                    route_point, recipient=recipients, verb=RouteNotificationTypes.ROUTE_POINT_COLLECTION_ISSUE.value,
-                    level=notification_levels_resolver[NotificationPriorities.MEDIUM].value)
+                create_notifications_bulk(
+                    route_point, recipients, RouteNotificationTypes.ROUTE_POINT_COLLECTION_ISSUE.value,
+                    notification_levels_resolver[NotificationPriorities.MEDIUM].value)
 
     def _cmd_moving_home(self, msg):
         route_id = msg['route_id']
@@ -161,9 +176,9 @@ class MobileApiConsumer(WebsocketConsumer):
         self._update_route_track(route_id, msg['track'] if 'track' in msg else 0, True)
         recipients = self._get_route_notification_recipients(route)
         if recipients:
-            create_notification(
-                route, recipient=recipients, verb=RouteNotificationTypes.ROUTE_COMPLETED.value,
-                level=notification_levels_resolver[NotificationPriorities.LOW].value)
+            create_notifications_bulk(
+                route, recipients, RouteNotificationTypes.ROUTE_COMPLETED.value,
+                notification_levels_resolver[NotificationPriorities.LOW].value)
 
     def _cmd_update_token(self, msg):
         user = self._get_session_user()
@@ -193,8 +208,18 @@ class MobileApiConsumer(WebsocketConsumer):
         route = Route.objects.get(pk=route_id)
         route.status = status
         route.save()
+        self._drop_route_commands(route.id, ('new_route', 'abort_route'))
         return route
 
+    def _drop_route_commands(self, route_id, actions):
+        # Commands left unacknowledged for the route handled by the driver shouldn't be replayed on reconnects
+        driver_id = self._get_session_user().id
+        command_ids = [get_driver_command_id(action, route_id) for action in actions]
+        try:
+            RedisClient().drop_driver_commands(driver_id, command_ids)
+        except RedisError:
+            logger.warning(f'Failed to drop commands {command_ids} queued for driver {driver_id}', exc_info=True)
+
     def _update_route_track(self, route_id, track, update_full_track=False):
         route_driver = RoutesDrivers.objects.get(route_id=route_id, driver_id=self._get_session_user().id)
         field_name = 'track_full' if update_full_track else 'track'
@@ -212,32 +237,72 @@ class MobileApiConsumer(WebsocketConsumer):
         return recipients if recipients else None
 
 
-class NotificationsWebsocketConsumer(WebsocketConsumer):
-    def connect(self):
+class NotificationsWebsocketConsumer(AsyncWebsocketConsumer):
+    group_name = None
+
+    async def connect(self):
         if 'token' not in self.scope['url_route']['kwargs']:
             return
 
-        token = _validate_auth_token(self.scope['url_route']['kwargs']['token'])
+        token = await database_sync_to_async(_validate_auth_token)(self.scope['url_route']['kwargs']['token'])
         if token is None:
             return
 
-        async_to_sync(login)(self.scope, token.user)
-        self.scope["session"].save()
-        async_to_sync(self.channel_layer.group_add)(settings.NOTIFICATIONS_CONSUMERS_GROUP_NAME, self.channel_name)
-        self.accept()
+        await login(self.scope, token.user)
+        await database_sync_to_async(self.scope["session"].save)()
+        self.group_name = get_notifications_group_name(token.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
 
-    def disconnect(self, close_code):
-        async_to_sync(self.channel_layer.group_discard)(settings.NOTIFICATIONS_CONSUMERS_GROUP_NAME, self.channel_name)
+    async def disconnect(self, close_code):
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-    def new_notification(self, event):
+    async def new_notification(self, event):
         session_user = self.scope['user']
-        if session_user.id != event['recipient_id']:
-            return
-
+        unread_notifications_count = await database_sync_to_async(get_unread_notifications_count)(session_user.id)
         payload = json.dumps({
-            'unread_notifications_count': session_user.notifications.unread().count(),
+            'unread_notifications_count': unread_notifications_count,
         })
         try:
-            self.send(payload)
+            await self.send(payload)
         except Exception as e:
             logger.warning(f'Failed to notify "{session_user}" about new notification: {type(e).__name__} - {str(e)}')
+
+
+class DeviceStateConsumer(AsyncWebsocketConsumer):
+    """Pushes devices state deltas to live maps, operators are grouped per company."""
+    group_name = None
+
+    @staticmethod
+    @database_sync_to_async
+    def _get_token_group_name(token_value):
+        token = _validate_auth_token(token_value)
+        if token is None:
+            return None
+
+        uac = UserAccessControl(lambda: token.user)
+        if not (uac.is_superadmin or (uac.has_per_company_access and uac.company)):
+            return None
+        return get_device_state_group_name(uac.company_id)
+
+    async def connect(self):
+        if 'token' not in self.scope['url_route']['kwargs']:
+            return
+
+        self.group_name = await self._get_token_group_name(self.scope['url_route']['kwargs']['token'])
+        if self.group_name is None:
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def device_state(self, event):
+        try:
+            await self.send(json.dumps(event['delta']))
+        except Exception as e:
+            logger.warning(f'Failed to push device state: {type(e).__name__} - {str(e)}')
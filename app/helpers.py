@@ -1,41 +1,24 @@
-import logging
-
+from django.db import transaction
 from django.db.models import Q
-from push_notifications.models import GCMDevice
 from django.conf import settings
 
-from app.models import MobileAppUserLanguage, MobileAppTranslation
+from app.redis_client import RedisClient
+from app.tasks import send_queued_pushes
 from apps.sensors.models import CompanySensorsLicense
 from apps.trashbins.models import CompanyTrashbinsLicense
 
 
-logger = logging.getLogger('app_main')
-
-
 def any_routes_in_progress(driver):
     return len(driver.route_set.filter(Q(status=None) | Q(status__in=[0, 1]))) > 0
 
 
 def send_push(user_id, message_code):
-    message = settings.DEFAULT_MESSAGES_BY_CODES[message_code]
-
-    try:
-        user_lang = MobileAppUserLanguage.objects.get(user_id=user_id)
-    except MobileAppUserLanguage.DoesNotExist:
-        user_lang = None
-
-    if user_lang is not None:
-        try:
-            localized_message = MobileAppTranslation.objects.get(string_name=message_code, lang=user_lang.lang)
-            message = localized_message.string_text
-        except MobileAppTranslation.DoesNotExist:
-            pass
-
-    try:
-        device = GCMDevice.objects.get(user_id=user_id)
-        device.send_message(message)
-    except GCMDevice.DoesNotExist:
-        logger.warning(f'FCMDevice for user with ID "{user_id}" does not exist')
+    """Queues the push to be sent once committed, pushes queued meanwhile are sent in a single batch."""
+    def queue():
+        if RedisClient().queue_push(message_code, user_id, settings.PUSH_BATCH_COALESCE_SECONDS):
+            send_queued_pushes.apply_async((message_code,), countdown=settings.PUSH_BATCH_COALESCE_SECONDS)
+
+    transaction.on_commit(queue)
 
 
 def validate_user_license(user):
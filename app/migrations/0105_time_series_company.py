@@ -0,0 +1,145 @@
+# Generated by Django 2.2.17 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_reportjob_reportjobchunk'),
+        ('app', '0104_auto_20201013_1233'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='error',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='fullnessvalues',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='battery_level',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='traffic',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='pressure',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='temperature',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='simbalance',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='humidity',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='airquality',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_error t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_fullness t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_collection t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_battery_level t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_traffic t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_pressure t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_temperature t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_simbalance t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_humidity t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE app_airquality t SET company_id = d.company_id FROM app_container d WHERE t.container_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='error',
+            index=models.Index(fields=['company', 'ctime'], name='app_error_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='fullnessvalues',
+            index=models.Index(fields=['company', 'ctime'], name='app_fullness_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(fields=['company', 'ctime'], name='app_collection_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='battery_level',
+            index=models.Index(fields=['company', 'ctime'], name='app_battery_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='traffic',
+            index=models.Index(fields=['company', 'ctime'], name='app_traffic_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='pressure',
+            index=models.Index(fields=['company', 'ctime'], name='app_pressure_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='temperature',
+            index=models.Index(fields=['company', 'ctime'], name='app_temperature_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='simbalance',
+            index=models.Index(fields=['company', 'ctime'], name='app_simbalance_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='humidity',
+            index=models.Index(fields=['company', 'ctime'], name='app_humidity_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='airquality',
+            index=models.Index(fields=['company', 'ctime'], name='app_airquality_company_ctime'),
+        ),
+    ]
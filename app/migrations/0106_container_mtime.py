@@ -0,0 +1,23 @@
+# Generated by Django 2.2.17 on 2026-10-19 13:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0105_time_series_company'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='mtime',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['company', 'mtime'], name='app_container_company_mtime'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.17 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0106_container_mtime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='container',
+            name='on_active_route',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='has_active_errors',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='container',
+            name='satellites_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE app_container c SET
+                    on_active_route = EXISTS(
+                        SELECT 1 FROM app_routepoints p WHERE p.container_id = c.id AND p.status = 0),
+                    has_active_errors = EXISTS(
+                        SELECT 1 FROM app_error e WHERE e.container_id = c.id AND e.actual = 1),
+                    satellites_count = (SELECT COUNT(*) FROM app_container s WHERE s.master_bin_id = c.id)
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -12,11 +12,14 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.text import capfirst
 from django.utils.translation import ugettext_lazy as _
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, Exists, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 from smart_selects.db_fields import GroupedForeignKey
 
+from apps.core.helpers import CompanyDeviceProfile
 from apps.core.models import Company, Country, City, Sectors, WasteType, validate_lang
-from apps.sensors.models import Sensor
+from apps.sensors.models import Sensor, Error as SensorError, Fullness as SensorFullness
 
 
 class Container(models.Model):
@@ -106,10 +109,18 @@ class Container(models.Model):
         default=timezone.now,
         verbose_name=_('update time'),
     )
+    mtime = models.DateTimeField(default=timezone.now, editable=False)
     autogenerate_data = models.BooleanField(default=False)
     master_bin = models.ForeignKey('self', models.SET_NULL, blank=True, null=True, related_name='satellites')
+    # Map flags denormalized from related tables, see refresh_devices_map_flags()
+    on_active_route = models.BooleanField(default=False, editable=False)
+    has_active_errors = models.BooleanField(default=False, editable=False)
+    satellites_count = models.IntegerField(default=0, editable=False)
     password = models.CharField(_('password'), max_length=128)
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'mtime'], name='app_container_company_mtime')]
+
     def __str__(self):
         return self.serial_number
 
@@ -124,8 +135,9 @@ class Container(models.Model):
         return (self.fullness / 100.0) * self.max_volume
 
     def save(self, *args, **kwargs):
+        self.mtime = timezone.now()
         if self.is_master:
-            self.satellites.update(location=self.location)
+            self.satellites.update(location=self.location, mtime=self.mtime)
         elif self.master_bin:
             self.location = self.master_bin.location
         super().save(*args, **kwargs)
@@ -172,6 +184,14 @@ class Error(models.Model):
         related_name='errors',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     error_type = models.ForeignKey(
         to=ErrorType,
         verbose_name=_('error type'),
@@ -188,6 +208,7 @@ class Error(models.Model):
 
     class Meta:
         ordering = ('ctime',)
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_error_company_ctime')]
 
     def __str__(self):
         return '%s %s %s' % (self.container, self.error_type, self.ctime)
@@ -240,8 +261,12 @@ class Routes(models.Model):
 
     @staticmethod
     def close_parent_routes_if_possible(user_id):
-        routes_drivers_filter = Q(routesdrivers__finish_time__isnull=True) & ~Q(routesdrivers__driver_id=user_id)
-        Routes.objects.filter(finish_time__isnull=True, parent_route__user_id=user_id).\
+        Routes.close_drivers_parent_routes_if_possible([user_id])
+
+    @staticmethod
+    def close_drivers_parent_routes_if_possible(user_ids):
+        routes_drivers_filter = Q(routesdrivers__finish_time__isnull=True) & ~Q(routesdrivers__driver_id__in=user_ids)
+        Routes.objects.filter(finish_time__isnull=True, parent_route__user_id__in=user_ids).\
             annotate(unfinished_other_drivers=Count('routesdrivers__pk', filter=routes_drivers_filter)).\
             filter(unfinished_other_drivers=0).\
             update(finish_time=datetime.datetime.now())
@@ -381,10 +406,16 @@ class RoutePoints(models.Model):
 
     @staticmethod
     def close_route_points(driver_id, close_status, route_id=None):
-        qs = RoutePoints.objects.filter(user_id=driver_id, mtime__isnull=True)
+        RoutePoints.close_drivers_route_points([driver_id], close_status, route_id)
+
+    @staticmethod
+    def close_drivers_route_points(driver_ids, close_status, route_id=None):
+        qs = RoutePoints.objects.filter(user_id__in=driver_ids, mtime__isnull=True)
         if route_id is not None:
             qs = qs.filter(route_id=route_id)
+        affected_devices = list(qs.values_list('container_id', 'sensor_id'))
         qs.update(mtime=datetime.datetime.now(), status=close_status)
+        refresh_devices_map_flags(*split_route_points_devices(affected_devices))
 
     def clean(self):
         super().clean()
@@ -392,6 +423,52 @@ class RoutePoints(models.Model):
             raise ValidationError('Either container or sensor should be specified')
 
 
+def split_route_points_devices(devices):
+    # Route point refers either container or sensor, devices are (container_id, sensor_id) pairs
+    return {c for c, _ in devices if c is not None}, {s for _, s in devices if s is not None}
+
+
+def get_devices_map_flags_expressions():
+    not_collected_points = RoutePoints.objects.filter(status=ROUTE_POINT_STATUS_NOT_COLLECTED)
+    satellites_count = Container.objects.filter(master_bin=OuterRef('pk')).order_by().values('master_bin')\
+        .annotate(count=Count('pk')).values('count')
+    latest_fullness = SensorFullness.objects.filter(sensor=OuterRef('pk'), actual=True).order_by('-ctime')
+    container_flags = {
+        'on_active_route': Exists(not_collected_points.filter(container=OuterRef('pk'))),
+        'has_active_errors': Exists(Error.objects.filter(container=OuterRef('pk'), actual=1)),
+        'satellites_count': Coalesce(Subquery(satellites_count, output_field=IntegerField()), 0),
+    }
+    sensor_flags = {
+        'on_active_route': Exists(not_collected_points.filter(sensor=OuterRef('pk'))),
+        'has_active_errors': Exists(SensorError.objects.filter(sensor=OuterRef('pk'), actual=True)),
+        'latest_data_at': Subquery(latest_fullness.values('ctime')[:1]),
+    }
+    return container_flags, sensor_flags
+
+
+def refresh_devices_map_flags(container_ids=(), sensor_ids=()):
+    from app.redis_client import RedisClient
+    from apps.core.tasks import schedule_device_state_delta
+
+    container_flags, sensor_flags = get_devices_map_flags_expressions()
+    now = timezone.now()
+    company_ids = set()
+    if container_ids:
+        containers_qs = Container.objects.filter(pk__in=container_ids)
+        containers_qs.update(mtime=now, **container_flags)
+        company_ids.update(containers_qs.values_list('company_id', flat=True))
+    if sensor_ids:
+        sensors_qs = Sensor.objects.filter(pk__in=sensor_ids)
+        sensors_qs.update(mtime=now, **sensor_flags)
+        company_ids.update(sensors_qs.values_list('company_id', flat=True))
+    if company_ids:
+        transaction.on_commit(lambda: RedisClient().bump_map_data_version(*company_ids))
+    for container_id in container_ids:
+        schedule_device_state_delta(CompanyDeviceProfile.TRASHBIN.value, container_id)
+    for sensor_id in sensor_ids:
+        schedule_device_state_delta(CompanyDeviceProfile.SENSOR.value, sensor_id)
+
+
 class RoutesDrivers(models.Model):
     base_route = models.ForeignKey(Routes, on_delete=models.CASCADE)
     route = models.ForeignKey(Route, default=None, on_delete=models.CASCADE)
@@ -419,7 +496,11 @@ class RoutesDrivers(models.Model):
 
     @staticmethod
     def finish_routes(driver_id, route_id=None):
-        qs = RoutesDrivers.objects.filter(driver_id=driver_id, finish_time__isnull=True)
+        RoutesDrivers.finish_drivers_routes([driver_id], route_id)
+
+    @staticmethod
+    def finish_drivers_routes(driver_ids, route_id=None):
+        qs = RoutesDrivers.objects.filter(driver_id__in=driver_ids, finish_time__isnull=True)
         if route_id is not None:
             qs = qs.filter(route_id=route_id)
         qs.update(finish_time=datetime.datetime.now(), is_active=False)
@@ -432,6 +513,14 @@ class FullnessValues(models.Model):
         related_name='fullness_table',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     fullness_value = models.IntegerField(default=0)
     location = models.PointField(
@@ -445,6 +534,7 @@ class FullnessValues(models.Model):
 
     class Meta:
         db_table = 'app_fullness'
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_fullness_company_ctime')]
 
 
 class FullnessStats(models.Model):
@@ -473,6 +563,14 @@ class Collection(models.Model):
         verbose_name=_('container'),
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     fullness = models.IntegerField(default=0)
     fullness_before_press = models.IntegerField(default=0, null=True, blank=True)
@@ -492,6 +590,9 @@ class Collection(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_collection_company_ctime')]
+
 
 class Battery_Level(models.Model):
     container = models.ForeignKey(
@@ -499,6 +600,14 @@ class Battery_Level(models.Model):
         verbose_name=_('container'),
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     level = models.IntegerField(default=0)
     volts = models.FloatField(default=0)
@@ -507,6 +616,9 @@ class Battery_Level(models.Model):
         verbose_name=_('actual data'),
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_battery_company_ctime')]
+
 
 class Traffic(models.Model):
     container = models.ForeignKey(
@@ -515,6 +627,14 @@ class Traffic(models.Model):
         related_name='traffic_table',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     traffic_value = models.IntegerField(default=0)
     location = models.PointField(
@@ -526,6 +646,9 @@ class Traffic(models.Model):
         verbose_name=_('actual data'),
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_traffic_company_ctime')]
+
 
 class Pressure(models.Model):
     container = models.ForeignKey(
@@ -534,6 +657,14 @@ class Pressure(models.Model):
         related_name='pressure_table',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     pressure_value = models.IntegerField(default=0)
     location = models.PointField(
@@ -545,6 +676,9 @@ class Pressure(models.Model):
         verbose_name=_('actual data'),
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_pressure_company_ctime')]
+
 
 class Temperature(models.Model):
     container = models.ForeignKey(
@@ -553,6 +687,14 @@ class Temperature(models.Model):
         related_name='temperature_table',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     temperature_value = models.IntegerField(default=0)
     location = models.PointField(
@@ -566,6 +708,7 @@ class Temperature(models.Model):
 
     class Meta:
         ordering = ('ctime',)
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_temperature_company_ctime')]
 
     def __str__(self):
         return '%s %s %s' % (self.container, self.temperature_value, self.ctime)
@@ -578,6 +721,14 @@ class SimBalance(models.Model):
         related_name='sim_balance_table',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     balance = models.IntegerField(default=0)
     actual = models.IntegerField(
@@ -587,6 +738,7 @@ class SimBalance(models.Model):
 
     class Meta:
         ordering = ('ctime',)
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_simbalance_company_ctime')]
 
     def __str__(self):
         return '%s %s %s' % (self.container, self.balance, self.ctime)
@@ -623,6 +775,14 @@ class Humidity(models.Model):
         related_name='humidity_table',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     humidity_value = models.IntegerField(default=0)
     location = models.PointField(
@@ -634,6 +794,9 @@ class Humidity(models.Model):
         verbose_name=_('actual data'),
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_humidity_company_ctime')]
+
 
 class AirQuality(models.Model):
     container = models.ForeignKey(
@@ -642,6 +805,14 @@ class AirQuality(models.Model):
         related_name='air_quality_table',
         on_delete=models.CASCADE,
     )
+    company = models.ForeignKey(
+        to=Company,
+        related_name='+',
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+    )
     ctime = models.DateTimeField(default=timezone.now)
     air_quality_value = models.IntegerField(default=0)
     location = models.PointField(
@@ -653,6 +824,9 @@ class AirQuality(models.Model):
         verbose_name=_('actual data'),
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='app_airquality_company_ctime')]
+
 
 class EnergyEfficiencyProfile(models.Model):
     """Energy efficiency profile is a set of settings for a particular case: device and/or environment conditions.
@@ -860,3 +1034,9 @@ class DemoSandboxTranslation(models.Model):
 
     class Meta:
         unique_together = ['object_type', 'object_id', 'lang', 'key']
+
+
+# Models which rows carry a denormalized copy of their container's company
+COMPANY_DENORMALIZED_MODELS = (
+    Error, FullnessValues, Collection, Battery_Level, Traffic, Pressure, Temperature, SimBalance, Humidity, AirQuality,
+)
@@ -1,37 +1,286 @@
+import aioredis
+import asyncio
 import redis
+import time
+import ujson as json
 
 from django.conf import settings
 
 
-class RedisClient(object):
-    def __init__(self):
-        self._conn = redis.StrictRedis(
+# Bounds are stored as JSON [lng_min, lat_min, lng_max, lat_max], missing ones are left to be computed on read
+_EXTEND_MAP_BOUNDS_SCRIPT = """
+local lng, lat = tonumber(ARGV[1]), tonumber(ARGV[2])
+for i = 3, #ARGV do
+    local value = redis.call('HGET', KEYS[1], ARGV[i])
+    if value then
+        local bounds = cjson.decode(value)
+        bounds = {math.min(bounds[1], lng), math.min(bounds[2], lat), math.max(bounds[3], lng), math.max(bounds[4], lat)}
+        redis.call('HSET', KEYS[1], ARGV[i], cjson.encode(bounds))
+    end
+end
+"""
+
+# Unread notifications are kept as per user sets of IDs, so recording the same notification twice is harmless.
+# Sets get marker members, which aren't valid IDs, while they are being filled from the DB & once they are filled.
+_UNREAD_NOTIFICATIONS_FILLING_MARKER = -1
+_UNREAD_NOTIFICATIONS_FILLED_MARKER = 0
+
+# Only sets being or already filled from the DB are added to, missing ones are left to be filled on read
+_ADD_UNREAD_NOTIFICATIONS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('SADD', KEYS[1], unpack(ARGV))
+end
+"""
+
+
+# Hash fields can't expire, so commands queued before ARGV[1] time are dropped along with the superseded ones
+_QUEUE_DRIVER_COMMAND_SCRIPT = """
+local commands = redis.call('HGETALL', KEYS[1])
+for i = 1, #commands, 2 do
+    if cjson.decode(commands[i + 1])['queued_at'] < tonumber(ARGV[1]) then
+        redis.call('HDEL', KEYS[1], commands[i])
+    end
+end
+for i = 5, #ARGV do
+    redis.call('HDEL', KEYS[1], ARGV[i])
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+"""
+
+
+# Presence of the newer socket of the same driver is kept
+_MARK_DRIVER_OFFLINE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+_connection_pool = None
+
+
+def _get_connection_pool():
+    global _connection_pool
+    if _connection_pool is None:
+        _connection_pool = redis.ConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
             db=settings.REDIS_DATABASE,
-            password=None,
-            socket_timeout=None,
-            connection_pool=None,
-            charset='utf-8',
-            errors='strict',
-            unix_socket_path=None
+            encoding='utf-8',
+            encoding_errors='strict',
         )
+    return _connection_pool
 
-    def set_route_to_send(self, driver_id, route):
-        self._conn.hset(settings.ROUTE_TO_SEND_HASH, driver_id, route)
 
-    def get_route_to_send(self, driver_id):
-        value = self._conn.hget(settings.ROUTE_TO_SEND_HASH, driver_id)
-        return value.decode('utf-8') if value is not None else None
+def _get_online_driver_key(driver_id):
+    return f'{settings.ONLINE_MOBILE_USERS_KEY_PREFIX}:{driver_id}'
 
-    def clear_route_to_send(self, driver_id):
-        self._conn.hdel(settings.ROUTE_TO_SEND_HASH, driver_id)
 
-    def mark_driver_online(self, driver_id):
-        self._conn.sadd(settings.ONLINE_MOBILE_USERS_SET, driver_id)
+def _get_pending_driver_commands_key(driver_id):
+    return f'{settings.PENDING_DRIVER_COMMANDS_HASH_PREFIX}:{driver_id}'
 
-    def mark_driver_offline(self, driver_id):
-        self._conn.srem(settings.ONLINE_MOBILE_USERS_SET, driver_id)
+
+class RedisClient(object):
+    def __init__(self):
+        # Connections are shared by all the clients of the process
+        self._conn = redis.StrictRedis(connection_pool=_get_connection_pool())
+
+    def queue_driver_command(self, driver_id, command_id, command, superseded_command_ids=()):
+        """Queues the command until acknowledged by the driver, returns if the driver is online."""
+        pipe = self._conn.pipeline()
+        # Whole queue expires after the latest command does
+        pipe.eval(_QUEUE_DRIVER_COMMAND_SCRIPT, 1, _get_pending_driver_commands_key(driver_id),
+                  time.time() - settings.PENDING_DRIVER_COMMANDS_TTL_SECONDS, command_id, command,
+                  settings.PENDING_DRIVER_COMMANDS_TTL_SECONDS, *superseded_command_ids)
+        pipe.exists(_get_online_driver_key(driver_id))
+        return bool(pipe.execute()[-1])
+
+    def drop_driver_commands(self, driver_id, command_ids):
+        self._conn.hdel(_get_pending_driver_commands_key(driver_id), *command_ids)
 
     def is_driver_online(self, driver_id):
-        return self._conn.sismember(settings.ONLINE_MOBILE_USERS_SET, driver_id)
+        return bool(self._conn.exists(_get_online_driver_key(driver_id)))
+
+    def get_map_data_version(self, company_id):
+        value = self._conn.hget(settings.MAP_DATA_VERSIONS_HASH, company_id or settings.MAP_DATA_VERSIONS_ALL_KEY)
+        return int(value) if value is not None else 0
+
+    def bump_map_data_version(self, *company_ids):
+        pipe = self._conn.pipeline()
+        for company_id in set(company_ids) | {settings.MAP_DATA_VERSIONS_ALL_KEY}:
+            pipe.hincrby(settings.MAP_DATA_VERSIONS_HASH, company_id, 1)
+        pipe.execute()
+
+    def _get_removed_map_devices_key(self, device_type, company_id):
+        return f'{settings.MAP_REMOVED_DEVICES_ZSET_PREFIX}:{device_type}:{company_id}'
+
+    def add_removed_map_device(self, device_type, device_id, *company_ids):
+        now = time.time()
+        pipe = self._conn.pipeline()
+        for company_id in set(company_ids) | {settings.MAP_DATA_VERSIONS_ALL_KEY}:
+            key = self._get_removed_map_devices_key(device_type, company_id)
+            pipe.zadd(key, {device_id: now})
+            pipe.zremrangebyscore(key, '-inf', now - settings.MAP_REMOVED_DEVICES_RETENTION_SECONDS)
+        pipe.execute()
+
+    def get_removed_map_devices(self, device_type, company_id, since_timestamp):
+        key = self._get_removed_map_devices_key(device_type, company_id or settings.MAP_DATA_VERSIONS_ALL_KEY)
+        return [int(device_id) for device_id in self._conn.zrangebyscore(key, since_timestamp, '+inf')]
+
+    def _get_map_bounds_key(self, device_type):
+        return f'{settings.MAP_BOUNDS_HASH_PREFIX}:{device_type}'
+
+    def get_map_bounds(self, device_type, company_id):
+        value = self._conn.hget(
+            self._get_map_bounds_key(device_type), company_id or settings.MAP_DATA_VERSIONS_ALL_KEY)
+        return json.loads(value) if value is not None else None
+
+    def set_map_bounds(self, device_type, bounds_by_company, replace=False):
+        key = self._get_map_bounds_key(device_type)
+        mapping = {
+            company_id or settings.MAP_DATA_VERSIONS_ALL_KEY: json.dumps(bounds)
+            for company_id, bounds in bounds_by_company.items()
+        }
+        pipe = self._conn.pipeline()
+        if replace:
+            pipe.delete(key)
+        if mapping:
+            pipe.hset(key, mapping=mapping)
+        pipe.execute()
+
+    def extend_map_bounds(self, device_type, lng, lat, *company_ids):
+        fields = set(company_ids) | {settings.MAP_DATA_VERSIONS_ALL_KEY}
+        self._conn.eval(_EXTEND_MAP_BOUNDS_SCRIPT, 1, self._get_map_bounds_key(device_type), lng, lat, *fields)
+
+    def drop_map_bounds(self, device_type, *company_ids):
+        self._conn.hdel(self._get_map_bounds_key(device_type),
+                        *(company_id or settings.MAP_DATA_VERSIONS_ALL_KEY for company_id in company_ids))
+
+    def _get_pending_device_task_key(self, task_name, device_type, device_id):
+        return f'{settings.PENDING_DEVICE_TASKS_KEY_PREFIX}:{task_name}:{device_type}:{device_id}'
+
+    def claim_pending_device_task(self, task_name, device_type, device_id, countdown):
+        # Expiration only matters if the scheduled task gets lost
+        key = self._get_pending_device_task_key(task_name, device_type, device_id)
+        return bool(self._conn.set(key, 1, nx=True, ex=max(countdown, 1) * 10))
+
+    def release_pending_device_task(self, task_name, device_type, device_id):
+        self._conn.delete(self._get_pending_device_task_key(task_name, device_type, device_id))
+
+    def _get_queued_pushes_key(self, message_code):
+        return f'{settings.QUEUED_PUSHES_KEY_PREFIX}:{message_code}'
+
+    def queue_push(self, message_code, user_id, countdown):
+        """Adds the user to the batch of pushes, returns if the batch has to be scheduled by the caller."""
+        key = self._get_queued_pushes_key(message_code)
+        pipe = self._conn.pipeline()
+        pipe.sadd(key, user_id)
+        # Expiration only matters if the scheduled task gets lost
+        pipe.set(f'{key}:scheduled', 1, nx=True, ex=max(countdown, 1) * 10)
+        return bool(pipe.execute()[1])
+
+    def pop_queued_pushes(self, message_code):
+        key = self._get_queued_pushes_key(message_code)
+        pipe = self._conn.pipeline()
+        pipe.delete(f'{key}:scheduled')
+        pipe.smembers(key)
+        pipe.delete(key)
+        return [int(user_id) for user_id in pipe.execute()[1]]
+
+    def _get_unread_notifications_key(self, user_id):
+        return f'{settings.UNREAD_NOTIFICATIONS_SET_PREFIX}:{user_id}'
+
+    def get_unread_notifications_count(self, user_id):
+        """Returns None if the set isn't filled from the DB yet."""
+        key = self._get_unread_notifications_key(user_id)
+        pipe = self._conn.pipeline()
+        pipe.sismember(key, _UNREAD_NOTIFICATIONS_FILLED_MARKER)
+        pipe.scard(key)
+        filled, size = pipe.execute()
+        return size - 1 if filled else None
+
+    def start_unread_notifications_filling(self, user_id):
+        # Created before the DB is read, so notifications dispatched meanwhile get recorded as well
+        self._conn.sadd(self._get_unread_notifications_key(user_id), _UNREAD_NOTIFICATIONS_FILLING_MARKER)
+
+    def finish_unread_notifications_filling(self, user_id, notification_ids):
+        key = self._get_unread_notifications_key(user_id)
+        pipe = self._conn.pipeline()
+        pipe.srem(key, _UNREAD_NOTIFICATIONS_FILLING_MARKER)
+        pipe.sadd(key, _UNREAD_NOTIFICATIONS_FILLED_MARKER, *notification_ids)
+        pipe.execute()
+
+    def add_unread_notifications(self, notification_ids_by_user):
+        pipe = self._conn.pipeline()
+        for user_id, notification_ids in notification_ids_by_user.items():
+            if notification_ids:
+                pipe.eval(_ADD_UNREAD_NOTIFICATIONS_SCRIPT, 1, self._get_unread_notifications_key(user_id),
+                          *notification_ids)
+        pipe.execute()
+
+    def remove_unread_notifications(self, user_id, notification_ids):
+        if notification_ids:
+            self._conn.srem(self._get_unread_notifications_key(user_id), *notification_ids)
+
+    def drop_unread_notifications(self):
+        keys = list(self._conn.scan_iter(match=self._get_unread_notifications_key('*'), count=1000))
+        for i in range(0, len(keys), 1000):
+            self._conn.delete(*keys[i:i + 1000])
+
+    def _get_device_notification_states_key(self, device_type, device_id):
+        return f'{settings.DEVICE_NOTIFICATION_STATES_HASH_PREFIX}:{device_type}:{device_id}'
+
+    def get_device_notification_states(self, device_type, device_id):
+        states = self._conn.hgetall(self._get_device_notification_states_key(device_type, device_id))
+        return {condition.decode('utf-8'): json.loads(state) for condition, state in states.items()}
+
+    def set_device_notification_states(self, device_type, device_id, states):
+        key = self._get_device_notification_states_key(device_type, device_id)
+        pipe = self._conn.pipeline()
+        pipe.delete(key)
+        if states:
+            pipe.hset(key, mapping={condition: json.dumps(state) for condition, state in states.items()})
+            # States of removed devices shouldn't be kept forever
+            pipe.expire(key, settings.DEVICE_NOTIFICATIONS_RENOTIFY_INTERVAL_SECONDS * 2)
+        pipe.execute()
+
+
+class AsyncRedisClient(object):
+    """Asyncio counterpart of the client for consumers, connections pool is shared by all consumers of the process."""
+    _pool = None
+    _pool_lock = None
+
+    @classmethod
+    async def _get_conn(cls):
+        if cls._pool_lock is None:
+            cls._pool_lock = asyncio.Lock()
+        async with cls._pool_lock:
+            if cls._pool is None or cls._pool.closed:
+                cls._pool = await aioredis.create_redis_pool(
+                    (settings.REDIS_HOST, settings.REDIS_PORT), db=settings.REDIS_DATABASE, encoding='utf-8')
+        return cls._pool
+
+    async def ack_driver_command(self, driver_id, command_id):
+        await (await self._get_conn()).hdel(_get_pending_driver_commands_key(driver_id), command_id)
+
+    async def mark_driver_online(self, driver_id, channel_name):
+        """Marks the driver online & reads commands pending for the driver, in a single transaction."""
+        transaction = (await self._get_conn()).multi_exec()
+        transaction.setex(_get_online_driver_key(driver_id), settings.ONLINE_MOBILE_USERS_TTL_SECONDS, channel_name)
+        pending_commands = transaction.hvals(_get_pending_driver_commands_key(driver_id))
+        await transaction.execute()
+        # Expired commands are left to be dropped by the next queued one
+        oldest_queued_at = time.time() - settings.PENDING_DRIVER_COMMANDS_TTL_SECONDS
+        commands_queued_at = [(json.loads(command)['queued_at'], command) for command in await pending_commands]
+        return [
+            command for queued_at, command in sorted(commands_queued_at, key=lambda item: item[0])
+            if queued_at >= oldest_queued_at
+        ]
+
+    async def refresh_driver_online(self, driver_id, channel_name):
+        await (await self._get_conn()).setex(
+            _get_online_driver_key(driver_id), settings.ONLINE_MOBILE_USERS_TTL_SECONDS, channel_name)
+
+    async def mark_driver_offline(self, driver_id, channel_name):
+        await (await self._get_conn()).eval(
+            _MARK_DRIVER_OFFLINE_SCRIPT, keys=[_get_online_driver_key(driver_id)], args=[channel_name])
@@ -17,6 +17,7 @@ class BasicHttpConsumer(AsyncHttpConsumer):
 websocket_urlpatterns = [
     url(r'^ws/mobile-api/(?P<token>.+)$', consumers.MobileApiConsumer),
     url(r'^ws/notifications/(?P<token>.+)$', consumers.NotificationsWebsocketConsumer),
+    url(r'^ws/device-state/(?P<token>.+)$', consumers.DeviceStateConsumer),
 ]
 
 http_stub_urlpatterns = [
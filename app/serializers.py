@@ -3,28 +3,39 @@ from rest_framework import serializers
 from django.utils.text import capfirst
 from django.utils.translation import ugettext_lazy as _
 
-from apps.core.serializers import CitySerializer, LocationSerializer, FullnessSerializer, SectorSerializer
-from app.models import Container, MobileAppTranslation
+from apps.core.serializers import DeviceValuesSerializer
+from app.models import MobileAppTranslation
 
 
-class ContainerSerializer(serializers.ModelSerializer):
-    city = CitySerializer()
-    sector = SectorSerializer()
-    fullness = FullnessSerializer()
-    location = LocationSerializer()
-    satellites_count = serializers.IntegerField(read_only=True)
-    current_fullness_volume = serializers.FloatField(read_only=True)
-    any_active_routes = serializers.BooleanField(read_only=True)
-    low_battery_level = serializers.BooleanField(read_only=True)
-    any_active_errors = serializers.BooleanField(read_only=True)
+class ContainerMapSerializer(DeviceValuesSerializer):
+    fields = DeviceValuesSerializer.fields + (
+        'is_master', 'master_bin_id', 'max_volume', 'air_quality', 'satellites_count', 'any_active_routes',
+        'low_battery_level', 'any_active_errors',
+    )
 
-    class Meta:
-        model = Container
-        fields = (
-            'id', 'serial_number', 'is_master', 'address', 'current_fullness_volume', 'city', 'sector', 'fullness',
-            'location', 'satellites_count', 'battery', 'temperature', 'air_quality', 'any_active_routes',
-            'low_battery_level', 'any_active_errors',
-        )
+    def to_representation(self, row):
+        result = super().to_representation(row)
+        fullness = row['fullness']
+        result.update({
+            'is_master': row['is_master'],
+            'master_bin_id': row['master_bin_id'],
+            'current_fullness_volume': (fullness / 100.0) * row['max_volume'] if fullness is not None else None,
+            'satellites_count': row['satellites_count'],
+            'air_quality': row['air_quality'],
+            'any_active_routes': row['any_active_routes'],
+            'low_battery_level': row['low_battery_level'],
+            'any_active_errors': row['any_active_errors'],
+        })
+        return result
+
+
+class ContainerNearbySerializer(ContainerMapSerializer):
+    fields = ContainerMapSerializer.fields + ('distance',)
+
+    def to_representation(self, row):
+        result = super().to_representation(row)
+        result['distance'] = row['distance']
+        return result
 
 
 class ApiAuthTokenSerializer(serializers.Serializer):
@@ -1,9 +1,18 @@
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_init, post_delete
 from django.dispatch import receiver
 
-from app.models import Container
+from app.models import (
+    Container, RoutePoints, COMPANY_DENORMALIZED_MODELS, refresh_devices_map_flags, split_route_points_devices,
+)
+from app.redis_client import RedisClient
+from apps.core.helpers import CompanyDeviceProfile
+from apps.core.tasks import (
+    schedule_device_addition_delta, schedule_device_removal_delta, schedule_map_bounds_extension,
+    schedule_map_bounds_drop,
+)
 
 
 # It's important to preserve signals receivers signature
@@ -16,4 +25,106 @@ def update_default_password(sender, instance, created, **kwargs):
         return
     raw_pwd = settings.E2E_DEFAULT_CONTAINER_PASSWORD if instance.serial_number.startswith('e2e-tests-bin-') else None
     instance.password = make_password(raw_pwd)
-    instance.save(update_fields=['password'])
+    instance.save(update_fields=['password', 'mtime'])
+
+
+# noinspection PyUnusedLocal
+def populate_container_company(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.company_id = instance.container.company_id
+
+
+for denormalized_model in COMPANY_DENORMALIZED_MODELS:
+    pre_save.connect(populate_container_company, sender=denormalized_model)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_init, sender=Container)
+def remember_loaded_company(sender, instance, **kwargs):
+    # Reading the instance dict directly to avoid loading deferred field
+    instance.loaded_company_id = instance.__dict__.get('company_id', None)
+    instance.loaded_master_bin_id = instance.__dict__.get('master_bin_id', None)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Container)
+@receiver(post_delete, sender=Container)
+def bump_map_data_version(sender, instance, **kwargs):
+    company_ids = {c for c in (instance.company_id, getattr(instance, 'loaded_company_id', None)) if c is not None}
+    transaction.on_commit(lambda: RedisClient().bump_map_data_version(*company_ids))
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Container)
+@receiver(post_delete, sender=Container)
+def track_removed_map_device(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete:
+        removed_from_company_id = instance.company_id
+    elif created or instance.loaded_company_id in (None, instance.company_id):
+        return
+    else:
+        removed_from_company_id = instance.loaded_company_id
+    device_id = instance.pk
+    transaction.on_commit(lambda: RedisClient().add_removed_map_device(
+        CompanyDeviceProfile.TRASHBIN.value, device_id, removed_from_company_id))
+    # Deleted devices are removed from the map of all devices as well, moved ones stay there
+    removed_from_groups = (removed_from_company_id, None) if signal is post_delete else (removed_from_company_id,)
+    schedule_device_removal_delta(CompanyDeviceProfile.TRASHBIN.value, device_id, *removed_from_groups)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Container)
+def track_added_map_device(sender, instance, created, **kwargs):
+    # Connected before sync_time_series_company() which resets the loaded company
+    if created or instance.loaded_company_id not in (None, instance.company_id):
+        schedule_device_addition_delta(CompanyDeviceProfile.TRASHBIN.value, instance.pk)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Container)
+@receiver(post_delete, sender=Container)
+def update_map_bounds(sender, instance, signal, created=False, update_fields=None, **kwargs):
+    # Connected before sync_time_series_company() which resets the loaded company. Data parsers extend bounds
+    # on their own, so partial saves are skipped.
+    if signal is post_delete:
+        schedule_map_bounds_drop(CompanyDeviceProfile.TRASHBIN.value, instance.company_id, None)
+        return
+    moved = instance.loaded_company_id not in (None, instance.company_id)
+    if moved:
+        schedule_map_bounds_drop(CompanyDeviceProfile.TRASHBIN.value, instance.loaded_company_id)
+    if instance.location is not None and (created or moved or update_fields is None):
+        schedule_map_bounds_extension(
+            CompanyDeviceProfile.TRASHBIN.value, instance.location.x, instance.location.y, instance.company_id)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Container)
+def sync_time_series_company(sender, instance, created, **kwargs):
+    if created or instance.loaded_company_id is None or instance.loaded_company_id == instance.company_id:
+        return
+    instance.loaded_company_id = instance.company_id
+    from app.tasks import sync_container_time_series_company
+    container_id = instance.pk
+    transaction.on_commit(lambda: sync_container_time_series_company.delay(container_id))
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=Container)
+@receiver(post_delete, sender=Container)
+def refresh_master_bins_satellites_count(sender, instance, signal, created=False, **kwargs):
+    master_bin_ids = {getattr(instance, 'loaded_master_bin_id', None), instance.master_bin_id}
+    if signal is post_save:
+        if not created and instance.master_bin_id == getattr(instance, 'loaded_master_bin_id', None):
+            return
+        instance.loaded_master_bin_id = instance.master_bin_id
+    master_bin_ids.discard(None)
+    if master_bin_ids:
+        refresh_devices_map_flags(container_ids=master_bin_ids)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=RoutePoints)
+@receiver(post_delete, sender=RoutePoints)
+def refresh_route_point_device_map_flags(sender, instance, **kwargs):
+    # Bulk route points changes refresh the flags explicitly, this covers single points & cascade deletions
+    refresh_devices_map_flags(*split_route_points_devices([(instance.container_id, instance.sensor_id)]))
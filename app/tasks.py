@@ -11,22 +11,28 @@ import urllib
 
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from collections import defaultdict
 from datetime import datetime, timedelta, date
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import transaction
 from django.utils import timezone
 from functools import partial
+from push_notifications.gcm import GCMError
+from push_notifications.models import GCMDevice
 
 from apps.core.models import UsersToCompany, Sectors, Company
 from apps.core.report_data_generation import BaseReportDataGenerator, get_record_generation_interval
 from app.models import (
     Container, ErrorType, FullnessValues, Battery_Level, SimBalance, EnergyEfficiencyForContainer,
     CreateDemoSandboxRequest, TrashbinJobModel, SlackEnabledTrashbin, TrashbinData, DemoSandboxTranslation,
-    FullnessStats,
+    FullnessStats, COMPANY_DENORMALIZED_MODELS, get_devices_map_flags_expressions, refresh_devices_map_flags,
+    MobileAppTranslation, MobileAppUserLanguage,
 )
+from app.redis_client import RedisClient
 from apps.trashbins.models import CompanyTrashbinsLicense
-from apps.trashbins.tasks import generate_trashbin_status_notifications
+from apps.trashbins.tasks import schedule_trashbin_status_notifications
 from apps.trashbins.trashbin_data_parsing import parse_trashbin_data_packet
 from apps.sensors.models import Sensor, CompanySensorsLicense
 from apps.sensors.tasks import generate_report_data_for_sensors
@@ -177,7 +183,7 @@ def generate_report_data_for_bins(bins_qs, utc_now, record_generation_interval):
             with transaction.atomic():
                 parse_trashbin_data_packet(message, container_id if is_master else master_bin_id)
             if random.random() > 0.9:
-                generate_trashbin_status_notifications.delay(container_id)
+                schedule_trashbin_status_notifications(container_id)
         offset += page_size
 
     logger.debug("Report data was generated for %s containers" % bins_count)
@@ -555,3 +561,78 @@ def notify_about_trashbin_message(trashbin_data_id):
     tg_bot_request_url = 'https://api.telegram.org/bot{API_TOKEN}/sendMessage?{QUERY}'.\
         format(API_TOKEN=settings.TRASHBIN_NOTIFICATIONS_TG_BOT_API_KEY, QUERY=query_string)
     requests.get(tg_bot_request_url)
+
+
+@shared_task
+def sync_container_time_series_company(container_id):
+    try:
+        container = Container.objects.only('company_id').get(pk=container_id)
+    except Container.DoesNotExist:
+        raise Warning(f"Container with ID '{container_id}' does not exist")
+
+    for model in COMPANY_DENORMALIZED_MODELS:
+        updated_count = model.objects.filter(container_id=container_id)\
+            .exclude(company_id=container.company_id).update(company_id=container.company_id)
+        logger.debug(f"{updated_count} {model.__name__} records of container {container_id} moved "
+                     f"to company {container.company_id}")
+
+
+def _get_drifted_map_flags_device_ids(queryset, flags):
+    computed_flags = {f'computed_{name}': expression for name, expression in flags.items()}
+    rows = queryset.annotate(**computed_flags).values_list('pk', *flags.keys(), *computed_flags.keys())
+    flags_count = len(flags)
+    return [row[0] for row in rows.iterator() if row[1:flags_count + 1] != row[flags_count + 1:]]
+
+
+@shared_task
+def reconcile_devices_map_flags():
+    # Map flags are refreshed by the code which changes related records, this one fixes the drift
+    # made by the rest of the code, e.g. admin or concurrent device saves
+    container_flags, sensor_flags = get_devices_map_flags_expressions()
+    container_ids = _get_drifted_map_flags_device_ids(Container.objects.all(), container_flags)
+    sensor_ids = _get_drifted_map_flags_device_ids(Sensor.objects.all(), sensor_flags)
+    if container_ids or sensor_ids:
+        refresh_devices_map_flags(container_ids, sensor_ids)
+    logger.debug(f"Map flags reconciled for {len(container_ids)} trashbins and {len(sensor_ids)} sensors")
+
+
+def _get_mobile_app_translations(message_code):
+    return cache.get_or_set(
+        f'mobile_app_translations:{message_code}',
+        lambda: dict(MobileAppTranslation.objects.filter(string_name=message_code).values_list('lang', 'string_text')),
+        settings.MOBILE_APP_TRANSLATIONS_CACHE_SECONDS)
+
+
+@shared_task
+def send_queued_pushes(message_code):
+    user_ids = RedisClient().pop_queued_pushes(message_code)
+    if user_ids:
+        send_pushes.delay(message_code, user_ids)
+
+
+@shared_task
+def send_pushes(message_code, user_ids):
+    default_message = settings.DEFAULT_MESSAGES_BY_CODES[message_code]
+    translations = _get_mobile_app_translations(message_code)
+    users_langs = dict(MobileAppUserLanguage.objects.filter(user_id__in=user_ids).values_list('user_id', 'lang'))
+
+    # Devices getting the same localized message are sent a single multicast
+    device_ids_by_message = defaultdict(list)
+    users_with_devices = set()
+    for device_id, user_id in GCMDevice.objects.filter(user_id__in=user_ids).values_list('id', 'user_id'):
+        lang = users_langs.get(user_id, None)
+        message = translations[lang] if lang is not None and lang in translations else default_message
+        device_ids_by_message[message].append(device_id)
+        users_with_devices.add(user_id)
+    for user_id in set(user_ids) - users_with_devices:
+        logger.warning(f'FCMDevice for user with ID "{user_id}" does not exist')
+
+    for message, device_ids in device_ids_by_message.items():
+        send_push_message.delay(message, device_ids)
+    logger.debug(f"Scheduled {message_code} push to {len(users_with_devices)} users")
+
+
+# Retried on its own, so a failed multicast doesn't resend messages in other languages
+@shared_task(autoretry_for=(GCMError, OSError), retry_backoff=True, retry_kwargs={'max_retries': 5})
+def send_push_message(message, device_ids):
+    GCMDevice.objects.filter(pk__in=device_ids).send_message(message)
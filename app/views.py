@@ -1,8 +1,5 @@
 ﻿import datetime
-import ujson as json
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -30,7 +27,6 @@ from app.models import (
     Container, Route, RoutePoints, Routes, RoutesDrivers, ROUTE_STATUS_ABORTED_BY_OPERATOR,
     ROUTE_POINT_STATUS_NOT_COLLECTED,
 )
-from app.redis_client import RedisClient
 from app.tables import (
     UsersTable, CompanyUserTable, CompanyTable, ContainerTable, SectorsTable, CityTable, RoutesTable, RoutePointsTable,
     DriversTable, DriverUnavailabilityPeriodTable, DriverUnavailabilityPeriod,
@@ -40,7 +36,7 @@ from apps.core.helpers import CompanyDeviceProfile
 from apps.core.models import Company, UsersToCompany, City, Sectors
 from apps.core.views import (
     ensure_object_access_or_404, LOW_BATTERY_LEVEL_ICON_DATA_URL, send_route, BIN_ON_ROUTE_ICON_DATA_URL,
-    WARNING_ICON_DATA_URL,
+    WARNING_ICON_DATA_URL, send_driver_command,
 )
 from apps.main.helpers import is_sector_referenced, get_effective_company_device_profile
 
@@ -825,23 +821,8 @@ class RouteAbort(LoginRequiredMixin, SingleObjectTemplateResponseMixin, BaseDeta
         route.status = ROUTE_STATUS_ABORTED_BY_OPERATOR
         route.save()
 
-        abort_route_command = json.dumps({
-            'action': 'abort_route',
-            'id': route.id,
-        })
-        driver_id = route.user_id
-        redis = RedisClient()
-        async_to_sync(get_channel_layer().group_send)(
-            settings.MOBILE_API_CONSUMERS_GROUP_NAME,
-            {
-                'type': 'abort_route',
-                'driver_id': driver_id,
-                'command': abort_route_command,
-            }
-        )
-        route_to_send = redis.get_route_to_send(driver_id)
-        if route_to_send is not None and not redis.is_driver_online(driver_id):
-            redis.clear_route_to_send(driver_id)
+        # Driver doesn't need to start the route anymore, if not received it yet
+        send_driver_command(route.user_id, 'abort_route', route.id, superseded_actions=('new_route',))
 
         messages.success(request, _('Route #%(route_id)s aborted successfully') % {'route_id': route.pk})
         return HttpResponseRedirect(reverse('routes:list'))
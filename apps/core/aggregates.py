@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from django.db.models import Aggregate, Avg, Min, Max, DateField, DateTimeField, FloatField, F
+from django.db.models.functions import Trunc
+from enum import Enum
+
+from apps.core.helpers import CompanyDeviceProfile
+
+
+class TimeBuckets(Enum):
+    HOUR = 'hour'
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+
+
+TIME_BUCKETS_DURATIONS = {
+    TimeBuckets.HOUR: timedelta(hours=1),
+    TimeBuckets.DAY: timedelta(days=1),
+    TimeBuckets.WEEK: timedelta(weeks=1),
+    TimeBuckets.MONTH: timedelta(days=30),
+}
+
+
+class LastValue(Aggregate):
+    # Renders as (ARRAY_AGG(value ORDER BY ctime DESC))[1]
+    function = 'ARRAY_AGG'
+    template = '(%(function)s(%(expressions)s DESC))[1]'
+    arg_joiner = ' ORDER BY '
+
+    def __init__(self, expression, time_field='ctime', **extra):
+        super().__init__(expression, F(time_field), output_field=FloatField(), **extra)
+
+
+AGGREGATE_FUNCTIONS = {
+    'avg': lambda value_field, time_field: Avg(value_field),
+    'min': lambda value_field, time_field: Min(value_field),
+    'max': lambda value_field, time_field: Max(value_field),
+    'last': lambda value_field, time_field: LastValue(value_field, time_field),
+}
+
+
+def annotate_time_buckets(qs, bucket, time_field='ctime', bucket_alias='day', as_date=False, group_by=(),
+                          **aggregations):
+    bucket_expr = Trunc(time_field, bucket, output_field=DateField() if as_date else DateTimeField())
+    return qs.annotate(**{bucket_alias: bucket_expr}).values(bucket_alias, *group_by).annotate(**aggregations)\
+        .order_by(*group_by, bucket_alias)
+
+
+@dataclass
+class DeviceMetric:
+    model: type
+    value_field: str
+    device_field: str
+    time_field: str = 'ctime'
+
+
+def get_device_metrics():
+    from app.models import (
+        FullnessValues, Battery_Level, Temperature, Pressure, Humidity, AirQuality,
+    )
+    from apps.sensors.models import (
+        Fullness as SensorFullness, BatteryLevel as SensorBatteryLevel, Temperature as SensorTemperature,
+    )
+
+    return {
+        CompanyDeviceProfile.TRASHBIN: {
+            'fullness': DeviceMetric(FullnessValues, 'fullness_value', 'container'),
+            'battery': DeviceMetric(Battery_Level, 'level', 'container'),
+            'temperature': DeviceMetric(Temperature, 'temperature_value', 'container'),
+            'pressure': DeviceMetric(Pressure, 'pressure_value', 'container'),
+            'humidity': DeviceMetric(Humidity, 'humidity_value', 'container'),
+            'air_quality': DeviceMetric(AirQuality, 'air_quality_value', 'container'),
+        },
+        CompanyDeviceProfile.SENSOR: {
+            'fullness': DeviceMetric(SensorFullness, 'value', 'sensor'),
+            'battery': DeviceMetric(SensorBatteryLevel, 'level', 'sensor'),
+            'temperature': DeviceMetric(SensorTemperature, 'value', 'sensor'),
+        },
+    }
@@ -0,0 +1,223 @@
+import hashlib
+import time
+
+from datetime import datetime
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from redis.exceptions import RedisError
+from rest_framework.exceptions import ValidationError, PermissionDenied, NotFound
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from app.redis_client import RedisClient
+from apps.core.aggregates import (
+    AGGREGATE_FUNCTIONS, TIME_BUCKETS_DURATIONS, TimeBuckets, annotate_time_buckets, get_device_metrics,
+)
+from apps.core.helpers import CompanyDeviceProfile, render_mvt_tile, search_queryset_nearby
+from apps.core.renderers import UJSONRenderer
+from apps.core.reports import get_company_lookup
+
+
+def _parse_ids_list(value, param_name):
+    try:
+        return [int(item) for item in value.split(',') if item != '']
+    except ValueError:
+        raise ValidationError({param_name: 'Comma separated list of integer IDs expected'})
+
+
+def _parse_datetime(value, param_name):
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        # Well formatted but invalid values, like 2020-13-01T00:00
+        parsed = None
+    if parsed is None:
+        raise ValidationError({param_name: 'ISO 8601 date & time expected'})
+    return parsed
+
+
+class DeviceMetricAggregatesAPIView(APIView):
+    renderer_classes = (UJSONRenderer,)
+    max_buckets = 10000
+
+    def get(self, request):
+        if not (request.uac.is_superadmin or (request.uac.has_per_company_access and request.uac.company)):
+            raise PermissionDenied()
+        params = request.query_params
+
+        try:
+            device_profile = CompanyDeviceProfile(params.get('device_type', CompanyDeviceProfile.TRASHBIN.value))
+        except ValueError:
+            raise ValidationError({
+                'device_type': f"Supported values: {', '.join(p.value for p in CompanyDeviceProfile)}"})
+        device_metrics = get_device_metrics()[device_profile]
+        metric_name = params.get('metric', None)
+        if metric_name not in device_metrics:
+            raise ValidationError({'metric': f"Supported values: {', '.join(device_metrics.keys())}"})
+        metric = device_metrics[metric_name]
+        try:
+            bucket = TimeBuckets(params.get('bucket', TimeBuckets.DAY.value))
+        except ValueError:
+            raise ValidationError({'bucket': f"Supported values: {', '.join(b.value for b in TimeBuckets)}"})
+        aggregates = params.get('aggregates', 'avg').split(',')
+        if not all(name in AGGREGATE_FUNCTIONS for name in aggregates):
+            raise ValidationError({'aggregates': f"Supported values: {', '.join(AGGREGATE_FUNCTIONS.keys())}"})
+
+        date_from = _parse_datetime(params.get('from', ''), 'from')
+        date_to = _parse_datetime(params['to'], 'to') if 'to' in params else timezone.now()
+        date_from, date_to = (timezone.make_aware(d) if timezone.is_naive(d) else d for d in (date_from, date_to))
+        if date_from >= date_to:
+            raise ValidationError({'from': 'Should be earlier than the end of the range'})
+        if (date_to - date_from) / TIME_BUCKETS_DURATIONS[bucket] > self.max_buckets:
+            raise ValidationError({'bucket': f'Time range is too long for the bucket, max {self.max_buckets} buckets'})
+
+        qs = metric.model.objects.filter(**{
+            f'{metric.time_field}__gte': date_from,
+            f'{metric.time_field}__lt': date_to,
+        })
+        company_lookup = get_company_lookup(metric.model, metric.device_field)
+        if not request.uac.is_superadmin:
+            qs = qs.filter(**{company_lookup: request.uac.company_id})
+        elif params.get('company', None):
+            qs = qs.filter(**{f'{company_lookup}__in': _parse_ids_list(params['company'], 'company')})
+        if params.get('devices', None):
+            qs = qs.filter(**{f'{metric.device_field}_id__in': _parse_ids_list(params['devices'], 'devices')})
+        for filter_name in ('city', 'waste_type'):
+            if params.get(filter_name, None):
+                qs = qs.filter(**{
+                    f'{metric.device_field}__{filter_name}_id__in': _parse_ids_list(params[filter_name], filter_name)})
+
+        group_by_device = params.get('group_by_device', 'true') != 'false'
+        device_key = f'{metric.device_field}_id'
+        qs = annotate_time_buckets(
+            qs, bucket.value, metric.time_field, 'bucket', group_by=(device_key,) if group_by_device else (),
+            **{name: AGGREGATE_FUNCTIONS[name](metric.value_field, metric.time_field) for name in aggregates})
+
+        results = []
+        for row in qs:
+            result = {'bucket': row['bucket'].isoformat()}
+            if group_by_device:
+                result['device'] = row[device_key]
+            for name in aggregates:
+                result[name] = row[name]
+            results.append(result)
+
+        content = UJSONRenderer().render({
+            'device_type': device_profile.value,
+            'metric': metric_name,
+            'bucket': bucket.value,
+            'results': results,
+        })
+        etag = quote_etag(hashlib.md5(content).hexdigest())
+        not_modified_response = get_conditional_response(request, etag=etag)
+        if not_modified_response is not None:
+            return not_modified_response
+        response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
+class MapDevicesMixin:
+    """Shared parts of the map devices APIs: access check, data version based ETags & changes cursor."""
+    map_layer_name = None
+    device_type = None
+
+    def has_map_access(self):
+        uac = self.request.uac
+        return uac.is_superadmin or (uac.has_per_company_access and uac.company)
+
+    def scope_queryset(self, queryset):
+        if self.request.uac.company:
+            queryset = queryset.filter(company=self.request.uac.company)
+        return queryset
+
+    def get_conditional_map_response(self, build_response, *etag_extra):
+        request = self.request
+        try:
+            data_version = RedisClient().get_map_data_version(request.uac.company_id)
+        except RedisError:
+            # Map should stay available without Redis, just not cacheable
+            return build_response()
+        etag_key = f'{self.map_layer_name}:{request.uac.company_id}:{data_version}:' \
+                   f'{sorted(request.query_params.lists())}:{etag_extra}'
+        etag = quote_etag(hashlib.md5(etag_key.encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = build_response()
+            response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_changes_since(self):
+        since = self.request.query_params.get('since', None)
+        if since is None:
+            return None
+        try:
+            since = float(since)
+        except ValueError:
+            raise ValidationError({'since': 'Cursor from the previous response expected'})
+        # Removed devices are not tracked for that long, so full data has to be reloaded
+        if time.time() - since > settings.MAP_REMOVED_DEVICES_RETENTION_SECONDS:
+            return None
+        return datetime.fromtimestamp(since - settings.MAP_CHANGES_CURSOR_OVERLAP_SECONDS, tz=timezone.utc)
+
+    def get_removed_ids(self, since, changed_ids, returned_ids):
+        # Changed devices which don't match the filters anymore are reported as removed as well
+        removed_ids = set(RedisClient().get_removed_map_devices(
+            self.device_type.value, self.request.uac.company_id, since.timestamp()))
+        return sorted(removed_ids | (set(changed_ids) - set(returned_ids)))
+
+
+class MapTileMixin(MapDevicesMixin):
+    """Renders devices list API queryset as Mapbox Vector Tile, expected to be mixed into map list API view."""
+    tile_fields = ()
+    max_zoom = 22
+
+    def get_tile(self, request, z, x, y):
+        z, x, y = int(z), int(x), int(y)
+        if z > self.max_zoom or x >= 2 ** z or y >= 2 ** z:
+            raise NotFound()
+
+        def build_response():
+            tile = render_mvt_tile(
+                self.filter_queryset(self.get_queryset()), z, x, y, self.map_layer_name, self.tile_fields)
+            return HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
+
+        return self.get_conditional_map_response(build_response, z, x, y)
+
+
+class NearbyDevicesMixin(MapDevicesMixin):
+    """Searches map list API queryset around the point, expected to be mixed into map list API view."""
+    nearby_serializer_class = None
+    default_limit = 20
+    max_limit = 100
+    max_radius = 50000
+
+    def _get_float_param(self, name, min_value, max_value, required=True):
+        value = self.request.query_params.get(name, None)
+        if value is None and not required:
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: 'Number expected'})
+        if not min_value <= value <= max_value:
+            raise ValidationError({name: f'Should be between {min_value} and {max_value}'})
+        return value
+
+    def get_nearby(self, request):
+        lng = self._get_float_param('lng', -180, 180)
+        lat = self._get_float_param('lat', -90, 90)
+        radius = self._get_float_param('radius', 0, self.max_radius, required=False)
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'Integer expected'})
+        if not 0 < limit <= self.max_limit:
+            raise ValidationError({'limit': f'Should be between 1 and {self.max_limit}'})
+
+        queryset = search_queryset_nearby(self.filter_queryset(self.get_queryset()), lng, lat, radius)[:limit]
+        return Response({self.map_layer_name: self.nearby_serializer_class(queryset).data})
@@ -7,6 +7,7 @@ from django.utils.translation import ugettext_lazy as _
 from rest_framework.authtoken.models import Token
 
 from apps.core.models import FeatureFlag
+from apps.core.tasks import get_unread_notifications_count
 
 
 MODAL_MESSAGE_EXTRA_TAGS = 'modal'
@@ -81,8 +82,7 @@ def notifications(request):
         except user_model.auth_token.RelatedObjectDoesNotExist:
             token = Token.objects.create(user=request.user)
         result['realtime_api_auth_token'] = token.key
-        # We don't care if there are more than 10 unread notifications here
-        unread_notifications_count = len(request.user.notifications.unread().order_by('-timestamp')[:10])
+        unread_notifications_count = get_unread_notifications_count(request.user.id)
         if unread_notifications_count:
             result['unread_notifications_count'] = str(unread_notifications_count) \
                 if unread_notifications_count < 10 else '9+'
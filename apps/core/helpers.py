@@ -5,13 +5,18 @@ import random
 import requests
 
 from django.conf import settings
+from django.contrib.gis.db.models import GeometryField, Collect
+from django.contrib.gis.db.models.functions import Centroid
 from django.contrib.gis.gdal import Envelope
-from django.db.models import Q
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.db.models import Q, Count, Func, Max, Value, FloatField, BooleanField
 from django.utils.translation import override as current_language_override
 from enum import Enum
 from functools import reduce
 
 from apps.core.models import City, Country
+from apps.core.utils import get_tile_mercator_bounds, mercator_to_lng_lat
 
 
 logger = logging.getLogger('app_main')
@@ -44,6 +49,95 @@ def filter_queryset_by_fullness(queryset, fullness_list):
     return queryset
 
 
+class SnapToGrid(Func):
+    function = 'ST_SnapToGrid'
+    output_field = GeometryField()
+
+
+def get_map_clustering_grid_size(zoom):
+    if zoom is None:
+        return None
+    try:
+        zoom = int(zoom)
+    except ValueError:
+        return None
+    if zoom < 0 or zoom >= settings.MAP_CLUSTERING_MAX_ZOOM:
+        return None
+    # Map tile at zoom level Z spans 360 / 2^Z degrees of longitude
+    return 360 / 2 ** zoom / settings.MAP_CLUSTERS_PER_TILE
+
+
+def cluster_queryset_by_grid(queryset, grid_size, **aggregations):
+    # Aggregating over a PK subquery keeps joins of the filtered queryset from duplicating rows
+    clusters_qs = queryset.model.objects.filter(pk__in=queryset.values('pk'))\
+        .annotate(cell=SnapToGrid('location', grid_size))\
+        .values('cell')\
+        .annotate(
+            devices_count=Count('pk'),
+            center=Centroid(Collect('location')),
+            max_fullness=Max('fullness'),
+            **aggregations)\
+        .order_by()
+    result = []
+    for cluster in clusters_qs:
+        center = cluster.pop('center')
+        del cluster['cell']
+        cluster['location'] = {'x': center.x, 'y': center.y}
+        result.append(cluster)
+    return result
+
+
+class AsGeography(Func):
+    # Plain cast matching the expression of locations geography GiST indexes
+    template = '%(expressions)s::geography'
+
+
+class GeographyKNNDistance(Func):
+    # Distance in meters, ordering by KNN operator is served by the GiST index
+    template = '(%(expressions)s)'
+    arg_joiner = ' <-> '
+    output_field = FloatField()
+
+
+def search_queryset_nearby(queryset, lng, lat, radius=None):
+    """Orders devices by distance to the point, optionally keeping only ones within the radius (in meters)."""
+    location = AsGeography('location')
+    point = AsGeography(Value(Point(lng, lat, srid=4326), output_field=GeometryField(srid=4326)))
+    if radius is not None:
+        queryset = queryset.annotate(
+            within_radius=Func(location, point, Value(radius), function='ST_DWithin', output_field=BooleanField()))\
+            .filter(within_radius=True)
+    return queryset.annotate(distance=GeographyKNNDistance(location, point)).order_by('distance')
+
+
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+
+def render_mvt_tile(queryset, z, x, y, layer_name, fields):
+    # Devices slightly outside of the tile are included to avoid markers clipping at tiles edges
+    west, south, east, north = get_tile_mercator_bounds(z, x, y, buffer_ratio=MVT_BUFFER / MVT_EXTENT)
+    (west, south), (east, north) = mercator_to_lng_lat(west, south), mercator_to_lng_lat(east, north)
+    queryset = filter_queryset_by_bounds(queryset, [north, west, south, east])
+
+    devices_sql, devices_params = queryset.values('location', *fields).query.sql_with_params()
+    columns = ', '.join(f'd.{connection.ops.quote_name(f)}' for f in fields)
+    tile_sql = f'''
+        SELECT ST_AsMVT(tile, %s, {MVT_EXTENT}, 'geom') FROM (
+            SELECT
+                ST_AsMVTGeom(
+                    ST_Transform(d.location, 3857), ST_MakeEnvelope(%s, %s, %s, %s, 3857), {MVT_EXTENT}, {MVT_BUFFER},
+                    true) AS geom,
+                {columns}
+            FROM ({devices_sql}) d
+        ) tile
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(tile_sql, [layer_name, *get_tile_mercator_bounds(z, x, y), *devices_params])
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile is not None else b''
+
+
 def get_unknown_city_country():
     with current_language_override('en'):
         unknown_city = City.objects.prefetch_related('country').get(title='Unknown')
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.17 on 2026-10-19 10:12
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0015_auto_20221108_1254'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.IntegerField(choices=[(0, 'New'), (1, 'Succeed'), (2, 'Failed'), (3, 'In progress')], default=0)),
+                ('ctime', models.DateTimeField(default=django.utils.timezone.now, verbose_name='created at')),
+                ('mtime', models.DateTimeField(blank=True, null=True)),
+                ('progress', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('chunks_total', models.IntegerField(default=0)),
+                ('chunks_done', models.IntegerField(default=0)),
+                ('report_name', models.CharField(max_length=64)),
+                ('params', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('result_data', models.BinaryField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-ctime',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportJobChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('params', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(blank=True, null=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.ReportJob')),
+            ],
+            options={
+                'ordering': ('index',),
+                'unique_together': {('job', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.17 on 2026-10-19 14:05
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_reportjob_reportjobchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.IntegerField(choices=[(1, 'New notifications')])),
+                ('payload', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('ctime', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+    ]
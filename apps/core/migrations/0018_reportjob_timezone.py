@@ -0,0 +1,19 @@
+# Generated by Django 2.2.17 on 2026-10-19 16:40
+
+from django.db import migrations
+import timezone_field.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='timezone',
+            field=timezone_field.fields.TimeZoneField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.conf import settings
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.contrib.gis.db import models
+from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
-from django.core.validators import MinValueValidator
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from timezone_field import TimeZoneField
 
@@ -197,3 +199,84 @@ class WasteType(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class ReportJob(models.Model):
+    STATUS_NEW = 0
+    STATUS_SUCCESS = 1
+    STATUS_FAILED = 2
+    STATUS_IN_PROGRESS = 3
+    STATUSES = (
+        (STATUS_NEW, 'New'),
+        (STATUS_SUCCESS, 'Succeed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_IN_PROGRESS, 'In progress'),
+    )
+    # Status fields
+    status = models.IntegerField(default=STATUS_NEW, choices=STATUSES)
+    ctime = models.DateTimeField(default=timezone.now, verbose_name=_('created at'))
+    mtime = models.DateTimeField(blank=True, null=True)
+    progress = models.IntegerField(default=0, validators=[MinValueValidator(0), MaxValueValidator(100)])
+    chunks_total = models.IntegerField(default=0)
+    chunks_done = models.IntegerField(default=0)
+    # Request fields
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='report_jobs')
+    report_name = models.CharField(max_length=64)
+    params = JSONField(default=dict)
+    # Effective timezone of the user at the moment of request, report periods are interpreted in it
+    timezone = TimeZoneField(null=True, blank=True)
+    # Result fields - gzip-compressed JSON, stored in DB so web & worker nodes don't need a shared volume
+    result_data = models.BinaryField(blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+
+    class Meta:
+        ordering = ('-ctime',)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCESS, self.STATUS_FAILED)
+
+
+class ReportJobChunk(models.Model):
+    job = models.ForeignKey(ReportJob, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    params = JSONField(default=dict)
+    result = JSONField(blank=True, null=True)
+
+    class Meta:
+        ordering = ('index',)
+        unique_together = ('job', 'index')
+
+
+class OutboxEvent(models.Model):
+    """Side effects of DB changes, written in the same transaction & dispatched in batches once committed."""
+    KIND_NEW_NOTIFICATIONS = 1
+    KINDS = (
+        (KIND_NEW_NOTIFICATIONS, 'New notifications'),
+    )
+    kind = models.IntegerField(choices=KINDS)
+    payload = JSONField(default=dict)
+    ctime = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('id',)
+
+
+class NotificationDelivery(models.Model):
+    """Delivery state of a notification per channel, the notification is marked emailed once all of them settle."""
+    STATUS_PENDING = 0
+    STATUS_SENT = 1
+    STATUS_FAILED = 2
+    STATUS_SKIPPED = 3
+    STATUSES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_SKIPPED, 'Skipped'),
+    )
+    notification = models.OneToOneField(
+        'notifications.Notification', on_delete=models.CASCADE, related_name='delivery')
+    push_status = models.IntegerField(default=STATUS_PENDING, choices=STATUSES)
+    email_status = models.IntegerField(default=STATUS_PENDING, choices=STATUSES)
+    # Runs which failed to deliver to some channel for a reason worth retrying
+    attempts = models.IntegerField(default=0)
@@ -0,0 +1,12 @@
+import ujson as json
+
+from rest_framework.renderers import JSONRenderer
+
+
+class UJSONRenderer(JSONRenderer):
+    """JSON renderer backed by ujson, data is expected to consist of JSON primitives only."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
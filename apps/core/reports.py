@@ -2,10 +2,12 @@ import math
 import re
 import operator
 
-from copy import deepcopy
 from datetime import datetime, timedelta
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import FieldDoesNotExist
 from django.db.models import Q
+from django.db.models.query import ModelIterable
 from django.http import JsonResponse
 from django.utils import timezone
 from django.utils.formats import date_format
@@ -14,11 +16,12 @@ from django.utils.translation import ugettext_lazy as _, get_language
 from django.views import generic
 from django_datatables_view.base_datatable_view import BaseDatatableView
 from enum import Enum
-from functools import reduce
+from functools import lru_cache, reduce
+from modeltranslation.translator import translator, NotRegistered
 
 from apps.core.data import FULLNESS
 from apps.core.models import Company, Country, City
-from apps.core.utils import split_value_among_segments
+from apps.core.utils import split_value_among_segments, lttb_downsample_indices
 
 
 def check_report_access(request):
@@ -64,6 +67,21 @@ _common_filter_default_options = {
 }
 
 
+def get_company_lookup(model, device_field):
+    # Time-series models carry denormalized company to skip join with devices table
+    try:
+        model._meta.get_field('company')
+    except FieldDoesNotExist:
+        return f'{device_field}__company_id'
+    return 'company_id'
+
+
+def _parse_period_date(value):
+    # Microseconds are only passed by report job chunks ending right before the next month
+    period_dates_format = '%Y-%m-%d %H:%M:%S.%f' if '.' in value else '%Y-%m-%d %H:%M:%S'
+    return datetime.strptime(value, period_dates_format)
+
+
 def filter_queryset_by_date_range(qs, params_dict, options_dict):
     options = _common_filter_default_options.copy()
     options.update(options_dict)
@@ -85,13 +103,12 @@ def filter_queryset_by_date_range(qs, params_dict, options_dict):
         }
         qs = qs.filter(**filter_kwargs)
     elif date_range == 'date_period':
-        period_dates_format = '%Y-%m-%d %H:%M:%S'
         filter_kwargs = {}
         if date_from and date_from != '':
-            tz_aware_date_from = timezone.make_aware(datetime.strptime(date_from, period_dates_format))
+            tz_aware_date_from = timezone.make_aware(_parse_period_date(date_from))
             filter_kwargs['%s__gte' % time_field_name] = tz_aware_date_from
         if date_to and date_to != '':
-            tz_aware_date_to = timezone.make_aware(datetime.strptime(date_to, period_dates_format))
+            tz_aware_date_to = timezone.make_aware(_parse_period_date(date_to))
             filter_kwargs['%s__lte' % time_field_name] = tz_aware_date_to
         qs = qs.filter(**filter_kwargs)
 
@@ -186,7 +203,18 @@ def calculate_line_chart_max_height(y_max):
     return round(int(math.ceil((y_max + y_max * 0.10) / 10.0)) * 10)
 
 
-def prepare_stacked_line_chart_result_json(qs, segments, field_name, options_override=None):
+def downsample_chart_items(qs, field_name, max_points=None):
+    items = list(qs)
+    effective_max_points = max_points or settings.CHART_MAX_POINTS
+    if len(items) <= effective_max_points:
+        return items
+    indices = lttb_downsample_indices(
+        [item[field_name] if item[field_name] is not None else float('nan') for item in items], effective_max_points)
+    return [items[i] for i in indices]
+
+
+def prepare_stacked_line_chart_result_json(qs, segments, field_name, options_override=None, max_points=None):
+    qs = downsample_chart_items(qs, field_name, max_points)
     result = {'chart': COMMON_STACKED_LINE_CHART_SETTINGS.copy()}
     y_max = 0
 
@@ -260,21 +288,70 @@ def default_render_column(row, column, fallback=None):
     return fallback(row, column) if fallback else row[column]
 
 
-def _merge_items(one, two):
-    if isinstance(two, dict):
-        result = deepcopy(one)
-        for key, value in two.items():
-            if key in result and isinstance(result[key], dict):
-                result[key] = _merge_items(result[key], value)
-            else:
-                result[key] = deepcopy(value)
-        return result
-    return two
+# Columns which are rendered out of other model fields
+_computed_columns_fields = {
+    'elapsed': 'ctime',
+}
+
+
+def _get_translation_fields_names(model, field_name):
+    try:
+        translation_options = translator.get_options_for_model(model)
+    except NotRegistered:
+        return ()
+    return tuple(field.name for field in translation_options.fields.get(field_name, ()))
+
+
+def _resolve_column_field_paths(model, column):
+    """Returns paths of the model fields read to render the column, None if it can't be resolved."""
+    path = _computed_columns_fields.get(column, column).split('.')
+    opts = model._meta
+    try:
+        for part in path[:-1]:
+            field = opts.get_field(part)
+            if not (field.many_to_one or field.one_to_one):
+                return None
+            opts = field.related_model._meta
+        field = opts.get_field(path[-1])
+    except FieldDoesNotExist:
+        return None
+    if field.is_relation or not field.concrete:
+        return None
+    # Translated field reads the localized fields (including the fallback ones) instead of its own column
+    return [path] + [path[:-1] + [name] for name in _get_translation_fields_names(opts.model, path[-1])]
+
+
+@lru_cache(maxsize=None)
+def compile_columns_plan(model, columns, extra_fields=()):
+    """
+    Returns (row_steps, select_related_paths, only_fields) for the given columns. Row steps are
+    (column, parent_keys, leaf_key) tuples used to build nested output rows. Related paths & only fields are None
+    if any of the columns can't be resolved to a concrete model field, i.e. columns selection can't be pushed down.
+    """
+    row_steps = []
+    for column in columns:
+        path = column.split('.')
+        row_steps.append((column, tuple(path[:-1]), path[-1]))
+
+    related_paths = set()
+    only_fields = list(extra_fields)
+    for column in columns:
+        field_paths = _resolve_column_field_paths(model, column)
+        if field_paths is None:
+            return tuple(row_steps), None, None
+        if len(field_paths[0]) > 1:
+            related_paths.add('__'.join(field_paths[0][:-1]))
+        only_fields.extend('__'.join(field_path) for field_path in field_paths)
+
+    return tuple(row_steps), tuple(sorted(related_paths)), tuple(only_fields)
 
 
 class BaseReportDatatableView(LoginRequiredMixin, BaseDatatableView):
     pre_camel_case_notation = False
     max_display_length = 200
+    # Model fields used by overridden render_column besides the columns themselves, columns selection isn't pushed
+    # down to the query for views overriding render_column without declaring them
+    extra_only_fields = None
 
     def initialize(self, *args, **kwargs):
         super().initialize(*args, **kwargs)
@@ -292,26 +369,29 @@ class BaseReportDatatableView(LoginRequiredMixin, BaseDatatableView):
     def filter_queryset(self, qs):
         raise NotImplementedError()
 
+    def get_columns_plan(self):
+        return compile_columns_plan(self.model, tuple(self.get_columns()), tuple(self.extra_only_fields or ()))
+
+    def paging(self, qs):
+        _, related_paths, only_fields = self.get_columns_plan()
+        render_column_overridden = type(self).render_column is not BaseReportDatatableView.render_column
+        if only_fields is not None and qs._iterable_class is ModelIterable and \
+                (self.extra_only_fields is not None or not render_column_overridden):
+            # Load only the rendered fields instead of whole instances (including geometry) of the related models
+            qs = qs.select_related(None).select_related(*related_paths).only(*only_fields)
+        return super().paging(qs)
+
     def prepare_results(self, qs):
+        row_steps, _, _ = self.get_columns_plan()
+        render_column = self.render_column
         json_data = []
         for item in qs:
             row = {}
-            for column in self.get_columns():
-                if '.' in column:
-                    new_column = column.split('.')[0]
-                    part_column = column.split('.')
-                    del part_column[0]
-                    if new_column not in row:
-                        row[new_column] = reduce(lambda res, cur: {cur: res}, reversed(part_column),
-                                                 self.render_column(item, column))
-                    elif row[new_column] is not None:
-                        column_value = row[new_column]
-                        old_value = column_value.copy()
-                        new_value = reduce(lambda res, cur: {cur: res}, reversed(part_column),
-                                           self.render_column(item, column))
-                        row[new_column] = _merge_items(old_value, new_value)
-                else:
-                    row[column] = self.render_column(item, column)
+            for column, parent_keys, leaf_key in row_steps:
+                target = row
+                for key in parent_keys:
+                    target = target.setdefault(key, {})
+                target[leaf_key] = render_column(item, column)
             json_data.append(row)
         return json_data
 
@@ -446,7 +526,8 @@ COMMON_LINE_CHART_SETTINGS = {
 }
 
 
-def prepare_temperature_chart_result_json(qs):
+def prepare_temperature_chart_result_json(qs, max_points=None):
+    qs = downsample_chart_items(qs, 'temperature_avg', max_points)
     json_data = {'chart': COMMON_LINE_CHART_SETTINGS.copy()}
     json_data['chart'].update({
         "yAxisMaxValue": 40,
@@ -1,7 +1,10 @@
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.functions import Coalesce, NullIf
+from modeltranslation.utils import build_localized_fieldname, get_language, resolution_order
 from rest_framework import serializers
 
 from apps.core.data import Fullness
-from apps.core.models import City, Sectors
+from apps.core.models import City
 
 
 class CitySerializer(serializers.ModelSerializer):
@@ -10,22 +13,54 @@ class CitySerializer(serializers.ModelSerializer):
         fields = ('id', 'title')
 
 
-class LocationSerializer(serializers.Serializer):
-    x = serializers.FloatField()
-    y = serializers.FloatField()
+class ValuesSerializer:
+    """Read-only serializer building representation from queryset values() rows without instantiating models."""
+    fields = ()
 
+    def __init__(self, queryset):
+        self.queryset = queryset
 
-class FullnessSerializer(serializers.Serializer):
-    title = serializers.CharField()
-    value = serializers.IntegerField()
+    def get_annotations(self):
+        return {}
 
-    def get_attribute(self, instance):
-        fullness = Fullness.get_member(instance.fullness)
-        fullness.value = instance.fullness
-        return fullness
+    def to_representation(self, row):
+        raise NotImplementedError()
 
+    @property
+    def data(self):
+        annotations = self.get_annotations()
+        rows = self.queryset.annotate(**annotations).values(*self.fields, *annotations.keys())
+        return [self.to_representation(row) for row in rows]
 
-class SectorSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Sectors
-        fields = ('id', 'name')
+
+class DeviceValuesSerializer(ValuesSerializer):
+    """Common parts of map devices representation."""
+    fields = ('id', 'serial_number', 'address', 'fullness', 'battery', 'temperature', 'city_id', 'sector_id',
+              'sector__name')
+
+    def get_annotations(self):
+        return {
+            'location_x': Func('location', function='ST_X', output_field=FloatField()),
+            'location_y': Func('location', function='ST_Y', output_field=FloatField()),
+            # Same fallback chain as the translated field descriptor, untranslated values are empty strings
+            'city_title': Coalesce(*(
+                NullIf(F('city__' + build_localized_fieldname('title', language)), Value(''))
+                for language in resolution_order(get_language())), F('city__title')),
+        }
+
+    def to_representation(self, row):
+        fullness = row['fullness']
+        return {
+            'id': row['id'],
+            'serial_number': row['serial_number'],
+            'address': row['address'],
+            'city': {'id': row['city_id'], 'title': row['city_title']} if row['city_id'] is not None else None,
+            'sector': {'id': row['sector_id'], 'name': row['sector__name']} if row['sector_id'] is not None else None,
+            'fullness': {
+                'title': Fullness.get_title(fullness) if fullness is not None else None,
+                'value': fullness,
+            },
+            'location': {'x': row['location_x'], 'y': row['location_y']},
+            'battery': row['battery'],
+            'temperature': row['temperature'],
+        }
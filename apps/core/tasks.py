@@ -1,22 +1,38 @@
+import asyncio
 import boto3
+import gzip
 import json
 import logging
 import requests
+import time
 
 from asgiref.sync import async_to_sync
 from celery import shared_task
 from channels.layers import get_channel_layer
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from decimal import Decimal
 from django.conf import settings
-from django.db.models.query import QuerySet
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import FloatField, Func
+from django.http import HttpRequest, QueryDict
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _, override as current_language_override
 from enum import Enum
 from notifications.models import Notification
-from notifications.base.models import notify_handler
-from notifications.signals import notify
+from redis.exceptions import RedisError
 
+from app.redis_client import RedisClient
+from apps.core.data import Fullness
+from apps.core.helpers import CompanyDeviceProfile
+from apps.core.middleware import UserAccessControl
+from apps.core.models import OutboxEvent, ReportJob, ReportJobChunk, NotificationDelivery
 from apps.core.utils import (
     notification_subject_generators, notification_message_generators, notification_link_generators,
+    report_job_chart_views, split_period_by_months, resolve_condition_notification,
 )
 
 
@@ -43,27 +59,29 @@ notification_levels_resolver = {
 }
 
 
-def _send_notifications_via_onesignal(recipient_id, notifications):
-    first_notification = next(iter(notifications))
-    heading = notification_subject_generators[first_notification.verb](first_notification) \
-        if first_notification.verb in notification_subject_generators else None
-    message = notification_message_generators[first_notification.verb](first_notification) \
-        if first_notification.verb in notification_message_generators else None
-    link = notification_link_generators[first_notification.verb](first_notification) \
-        if first_notification.verb in notification_link_generators else None
-    if not all((heading, message, link)):
-        logger.warning(f"Missing some values - {heading}/{message}/{link} - "
-                       f"for a notification {first_notification.verb}")
-        return
+# Limits of the recipients per a single API call
+ONESIGNAL_MAX_EXTERNAL_USER_IDS = 2000
+SES_MAX_BULK_DESTINATIONS = 50
+
+
+def _split_into_batches(items, batch_size):
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def _generate_notification_text(generators, notification):
+    return generators[notification.verb](notification) if notification.verb in generators else None
 
-    headers = {
-        "Content-Type": "application/json; charset=utf-8",
-        "Authorization": f"Basic {settings.ONESIGNAL_REST_API_KEY}",
-    }
 
+# Statuses of SES destinations worth sending to again, the rest of the failed ones are rejected for good
+SES_RETRYABLE_STATUSES = ('TransientFailure', 'Failed', 'AccountThrottled', 'AccountDailyQuotaExceeded')
+
+
+# Delivery functions return IDs of the recipients they failed to deliver to - ones worth retrying & rejected ones
+def _send_onesignal_notification(http_session, content, recipient_ids):
+    heading, message, link = content
     payload = {
         "app_id": settings.ONESIGNAL_APP_ID,
-        "include_external_user_ids": [str(recipient_id)],
+        "include_external_user_ids": [str(recipient_id) for recipient_id in recipient_ids],
         "channel_for_external_user_ids": "push",
         "headings": {"en": heading},
         "contents": {"en": message},
@@ -72,84 +90,266 @@ def _send_notifications_via_onesignal(recipient_id, notifications):
     if not settings.DEBUG:
         payload["priority"] = 10
 
-    req = requests.post("https://onesignal.com/api/v1/notifications", headers=headers, data=json.dumps(payload))
-    if req.status_code == 200:
-        logger.debug(f"Successfully sent {first_notification.verb} notification to recipient with ID {recipient_id}")
-    else:
+    req = http_session.post(settings.ONESIGNAL_NOTIFICATIONS_URL, data=json.dumps(payload))
+    if req.status_code != 200:
         logger.warning(f"Failed to deliver notification (status code {req.status_code}):\n{req.text}")
+        # Client errors besides rate limiting won't go away by sending the same request again
+        if 400 <= req.status_code < 500 and req.status_code != 429:
+            return [], recipient_ids
+        return recipient_ids, []
+    logger.debug(f"Successfully sent push notification to {len(recipient_ids)} recipients")
+    return [], []
 
 
-def _send_notifications_via_email(recipient_email, notifications):
-    first_notification = next(iter(notifications))
-    message = notification_message_generators[first_notification.verb](first_notification) \
-        if first_notification.verb in notification_message_generators else None
-    link = notification_link_generators[first_notification.verb](first_notification) \
-        if first_notification.verb in notification_link_generators else None
-    if not all((message, link)):
-        logger.warning(f"Missing some values - {message}/{link} - for a notification {first_notification.verb}")
-        return
-
-    notifications_messages_combined = '\n'.join((
-        f"- {notification_subject_generators[n.verb](n)}: {notification_message_generators[n.verb](n)}"
-        for n in notifications
-        if n.verb in notification_subject_generators and n.verb in notification_message_generators))
-    ses_client = boto3.client('ses')
-    ses_client.send_templated_email(
+def _send_ses_bulk_email(ses_client, template, destinations_by_recipient):
+    response = ses_client.send_bulk_templated_email(
         Source=settings.DEFAULT_FROM_EMAIL,
-        Destination={
-            'ToAddresses': [
-                recipient_email,
-            ],
-        },
-        Template=str(_('email-notification-ses-template-name')),  # Enforcing str here to bypass type validation
-        TemplateData=json.dumps({
-            'subject': message,
-            'message': notifications_messages_combined,
-            'link': f'{settings.WEB_APP_ROOT_URL}{link}',
-            'notifications_list_link': f"{settings.WEB_APP_ROOT_URL}{reverse('notifications_list')}"
-        })
+        Template=template,
+        DefaultTemplateData=json.dumps({'subject': '', 'message': '', 'link': '', 'notifications_list_link': ''}),
+        Destinations=[destination for _, destination in destinations_by_recipient],
     )
+    # Statuses are listed in the order of destinations
+    failed_statuses = [
+        (recipient_id, status)
+        for (recipient_id, _), status in zip(destinations_by_recipient, response['Status'])
+        if status['Status'] != 'Success'
+    ]
+    if failed_statuses:
+        logger.warning(f"Failed to deliver {len(failed_statuses)} of {len(destinations_by_recipient)} emails: "
+                       f"{[status for _, status in failed_statuses]}")
+    return (
+        [recipient_id for recipient_id, status in failed_statuses if status['Status'] in SES_RETRYABLE_STATUSES],
+        [recipient_id for recipient_id, status in failed_statuses if status['Status'] not in SES_RETRYABLE_STATUSES],
+    )
+
+
+def _send_notifications_page(notifications, http_session, ses_client, executor):
+    notifications_by_recipient = {}
+    for notification in notifications:
+        notifications_by_recipient.setdefault(notification.recipient_id, []).append(notification)
+    deliveries_by_notification = {
+        delivery.notification_id: delivery
+        for delivery in NotificationDelivery.objects.filter(notification__in=notifications)
+    }
+    new_deliveries = [
+        NotificationDelivery(notification_id=n.id) for n in notifications if n.id not in deliveries_by_notification]
+    existing_deliveries = list(deliveries_by_notification.values())
+    deliveries_by_notification.update({delivery.notification_id: delivery for delivery in new_deliveries})
 
+    def set_channel_status(recipient_id, status_field, status):
+        # Channels settled by the previous runs are kept as they are
+        for n in notifications_by_recipient[recipient_id]:
+            delivery = deliveries_by_notification[n.id]
+            if getattr(delivery, status_field) == NotificationDelivery.STATUS_PENDING:
+                setattr(delivery, status_field, status)
+
+    def is_channel_pending(recipient_id, status_field):
+        return any(getattr(deliveries_by_notification[n.id], status_field) == NotificationDelivery.STATUS_PENDING
+                   for n in notifications_by_recipient[recipient_id])
+
+    # Recipients sharing the same content get a single push, emails are grouped by localized template
+    push_recipients_by_content = {}
+    email_destinations_by_template = {}
+    for recipient_id, recipient_notifications in notifications_by_recipient.items():
+        notifications_with_actor = [n for n in recipient_notifications if n.actor is not None]
+        push_pending = is_channel_pending(recipient_id, 'push_status')
+        email_pending = is_channel_pending(recipient_id, 'email_status')
+        if not notifications_with_actor:
+            set_channel_status(recipient_id, 'push_status', NotificationDelivery.STATUS_SKIPPED)
+            set_channel_status(recipient_id, 'email_status', NotificationDelivery.STATUS_SKIPPED)
+            continue
+        first_notification = notifications_with_actor[0]
+        recipient = first_notification.recipient
+        with current_language_override(recipient.user_to_company.company.lang):
+            heading = _generate_notification_text(notification_subject_generators, first_notification)
+            message = _generate_notification_text(notification_message_generators, first_notification)
+            link = _generate_notification_text(notification_link_generators, first_notification)
+            if not all((heading, message, link)):
+                logger.warning(f"Missing some values - {heading}/{message}/{link} - "
+                               f"for a notification {first_notification.verb}")
+            if push_pending and all((heading, message, link)):
+                push_recipients_by_content.setdefault((heading, message, link), []).append(recipient_id)
+            elif push_pending:
+                set_channel_status(recipient_id, 'push_status', NotificationDelivery.STATUS_SKIPPED)
+            if email_pending and recipient.email and message and link:
+                notifications_messages_combined = '\n'.join((
+                    f"- {notification_subject_generators[n.verb](n)}: {notification_message_generators[n.verb](n)}"
+                    for n in notifications_with_actor
+                    if n.verb in notification_subject_generators and n.verb in notification_message_generators))
+                # Enforcing str here to bypass type validation
+                template = str(_('email-notification-ses-template-name'))
+                email_destinations_by_template.setdefault(template, []).append((recipient_id, {
+                    'Destination': {'ToAddresses': [recipient.email]},
+                    'ReplacementTemplateData': json.dumps({
+                        'subject': message,
+                        'message': notifications_messages_combined,
+                        'link': f'{settings.WEB_APP_ROOT_URL}{link}',
+                        'notifications_list_link': f"{settings.WEB_APP_ROOT_URL}{reverse('notifications_list')}"
+                    }),
+                }))
+            elif email_pending:
+                set_channel_status(recipient_id, 'email_status', NotificationDelivery.STATUS_SKIPPED)
+
+    # Deliveries are mapped to their channel & recipients, so the failed ones can be told apart
+    deliveries = {
+        executor.submit(_send_onesignal_notification, http_session, content, recipient_ids_batch):
+            ('push_status', recipient_ids_batch)
+        for content, recipient_ids in push_recipients_by_content.items()
+        for recipient_ids_batch in _split_into_batches(recipient_ids, ONESIGNAL_MAX_EXTERNAL_USER_IDS)
+    }
+    deliveries.update({
+        executor.submit(_send_ses_bulk_email, ses_client, template, destinations_batch):
+            ('email_status', [recipient_id for recipient_id, _ in destinations_batch])
+        for template, destinations in email_destinations_by_template.items()
+        for destinations_batch in _split_into_batches(destinations, SES_MAX_BULK_DESTINATIONS)
+    })
+    for delivery in as_completed(deliveries):
+        status_field, recipient_ids = deliveries[delivery]
+        try:
+            retryable_recipient_ids, rejected_recipient_ids = delivery.result()
+        except Exception:
+            logger.exception("Failed to deliver notifications batch")
+            retryable_recipient_ids, rejected_recipient_ids = recipient_ids, []
+        for recipient_id in rejected_recipient_ids:
+            set_channel_status(recipient_id, status_field, NotificationDelivery.STATUS_FAILED)
+        for recipient_id in set(recipient_ids) - set(retryable_recipient_ids) - set(rejected_recipient_ids):
+            set_channel_status(recipient_id, status_field, NotificationDelivery.STATUS_SENT)
 
-def _send_notifications_page(notifications):
-    all_unique_recipients = set(notifications.values_list('recipient_id', flat=True)) \
-        if isinstance(notifications, QuerySet) else set(map(lambda n: n.recipient.id, notifications))
-    for recipient_id in all_unique_recipients:
-        notifications_for_recipient = list(filter(lambda n: n.recipient.pk == recipient_id, notifications))
-        if notifications_for_recipient:
-            recipient = notifications_for_recipient[0].recipient
-            notifications_with_actor = list(filter(lambda n: n.actor is not None, notifications_for_recipient))
-            if notifications_with_actor:
-                with current_language_override(recipient.user_to_company.company.lang):
-                    _send_notifications_via_onesignal(recipient_id, notifications_with_actor)
-                    if recipient.email:
-                        _send_notifications_via_email(recipient.email, notifications_with_actor)
-            Notification.objects.filter(pk__in=map(lambda n: n.id, notifications_for_recipient)).update(emailed=True)
-        logger.debug(f"Sent {len(notifications_for_recipient)} notifications to recipient with ID: {recipient_id}")
+    # Only the channels still pending are sent again by the next run, until the attempts run out
+    settled_notification_ids = []
+    for notification_id, delivery in deliveries_by_notification.items():
+        if NotificationDelivery.STATUS_PENDING in (delivery.push_status, delivery.email_status):
+            delivery.attempts += 1
+            if delivery.attempts >= settings.NOTIFICATIONS_DELIVERY_MAX_ATTEMPTS:
+                logger.warning(f"Giving up on delivering notification {notification_id} "
+                               f"after {delivery.attempts} attempts")
+                if delivery.push_status == NotificationDelivery.STATUS_PENDING:
+                    delivery.push_status = NotificationDelivery.STATUS_FAILED
+                if delivery.email_status == NotificationDelivery.STATUS_PENDING:
+                    delivery.email_status = NotificationDelivery.STATUS_FAILED
+        if NotificationDelivery.STATUS_PENDING not in (delivery.push_status, delivery.email_status):
+            settled_notification_ids.append(notification_id)
+    with transaction.atomic():
+        NotificationDelivery.objects.bulk_create(new_deliveries)
+        NotificationDelivery.objects.bulk_update(existing_deliveries, ['push_status', 'email_status', 'attempts'])
+        Notification.objects.filter(pk__in=settled_notification_ids).update(emailed=True)
+    logger.debug(f"Sent {len(notifications)} notifications to {len(notifications_by_recipient)} recipients, "
+                 f"{len(notifications) - len(settled_notification_ids)} notifications left to be sent again")
 
 
 def send_notifications(notifications_qs):
-    qs_to_paginate = notifications_qs.order_by('id')
-    notifications_count = qs_to_paginate.count()
+    qs_to_paginate = notifications_qs.select_related('recipient__user_to_company__company')\
+        .prefetch_related('actor').order_by('id')
     page_size = 1000
-    offset = 0
-    while offset < notifications_count:
-        _send_notifications_page(qs_to_paginate[offset:offset + page_size])
-        offset += page_size
+    http_session = requests.Session()
+    http_session.headers.update({
+        "Content-Type": "application/json; charset=utf-8",
+        "Authorization": f"Basic {settings.ONESIGNAL_REST_API_KEY}",
+    })
+    http_adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.NOTIFICATIONS_DELIVERY_WORKERS)
+    http_session.mount('https://', http_adapter)
+    http_session.mount('http://', http_adapter)
+    # Unlike sessions, boto3 clients are safe to be shared among threads
+    ses_client = boto3.client('ses')
+    with http_session, ThreadPoolExecutor(max_workers=settings.NOTIFICATIONS_DELIVERY_WORKERS) as executor:
+        # Paginating by ID since sent notifications may drop out of the queryset
+        last_id = 0
+        while True:
+            page = list(qs_to_paginate.filter(id__gt=last_id)[:page_size])
+            if not page:
+                break
+            _send_notifications_page(page, http_session, ses_client, executor)
+            last_id = page[-1].id
+
+
+def get_unread_notifications_count(user_id):
+    """Reads unread notifications set maintained in Redis, filling it from the DB if missing."""
+    unread_qs = Notification.objects.filter(recipient_id=user_id, unread=True)
+    try:
+        redis_client = RedisClient()
+        count = redis_client.get_unread_notifications_count(user_id)
+        if count is None:
+            redis_client.start_unread_notifications_filling(user_id)
+            notification_ids = list(unread_qs.values_list('id', flat=True))
+            redis_client.finish_unread_notifications_filling(user_id, notification_ids)
+            count = redis_client.get_unread_notifications_count(user_id)
+    except RedisError:
+        return unread_qs.count()
+    return count
+
 
+def get_notifications_group_name(user_id):
+    return f'{settings.NOTIFICATIONS_CONSUMERS_GROUP_PREFIX}.{user_id}'
 
-def create_notification(*notify_args, **notify_kwargs):
-    signal_results = notify.send(*notify_args, **notify_kwargs)
-    new_notifications = next(results for handler, results in signal_results if handler == notify_handler)
+
+def get_driver_group_name(driver_id):
+    return f'{settings.DRIVER_CONSUMERS_GROUP_PREFIX}-{driver_id}'
+
+
+def get_driver_command_id(action, route_id):
+    return f'{action}-{route_id}'
+
+
+def create_notifications_bulk(actor, recipients, verb, level, **data):
+    """Creates the notification for every recipient with a single INSERT, returns IDs of created notifications."""
+    timestamp = timezone.now()
+    actor_content_type = ContentType.objects.get_for_model(actor)
+    new_notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient.pk, actor_content_type=actor_content_type, actor_object_id=actor.pk,
+            verb=str(verb), level=level, timestamp=timestamp, data=data or None)
+        for recipient in recipients
+    ])
+    if not new_notifications:
+        return []
+
+    new_notification_ids = defaultdict(list)
     for note in new_notifications:
-        async_to_sync(get_channel_layer().group_send)(
-            settings.NOTIFICATIONS_CONSUMERS_GROUP_NAME,
-            {
-                'type': 'new_notification',
-                'notification_id': note.id,
-                'recipient_id': note.recipient.id,
-            }
-        )
+        new_notification_ids[str(note.recipient_id)].append(note.id)
+    # Unread sets & sockets are updated by the dispatcher, keeping Redis out of the caller's transaction
+    OutboxEvent.objects.create(kind=OutboxEvent.KIND_NEW_NOTIFICATIONS, payload=new_notification_ids)
+    transaction.on_commit(dispatch_outbox_events.delay)
+    return [note.id for note in new_notifications]
+
+
+async def _group_send_all(messages):
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*(channel_layer.group_send(group_name, message) for group_name, message in messages))
+
+
+def _dispatch_outbox_events_batch(events):
+    new_notification_ids = defaultdict(list)
+    for event in events:
+        if event.kind == OutboxEvent.KIND_NEW_NOTIFICATIONS:
+            for user_id, notification_ids in event.payload.items():
+                new_notification_ids[int(user_id)].extend(notification_ids)
+
+    # Failed batch is dispatched again as a whole, adding to the unread sets keeps that from counting twice
+    RedisClient().add_unread_notifications(new_notification_ids)
+    # Only recipient's own sockets are woken up, once per recipient
+    async_to_sync(_group_send_all)([
+        (get_notifications_group_name(recipient_id), {
+            'type': 'new_notification',
+            'recipient_id': recipient_id,
+        })
+        for recipient_id in new_notification_ids
+    ])
+
+
+@shared_task
+def dispatch_outbox_events():
+    batch_size = settings.OUTBOX_DISPATCH_BATCH_SIZE
+    while True:
+        # Locked rows are left to the concurrent dispatcher, failed batch is kept for the next run
+        with transaction.atomic():
+            events = list(OutboxEvent.objects.select_for_update(skip_locked=True)[:batch_size])
+            if not events:
+                return
+            _dispatch_outbox_events_batch(events)
+            OutboxEvent.objects.filter(pk__in=[event.id for event in events]).delete()
+        logger.debug(f"Dispatched {len(events)} outbox events")
+        if len(events) < batch_size:
+            return
 
 
 @shared_task
@@ -162,3 +362,263 @@ def send_periodic_notifications(priority_value):
     notifications_qs = Notification.objects.filter(
         level=notification_levels_resolver[priority_enum].value, emailed=False, unread=True)
     send_notifications(notifications_qs)
+
+
+@shared_task
+def reconcile_unread_notifications():
+    # Sets are refilled from the DB on the next read, this fixes the drift and drops sets of inactive users
+    RedisClient().drop_unread_notifications()
+    logger.debug("Unread notifications sets dropped")
+
+
+REPORT_JOB_PERIOD_DATES_FORMAT = '%Y-%m-%d %H:%M:%S'
+REPORT_JOB_CHUNK_DATES_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def _build_report_job_chart_view(job, params):
+    request = HttpRequest()
+    request.user = job.user
+    request.uac = UserAccessControl(lambda: request.user)
+    request.GET = QueryDict(mutable=True)
+    request.GET.update(params)
+    view = report_job_chart_views[job.report_name]()
+    view.setup(request)
+    return view
+
+
+def _to_json_compatible_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def split_report_job_params(params):
+    date_from = params.get('datetime_from', None)
+    date_to = params.get('datetime_to', None)
+    if params.get('date_range', None) != 'date_period' or not date_from or not date_to:
+        return [params]
+
+    # Chunks are aligned to month boundaries so day-grouped rows never span across chunks
+    return [
+        dict(params, **{
+            'datetime_from': chunk_start.strftime(REPORT_JOB_CHUNK_DATES_FORMAT),
+            'datetime_to': chunk_end.strftime(REPORT_JOB_CHUNK_DATES_FORMAT),
+        })
+        for chunk_start, chunk_end in split_period_by_months(
+            datetime.strptime(date_from, REPORT_JOB_PERIOD_DATES_FORMAT),
+            datetime.strptime(date_to, REPORT_JOB_PERIOD_DATES_FORMAT))
+    ]
+
+
+@shared_task
+def start_report_job(job_id):
+    try:
+        job = ReportJob.objects.get(pk=job_id)
+    except ReportJob.DoesNotExist:
+        raise Warning(f"There's no report job with ID {job_id}")
+
+    chunks_params = split_report_job_params(job.params)
+    if not chunks_params:
+        _fail_report_job(job.id, 'Report period is empty')
+        return
+
+    with transaction.atomic():
+        chunks = ReportJobChunk.objects.bulk_create([
+            ReportJobChunk(job=job, index=index, params=chunk_params)
+            for index, chunk_params in enumerate(chunks_params)
+        ])
+        job.status = ReportJob.STATUS_IN_PROGRESS
+        job.chunks_total = len(chunks)
+        job.mtime = timezone.now()
+        job.save()
+
+    logger.debug(f"Report job {job_id} ({job.report_name}) was split into {len(chunks)} chunk(s)")
+    for chunk in chunks:
+        execute_report_job_chunk.delay(chunk.id)
+
+
+def _fail_report_job(job_id, error_message):
+    ReportJob.objects.filter(pk=job_id).update(
+        status=ReportJob.STATUS_FAILED, error_message=error_message, mtime=timezone.now())
+    # Results of the sibling chunks are useless once the job failed
+    ReportJobChunk.objects.filter(job_id=job_id).delete()
+
+
+@shared_task
+def execute_report_job_chunk(chunk_id):
+    try:
+        chunk = ReportJobChunk.objects.select_related('job__user').get(pk=chunk_id)
+    except ReportJobChunk.DoesNotExist:
+        raise Warning(f"There's no report job chunk with ID {chunk_id}")
+    if chunk.job.status != ReportJob.STATUS_IN_PROGRESS:
+        return
+
+    try:
+        # Date range params are interpreted in the timezone of the user who requested the report
+        with timezone.override(chunk.job.timezone):
+            view = _build_report_job_chart_view(chunk.job, chunk.params)
+            rows = view.filter_queryset(view.model.objects.all())
+            result = [{key: _to_json_compatible_value(value) for key, value in row.items()} for row in rows]
+    except Exception as e:
+        _fail_report_job(chunk.job_id, str(e))
+        raise
+
+    with transaction.atomic():
+        job = ReportJob.objects.select_for_update().get(pk=chunk.job_id)
+        # Sibling chunk might have failed meanwhile
+        if job.status != ReportJob.STATUS_IN_PROGRESS:
+            return
+        chunk.result = result
+        chunk.save(update_fields=['result'])
+        job.chunks_done += 1
+        # Last percent is reserved for the chunks merging step
+        job.progress = min(round(job.chunks_done / job.chunks_total * 100), 99)
+        job.mtime = timezone.now()
+        job.save(update_fields=['chunks_done', 'progress', 'mtime'])
+
+    if job.chunks_done == job.chunks_total:
+        complete_report_job.delay(job.id)
+
+
+@shared_task
+def complete_report_job(job_id):
+    try:
+        job = ReportJob.objects.select_related('user').get(pk=job_id)
+    except ReportJob.DoesNotExist:
+        raise Warning(f"There's no report job with ID {job_id}")
+
+    rows = [row for chunk in job.chunks.all() for row in chunk.result]
+    try:
+        with timezone.override(job.timezone):
+            result = _build_report_job_chart_view(job, job.params).prepare_result_json(rows)
+    except Exception as e:
+        _fail_report_job(job.id, str(e))
+        raise
+
+    job.result_data = gzip.compress(json.dumps(result, separators=(',', ':')).encode('utf-8'))
+    job.status = ReportJob.STATUS_SUCCESS
+    job.progress = 100
+    job.mtime = timezone.now()
+    job.save()
+    job.chunks.all().delete()
+    logger.debug(f"Report job {job_id} completed, {len(rows)} row(s) merged from {job.chunks_total} chunk(s)")
+
+
+def get_device_state_group_name(company_id):
+    return f'{settings.DEVICE_STATE_CONSUMERS_GROUP_PREFIX}.{company_id or settings.MAP_DATA_VERSIONS_ALL_KEY}'
+
+
+def schedule_coalesced_device_task(task, device_type, device_id, countdown, *task_args):
+    """Runs the task once committed, calls made before the task starts are coalesced into the single run."""
+    def schedule():
+        if RedisClient().claim_pending_device_task(task.name, device_type, device_id, countdown):
+            task.apply_async(task_args, countdown=countdown)
+
+    transaction.on_commit(schedule)
+
+
+def release_coalesced_device_task(task, device_type, device_id):
+    # Released before the task reads device state, so state committed meanwhile gets its own run
+    RedisClient().release_pending_device_task(task.name, device_type, device_id)
+
+
+def get_device_conditions_to_notify(device_type, device_id, active_conditions):
+    """Takes priorities of active device conditions, returns ones which got active, escalated or are due to
+    be notified about again. Conditions missing from the dict are considered inactive."""
+    redis_client = RedisClient()
+    states = redis_client.get_device_notification_states(device_type, device_id)
+    now = time.time()
+    new_states = {}
+    conditions_to_notify = []
+    for condition, priority in active_conditions.items():
+        notify, new_states[condition] = resolve_condition_notification(
+            states.get(condition, None), priority.value, now, settings.DEVICE_NOTIFICATIONS_RENOTIFY_INTERVAL_SECONDS)
+        if notify:
+            conditions_to_notify.append(condition)
+    redis_client.set_device_notification_states(device_type, device_id, new_states)
+    return conditions_to_notify
+
+
+def schedule_map_bounds_extension(device_type, lng, lat, company_id):
+    """Extends cached map bounds with the device location once committed."""
+    def extend():
+        try:
+            RedisClient().extend_map_bounds(device_type, lng, lat, company_id)
+        except RedisError:
+            # Cached bounds are only a shortcut, devices still get into them once recomputed
+            logger.warning(f"Failed to extend {device_type} map bounds of company {company_id}", exc_info=True)
+
+    transaction.on_commit(extend)
+
+
+def schedule_map_bounds_drop(device_type, *company_ids):
+    """Drops cached map bounds once committed, so they get recomputed on the next read."""
+    def drop():
+        try:
+            RedisClient().drop_map_bounds(device_type, *company_ids)
+        except RedisError:
+            # Bounds left too wide get shrunk by the periodic refresh anyway
+            logger.warning(f"Failed to drop {device_type} map bounds of companies {company_ids}", exc_info=True)
+
+    transaction.on_commit(drop)
+
+
+def schedule_device_state_delta(device_type, device_id):
+    schedule_coalesced_device_task(
+        send_device_state_delta, device_type, device_id, settings.DEVICE_STATE_DELTA_COALESCE_SECONDS,
+        device_type, device_id)
+
+
+def schedule_device_addition_delta(device_type, device_id):
+    # Not coalesced, so the addition flag can't be lost in a pending state delta
+    transaction.on_commit(lambda: send_device_state_delta.delay(device_type, device_id, True))
+
+
+def schedule_device_removal_delta(device_type, device_id, *company_ids):
+    transaction.on_commit(lambda: send_device_removal_delta.delay(device_type, device_id, *company_ids))
+
+
+def _send_device_state_delta_to_groups(delta, company_ids):
+    event = {'type': 'device_state', 'delta': delta}
+    for company_id in company_ids:
+        async_to_sync(get_channel_layer().group_send)(get_device_state_group_name(company_id), event)
+
+
+@shared_task
+def send_device_state_delta(device_type, device_id, added=False):
+    from app.models import Container
+    from apps.sensors.models import Sensor
+
+    release_coalesced_device_task(send_device_state_delta, device_type, device_id)
+    device_model = Sensor if device_type == CompanyDeviceProfile.SENSOR.value else Container
+    device = device_model.objects.filter(pk=device_id).values(
+        'company_id', 'fullness', 'battery', 'has_active_errors', 'on_active_route',
+        location_x=Func('location', function='ST_X', output_field=FloatField()),
+        location_y=Func('location', function='ST_Y', output_field=FloatField())).first()
+    if device is None:
+        raise Warning(f"There's no {device_type} device with ID {device_id}")
+
+    fullness = device['fullness']
+    delta = {
+        'device_type': device_type,
+        'id': device_id,
+        'fullness': {
+            'title': Fullness.get_title(fullness) if fullness is not None else None,
+            'value': fullness,
+        },
+        'battery': device['battery'],
+        'any_active_errors': device['has_active_errors'],
+        'any_active_routes': device['on_active_route'],
+        'location': {'x': device['location_x'], 'y': device['location_y']},
+    }
+    if added:
+        delta['added'] = True
+    _send_device_state_delta_to_groups(delta, {device['company_id'], None})
+
+
+@shared_task
+def send_device_removal_delta(device_type, device_id, *company_ids):
+    # Company ID of None stands for the group of all devices
+    _send_device_state_delta_to_groups({'device_type': device_type, 'id': device_id, 'removed': True}, company_ids)
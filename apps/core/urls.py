@@ -1,10 +1,20 @@
 from django.urls import path
 
 from apps.core.middleware import license_check_exempt
-from apps.core.views import CustomPasswordChangeView, TimezoneChangeView
+from apps.core.views import (
+    CustomPasswordChangeView, TimezoneChangeView, CreateReportJobView, ReportJobsListView, ReportJobStatusView,
+    ReportJobDownloadView,
+)
 
 
 account_urlpatterns = ([
     path('change-password/', license_check_exempt(CustomPasswordChangeView.as_view()), name='change_password'),
     path('change-timezone/', license_check_exempt(TimezoneChangeView.as_view()), name='change_timezone'),
 ], 'account')
+
+report_jobs_urlpatterns = ([
+    path('', ReportJobsListView.as_view(), name='list'),
+    path('create/', CreateReportJobView.as_view(), name='create'),
+    path('<int:pk>/status/', ReportJobStatusView.as_view(), name='status'),
+    path('<int:pk>/download/', ReportJobDownloadView.as_view(), name='download'),
+], 'report_jobs')
@@ -1,3 +1,12 @@
+import math
+import numpy as np
+
+from datetime import timedelta
+
+
+WEB_MERCATOR_HALF_SIZE = 20037508.342789244
+
+
 def split_value_among_segments(value, segments, set_segment_value, clip_peak=True):
     if len(segments) == 0:
         raise ValueError('Segments should be non-empty iterable')
@@ -30,3 +39,84 @@ notification_subject_generators = {}
 notification_message_generators = {}
 
 notification_link_generators = {}
+
+
+# Chart views which can be executed as background report jobs, keyed by report name
+report_job_chart_views = {}
+
+
+def split_period_by_months(period_start, period_end):
+    chunks = []
+    chunk_start = period_start
+    while chunk_start <= period_end:
+        month_start = chunk_start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if month_start.month == 12:
+            next_month_start = month_start.replace(year=month_start.year + 1, month=1)
+        else:
+            next_month_start = month_start.replace(month=month_start.month + 1)
+        # Chunks end right before the next month starts, so no sub-second records are left between chunks
+        chunks.append((chunk_start, min(next_month_start - timedelta(microseconds=1), period_end)))
+        chunk_start = next_month_start
+    return chunks
+
+
+def lttb_downsample_indices(values, threshold):
+    """
+    Picks indices of the points to keep using Largest-Triangle-Three-Buckets algorithm. Points are considered
+    equidistant, missing values are treated as zeroes. The first & the last points are always kept.
+    """
+    size = len(values)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    y = np.nan_to_num(np.array(values, dtype=float))
+    x = np.arange(size, dtype=float)
+    # Edges of the buckets for all the points except the first & the last ones
+    edges = np.linspace(1, size - 1, threshold - 1).astype(int)
+    result = np.empty(threshold, dtype=int)
+    result[0], result[-1] = 0, size - 1
+
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i < threshold - 3:
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        areas = np.abs((x[selected] - next_x) * (bucket_y - y[selected]) -
+                       (x[selected] - bucket_x) * (next_y - y[selected]))
+        selected = start + int(areas.argmax())
+        result[i + 1] = selected
+    return result
+
+
+def get_tile_mercator_bounds(z, x, y, buffer_ratio=0.0):
+    tile_size = 2 * WEB_MERCATOR_HALF_SIZE / 2 ** z
+    buffer = tile_size * buffer_ratio
+    west = -WEB_MERCATOR_HALF_SIZE + x * tile_size
+    north = WEB_MERCATOR_HALF_SIZE - y * tile_size
+    return west - buffer, north - tile_size - buffer, west + tile_size + buffer, north + buffer
+
+
+def mercator_to_lng_lat(mx, my):
+    lng = mx / WEB_MERCATOR_HALF_SIZE * 180
+    lat = math.degrees(2 * math.atan(math.exp(my / WEB_MERCATOR_HALF_SIZE * math.pi)) - math.pi / 2)
+    return lng, lat
+
+
+def resolve_condition_notification(state, priority, now, renotify_interval):
+    """Edge-triggered notification decision for a device condition.
+
+    State is [priority, notified_at] of the condition or None if it wasn't active, priority is None for inactive
+    condition (lower value is more severe). Returns whether to notify and the new condition state.
+    """
+    if priority is None:
+        return False, None
+    if state is None:
+        return True, [priority, now]
+    previous_priority, notified_at = state
+    if priority < previous_priority or now - notified_at >= renotify_interval:
+        return True, [priority, now]
+    # De-escalation is remembered to notify about the following escalation again
+    return False, [priority, notified_at]
@@ -1,8 +1,10 @@
 import json as py_json
+import logging
 import math
 import mimetypes
 import os
 import pandas as pd
+import time
 import ujson as json
 
 from asgiref.sync import async_to_sync
@@ -15,10 +17,12 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.views import PasswordChangeView
 from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 from django.db.models import Q, Count, F
 from django.http import Http404, HttpResponseForbidden, JsonResponse, HttpResponseBadRequest, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.text import capfirst
 from django.utils.timesince import timesince
@@ -26,27 +30,36 @@ from django.utils.translation import ugettext_lazy as _
 from django.views import generic
 from django.views.generic.edit import FormView
 from fbprophet import Prophet
+from functools import partial
 from notifications.models import Notification
 from pathlib import Path
+from redis.exceptions import RedisError
 from table.views import FeedDataView
 
 from apps.core.context_processors import MODAL_MESSAGE_EXTRA_TAGS, get_return_to_url
 from apps.core.data import FULLNESS
 from apps.core.forms import UserTimezoneChangeForm, NotificationsSettingsForm
 from apps.core.middleware import license_check_exempt
-from apps.core.models import FeatureFlag, UsersToCompany, Sectors
-from apps.core.reports import prepare_stacked_line_chart_result_json, FusionChartTypes, TIMESINCE_STRINGS
+from apps.core.models import FeatureFlag, UsersToCompany, Sectors, ReportJob
+from apps.core.reports import (
+    prepare_stacked_line_chart_result_json, FusionChartTypes, TIMESINCE_STRINGS, check_report_access,
+)
 from apps.core.tables import NotificationTable
-from apps.core.tasks import NotificationLevels
-from apps.core.utils import notification_message_generators, notification_link_generators
+from apps.core.tasks import (
+    NotificationLevels, REPORT_JOB_PERIOD_DATES_FORMAT, start_report_job, get_driver_group_name, get_driver_command_id,
+)
+from apps.core.utils import notification_message_generators, notification_link_generators, report_job_chart_views
 from app.models import (
     Route, RoutePoints, Routes, RoutesDrivers, ROUTE_STATUS_ABORTED_BY_OPERATOR, FINISHED_ROUTE_STATUSES,
+    refresh_devices_map_flags, split_route_points_devices,
 )
 from app.helpers import send_push
 from app.redis_client import RedisClient
 from app.utils import convert_web_app_route_points, validate_route_points
 
 
+logger = logging.getLogger('app_main')
+
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
 LOW_BATTERY_LEVEL_ICON_DATA_URL = Path(os.path.join(base_dir, 'assets', 'low_battery_level_icon_data_url')).read_text()
@@ -135,25 +148,36 @@ def create_top_level_static_view(file_name):
     return serve_file_view
 
 
-def send_route(route):
-    new_route_command = json.dumps({
-        'action': 'new_route',
-        'created': route.ctime.isoformat(),
-        'id': route.id,
-        'points': route.route_json,
+def send_driver_command(driver_id, action, route_id, superseded_actions=(), **command_fields):
+    """Queues the route command to be replayed on connects until acknowledged & pushes it to driver's sockets,
+    returns if the driver is online."""
+    command_id = get_driver_command_id(action, route_id)
+    command = json.dumps({
+        'action': action,
+        'id': route_id,
+        'command_id': command_id,
+        'queued_at': time.time(),
+        **command_fields,
     })
-    driver_id = route.user_id
-    redis = RedisClient()
-    redis.set_route_to_send(driver_id, new_route_command)
+    is_driver_online = RedisClient().queue_driver_command(
+        driver_id, command_id, command,
+        [get_driver_command_id(superseded_action, route_id) for superseded_action in superseded_actions])
     async_to_sync(get_channel_layer().group_send)(
-        settings.MOBILE_API_CONSUMERS_GROUP_NAME,
+        get_driver_group_name(driver_id),
         {
-            'type': 'new_route',
-            'driver_id': driver_id,
-            'command': new_route_command,
+            'type': 'driver_command',
+            'action': action,
+            'command': command,
         }
     )
-    if not redis.is_driver_online(driver_id):
+    return is_driver_online
+
+
+def send_route(route):
+    driver_id = route.user_id
+    is_driver_online = send_driver_command(
+        driver_id, 'new_route', route.id, created=route.ctime.isoformat(), points=route.route_json)
+    if not is_driver_online:
         send_push(driver_id, settings.NEW_ROUTE_PUSH_MESSAGE_CODE)
 
 
@@ -210,33 +234,50 @@ class BaseCreateRouteView(LoginRequiredMixin, generic.View):
         if any(not validate_route_points(route['points']) for route in req_payload['data']):
             return HttpResponseBadRequest('One or more routes have invalid points data.')
 
-        base_route = None
+        points_by_driver = {}
         for route_data in req_payload['data']:
-            driver_id = route_data['id']
-            if base_route is None:
-                base_route = Routes.objects.create(company=company)
             points = convert_web_app_route_points(route_data['points'], settings.DEFAULT_CONTAINER_VOLUME)
             if points:
-                RoutesDrivers.finish_routes(driver_id)
-                RoutePoints.close_route_points(driver_id, ROUTE_STATUS_ABORTED_BY_OPERATOR)
-                Routes.close_parent_routes_if_possible(driver_id)
+                points_by_driver[route_data['id']] = points
 
-                unfinished_routes_status_filter = ~Q(status__in=FINISHED_ROUTE_STATUSES) | Q(status__isnull=True)
-                Route.objects.filter(unfinished_routes_status_filter, user_id=driver_id). \
-                    update(status=ROUTE_STATUS_ABORTED_BY_OPERATOR)
+        with transaction.atomic():
+            base_route = Routes.objects.create(company=company)
+            if points_by_driver:
+                driver_ids = list(points_by_driver.keys())
+                RoutesDrivers.finish_drivers_routes(driver_ids)
+                RoutePoints.close_drivers_route_points(driver_ids, ROUTE_STATUS_ABORTED_BY_OPERATOR)
+                Routes.close_drivers_parent_routes_if_possible(driver_ids)
 
-                route = Route.objects.create(user_id=driver_id, route_json=points, parent_route=base_route)
-                for point in points:
+                unfinished_routes_status_filter = ~Q(status__in=FINISHED_ROUTE_STATUSES) | Q(status__isnull=True)
+                aborted_routes_qs = Route.objects.filter(unfinished_routes_status_filter, user_id__in=driver_ids)
+                aborted_routes = list(aborted_routes_qs.values_list('user_id', 'id'))
+                aborted_routes_qs.update(status=ROUTE_STATUS_ABORTED_BY_OPERATOR)
+                # Drivers don't need to start the aborted routes anymore, if not received them yet
+                for driver_id, route_id in aborted_routes:
+                    transaction.on_commit(partial(
+                        send_driver_command, driver_id, 'abort_route', route_id, superseded_actions=('new_route',)))
+
+            routes = Route.objects.bulk_create([
+                Route(user_id=driver_id, route_json=points, parent_route=base_route)
+                for driver_id, points in points_by_driver.items()
+            ])
+            route_points = []
+            for route in routes:
+                for point in route.route_json:
                     route_point_attribs = {
-                        'user_id': driver_id,
+                        'user_id': route.user_id,
                         'parent_route': base_route,
                         'route': route,
                         'fullness': point['fullness'],
                         'volume': point['volume'],
                     }
                     route_point_attribs.update(self.get_route_point_attributes(point))
-                    RoutePoints.objects.create(**route_point_attribs)
-                send_route(route)
+                    route_points.append(RoutePoints(**route_point_attribs))
+            RoutePoints.objects.bulk_create(route_points)
+            refresh_devices_map_flags(*split_route_points_devices(
+                [(route_point.container_id, route_point.sensor_id) for route_point in route_points]))
+            for route in routes:
+                transaction.on_commit(partial(send_route, route))
         # TODO: Fix this interaction model
         # Overall AJAX POST + manual redirect doesn't fit current post back approach
         # Could be kept with some tweaks for the future SPA, though
@@ -426,11 +467,21 @@ class NotificationsListView(LoginRequiredMixin, generic.TemplateView):
         return context
 
 
+def _remove_unread_notifications(user_id, notification_ids):
+    # Notifications are marked read in the DB already, the drift is fixed once the sets are reconciled
+    try:
+        RedisClient().remove_unread_notifications(user_id, notification_ids)
+    except RedisError:
+        logger.warning(f'Failed to remove read notifications of user {user_id}', exc_info=True)
+
+
 class FollowNotificationView(LoginRequiredMixin, generic.View):
     def get(self, request, *args, **kwargs):
         notification = get_object_or_404(Notification, pk=kwargs.get('pk'))
-        notification.unread = False
-        notification.save()
+        if notification.unread:
+            notification.unread = False
+            notification.save()
+            _remove_unread_notifications(notification.recipient_id, [notification.id])
         redirect_url = notification_link_generators[notification.verb](notification) \
             if notification.verb in notification_link_generators else '/'
         return redirect(redirect_url)
@@ -438,7 +489,10 @@ class FollowNotificationView(LoginRequiredMixin, generic.View):
 
 class MarkAllNotificationsReadView(LoginRequiredMixin, generic.View):
     def get(self, request, *args, **kwargs):
-        request.user.notifications.mark_all_as_read()
+        # Only notifications read here are removed from the set, new ones may be recorded meanwhile
+        notification_ids = list(request.user.notifications.unread().values_list('id', flat=True))
+        request.user.notifications.filter(pk__in=notification_ids).mark_all_as_read()
+        _remove_unread_notifications(request.user.id, notification_ids)
         messages.success(request, 'allNotificationsRead', MODAL_MESSAGE_EXTRA_TAGS)
         return redirect('/')
 
@@ -467,3 +521,65 @@ class NotificationsSettingsFormView(LoginRequiredMixin, FormView):
 
     def get_success_url(self):
         return reverse('notifications_list')
+
+
+class CreateReportJobView(LoginRequiredMixin, generic.View):
+    def post(self, request, *args, **kwargs):
+        if not check_report_access(request):
+            return HttpResponseForbidden()
+
+        params = request.POST.dict()
+        params.pop('csrfmiddlewaretoken', None)
+        report_name = params.pop('report', None)
+        if report_name not in report_job_chart_views:
+            return HttpResponseBadRequest(f'Unknown report {report_name}')
+        period_dates = {}
+        for date_param in ('datetime_from', 'datetime_to'):
+            if params.get(date_param, None):
+                try:
+                    period_dates[date_param] = datetime.strptime(params[date_param], REPORT_JOB_PERIOD_DATES_FORMAT)
+                except ValueError:
+                    return HttpResponseBadRequest(f'Invalid {date_param} value')
+        if len(period_dates) == 2 and period_dates['datetime_from'] > period_dates['datetime_to']:
+            return HttpResponseBadRequest('datetime_from is later than datetime_to')
+
+        job = ReportJob.objects.create(
+            user=request.user, report_name=report_name, params=params, timezone=timezone.get_current_timezone())
+        start_report_job.delay(job.id)
+        return JsonResponse({
+            'id': job.id,
+            'status_url': reverse('report_jobs:status', kwargs={'pk': job.id}),
+            'list_url': reverse('report_jobs:list'),
+        })
+
+
+class ReportJobsListView(LoginRequiredMixin, generic.TemplateView):
+    template_name = 'core/report_jobs/list.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        jobs = list(self.request.user.report_jobs.defer('result_data')[:50])
+        context['jobs'] = jobs
+        context['any_jobs_running'] = any(not job.is_finished for job in jobs)
+        return context
+
+
+class ReportJobStatusView(LoginRequiredMixin, generic.View):
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(request.user.report_jobs.defer('result_data'), pk=kwargs.get('pk'))
+        return JsonResponse({
+            'status': job.status,
+            'progress': job.progress,
+            'download_url': reverse('report_jobs:download', kwargs={'pk': job.id})
+            if job.status == ReportJob.STATUS_SUCCESS else None,
+        })
+
+
+class ReportJobDownloadView(LoginRequiredMixin, generic.View):
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(request.user.report_jobs, pk=kwargs.get('pk'), status=ReportJob.STATUS_SUCCESS)
+        response = HttpResponse(bytes(job.result_data), content_type='application/json')
+        # Result is stored gzip-compressed already, so it's served as is
+        response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'attachment; filename="{job.report_name.replace(":", "-")}-{job.id}.json"'
+        return response
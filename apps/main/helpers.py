@@ -1,4 +1,8 @@
+from django.contrib.gis.db.models import Extent
+from redis.exceptions import RedisError
+
 from app.models import Container
+from app.redis_client import RedisClient
 from apps.core.helpers import CompanyDeviceProfile
 from apps.sensors.models import Sensor, CompanySensorsLicense
 
@@ -44,3 +48,42 @@ def get_effective_company_device_profile(request):
 
 def is_sector_referenced(sector):
     return sector.container_set.count() > 0
+
+
+def _get_profile_device_model(device_profile):
+    return Sensor if device_profile == CompanyDeviceProfile.SENSOR else Container
+
+
+def compute_map_bounds(device_profile):
+    """Returns [lng_min, lat_min, lng_max, lat_max] bounds of devices per company, None key is for all devices."""
+    device_model = _get_profile_device_model(device_profile)
+    companies_extents = device_model.objects.filter(company__isnull=False)\
+        .values('company_id').annotate(extent=Extent('location')).order_by()
+    result = {row['company_id']: list(row['extent']) for row in companies_extents if row['extent'] is not None}
+    total_extent = device_model.objects.aggregate(extent=Extent('location'))['extent']
+    if total_extent is not None:
+        result[None] = list(total_extent)
+    return result
+
+
+def get_company_map_bounds(device_profile, company_id):
+    # Cached bounds are extended by data parsers and recomputed by refresh_map_bounds task
+    try:
+        bounds = RedisClient().get_map_bounds(device_profile.value, company_id)
+    except RedisError:
+        bounds = None
+    if bounds is not None:
+        return bounds
+
+    devices_queryset = _get_profile_device_model(device_profile).objects.all()
+    if company_id is not None:
+        devices_queryset = devices_queryset.filter(company_id=company_id)
+    extent = devices_queryset.aggregate(extent=Extent('location'))['extent']
+    if extent is None:
+        return None
+    bounds = list(extent)
+    try:
+        RedisClient().set_map_bounds(device_profile.value, {company_id: bounds})
+    except RedisError:
+        pass
+    return bounds
@@ -8,10 +8,13 @@ from django.contrib.auth import get_user_model
 from django.db import transaction
 from sentry_sdk import capture_message
 
+from app.redis_client import RedisClient
+from apps.core.helpers import CompanyDeviceProfile
 from apps.core.models import Company
 from apps.core.report_data_generation import get_record_generation_interval
 from app.models import Container
 from app.tasks import generate_report_data_for_bins
+from apps.main.helpers import compute_map_bounds
 from apps.sensors.models import Sensor
 from apps.sensors.tasks import generate_report_data_for_sensors
 
@@ -97,3 +100,13 @@ def generate_report_data():
     utc_now = datetime.utcnow().replace(tzinfo=pytz.utc)
     generate_report_data_for_bins(Container.objects.filter(autogenerate_data=True), utc_now, record_generation_interval)
     generate_report_data_for_sensors(Sensor.objects.filter(autogenerate_data=True), utc_now, record_generation_interval)
+
+
+@shared_task
+def refresh_map_bounds():
+    # Bounds are only extended on devices relocation, so shrinking is up to this task
+    redis_client = RedisClient()
+    for device_profile in CompanyDeviceProfile:
+        bounds_by_company = compute_map_bounds(device_profile)
+        redis_client.set_map_bounds(device_profile.value, bounds_by_company, replace=True)
+        logger.debug(f"Map bounds of {device_profile.value} devices refreshed for {len(bounds_by_company)} companies")
@@ -8,7 +8,7 @@ from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError, transaction
-from django.db.models import Func, Min, Max, ExpressionWrapper, FloatField, Count, Exists, OuterRef, Q
+from django.db.models import Count, Exists, OuterRef, Q
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.shortcuts import render, redirect
 from django.urls import reverse
@@ -32,7 +32,7 @@ from apps.sensors.models import (
     Sensor, ErrorType as SensorErrorType, Error as SensorError, CompanySensorsLicense, SensorsLicenseKey,
 )
 from apps.main.forms import RegisterCompanyForm, ExtendLicenseForm
-from apps.main.helpers import get_effective_company_device_profile
+from apps.main.helpers import get_effective_company_device_profile, get_company_map_bounds
 from apps.main.middleware import check_license_is_valid, get_license
 
 
@@ -147,8 +147,9 @@ def view_main(request):
         request.session['device_profile_override'] = device_profile.value
 
     device_profile = get_effective_company_device_profile(request)
-    devices_queryset = _get_devices_queryset(
-        request, Sensor if device_profile == CompanyDeviceProfile.SENSOR else Container)
+    map_bounds = None
+    if request.uac.is_superadmin or (request.uac.has_per_company_access and request.uac.company):
+        map_bounds = get_company_map_bounds(device_profile, request.uac.company_id)
 
     open_device_type_qp = request.GET.get('openDeviceType', '')
     open_device_id_qp = request.GET.get('openDeviceId', '')
@@ -180,23 +181,18 @@ def view_main(request):
             'zoom': 15,
             'override': True,
         }
-    elif devices_queryset.count() > 0:
-        containers_bounds = devices_queryset.annotate(
-            lng=ExpressionWrapper(Func('location', function='ST_X'), output_field=FloatField()),
-            lat=ExpressionWrapper(Func('location', function='ST_Y'), output_field=FloatField())) \
-            .aggregate(lng_min=Min('lng'), lng_max=Max('lng'), lat_min=Min('lat'), lat_max=Max('lat'))
+    elif map_bounds is not None:
+        lng_min, lat_min, lng_max, lat_max = map_bounds
         map_positioning = {
             'center': {
-                'lng': containers_bounds['lng_min'] + (
-                            (containers_bounds['lng_max'] - containers_bounds['lng_min']) / 2),
-                'lat': containers_bounds['lat_min'] + (
-                            (containers_bounds['lat_max'] - containers_bounds['lat_min']) / 2),
+                'lng': lng_min + ((lng_max - lng_min) / 2),
+                'lat': lat_min + ((lat_max - lat_min) / 2),
             },
             'bounds': {
-                'lngMin': containers_bounds['lng_min'],
-                'lngMax': containers_bounds['lng_max'],
-                'latMin': containers_bounds['lat_min'],
-                'latMax': containers_bounds['lat_max'],
+                'lngMin': lng_min,
+                'lngMax': lng_max,
+                'latMin': lat_min,
+                'latMax': lat_max,
             },
         }
     else:
@@ -257,7 +253,7 @@ def view_main(request):
     if device_profile == CompanyDeviceProfile.SENSOR:
         errors_queryset = SensorError.objects.filter(error_type=OuterRef('pk'), actual=True)
         if request.uac.company:
-            errors_queryset = errors_queryset.filter(sensor__company=request.uac.company)
+            errors_queryset = errors_queryset.filter(company=request.uac.company)
         error_type_queryset = SensorErrorType.objects.annotate(
             actual_error_exists=Exists(errors_queryset)).filter(actual_error_exists=True)
         error_type_filter_enabled = error_type_queryset.count() > 0
@@ -271,7 +267,7 @@ def view_main(request):
     else:
         errors_queryset = TrashbinError.objects.filter(error_type=OuterRef('pk'), actual=1)
         if request.uac.company:
-            errors_queryset = errors_queryset.filter(container__company=request.uac.company)
+            errors_queryset = errors_queryset.filter(company=request.uac.company)
         error_type_queryset = TrashbinErrorType.objects.annotate(
             actual_error_exists=Exists(errors_queryset)).filter(actual_error_exists=True).select_related('equipment')
         error_type_filter_enabled = len(error_type_queryset) > 1
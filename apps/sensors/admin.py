@@ -9,11 +9,13 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.shortcuts import redirect, render
 from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.text import capfirst
 from django.utils.translation import ugettext_lazy as _, override as current_language_override
 from io import StringIO
 
+from app.redis_client import RedisClient
 from apps.core.admin import validate_object_exists, ok_status_icon_markup, fail_status_icon_markup
 from apps.core.models import WasteType, Company, Sectors, Country, City
 from apps.sensors.models import (
@@ -76,8 +78,16 @@ class UploadSensorsForm(forms.Form):
     settings_profile = forms.ModelChoiceField(SensorSettingsProfile.objects.all(), required=True)
 
 
+def _set_sensors_disabled(queryset, disabled):
+    # Bulk update skips the save signals, so the map changes are tracked here
+    company_ids = set(queryset.order_by().values_list('company_id', flat=True).distinct())
+    queryset.update(disabled=disabled, mtime=timezone.now())
+    if company_ids:
+        transaction.on_commit(lambda: RedisClient().bump_map_data_version(*company_ids))
+
+
 def enable_sensors_action(modeladmin, request, queryset):
-    queryset.update(disabled=False)
+    _set_sensors_disabled(queryset, False)
     messages.success(request, 'Selected sensors enabled')
 
 
@@ -85,7 +95,7 @@ enable_sensors_action.short_description = "Enable selected sensors"
 
 
 def disable_sensors_action(modeladmin, request, queryset):
-    queryset.update(disabled=True)
+    _set_sensors_disabled(queryset, True)
     messages.success(request, 'Selected sensors disabled')
 
 
@@ -1,41 +1,69 @@
+import time
+
 from django.conf import settings
-from django.db.models import Case, When, Value, BooleanField, OuterRef, Exists, Subquery
+from django.db.models import Case, When, Value, BooleanField, Count, Q, F
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 
+from apps.core.api import MapDevicesMixin, MapTileMixin, NearbyDevicesMixin
 from apps.core.data import FULLNESS
-from apps.core.helpers import filter_queryset_by_bounds, filter_queryset_by_fullness
-from apps.sensors.models import Sensor, Fullness as SensorFullness
-from apps.sensors.serializers import SensorSerializer
-from app.models import RoutePoints, ROUTE_POINT_STATUS_NOT_COLLECTED
+from apps.core.helpers import (
+    filter_queryset_by_bounds, filter_queryset_by_fullness, get_map_clustering_grid_size, cluster_queryset_by_grid,
+    CompanyDeviceProfile,
+)
+from apps.core.renderers import UJSONRenderer
+from apps.sensors.models import Sensor
+from apps.sensors.serializers import SensorMapSerializer, SensorNearbySerializer
 
 
-class SensorListAPIView(GenericAPIView):
-    serializer_class = SensorSerializer
+class SensorListAPIView(MapDevicesMixin, GenericAPIView):
+    renderer_classes = (UJSONRenderer,)
+    map_layer_name = 'sensors'
+    device_type = CompanyDeviceProfile.SENSOR
 
     def get(self, request):
+        return self.get_conditional_map_response(self.build_map_response)
+
+    def build_map_response(self):
+        cursor = time.time()
+        grid_size = get_map_clustering_grid_size(self.request.query_params.get('zoom', None))
+        if grid_size is not None:
+            clusters = cluster_queryset_by_grid(
+                self.filter_queryset(self.get_base_queryset()), grid_size,
+                errors_count=Count('pk', filter=Q(has_active_errors=True)),
+                low_battery_count=Count('pk', filter=Q(battery__lte=settings.LOW_BATTERY_STATUS_ICON_LEVEL_THRESHOLD)))
+            return Response({'sensors': [], 'clusters': clusters, 'cursor': cursor, 'full': True})
+
+        since = self.get_changes_since()
         sensors_queryset = self.filter_queryset(self.get_queryset()).distinct()
-        serializer = self.get_serializer(sensors_queryset, many=True)
-        return Response({'sensors': serializer.data})
+        if since is not None:
+            sensors_queryset = sensors_queryset.filter(mtime__gt=since)
+        serializer = SensorMapSerializer(sensors_queryset)
+        result = {'sensors': serializer.data, 'cursor': cursor, 'full': since is None}
+        if since is not None:
+            # Disabled sensors are looked up as well to be reported as removed
+            changed_ids = self.scope_queryset(Sensor.objects.filter(mtime__gt=since)).values_list('id', flat=True) \
+                if self.has_map_access() else []
+            result['removed'] = self.get_removed_ids(since, changed_ids, [s['id'] for s in serializer.data])
+        return Response(result)
 
-    def get_queryset(self):
-        if not (self.request.uac.is_superadmin or (
-                self.request.uac.has_per_company_access and self.request.uac.company)):
+    def get_base_queryset(self):
+        if not self.has_map_access():
             return Sensor.objects.none()
-        not_collected_route_points = RoutePoints.objects.filter(
-            sensor=OuterRef('pk'), status=ROUTE_POINT_STATUS_NOT_COLLECTED)
-        latest_data_timestamp = SensorFullness.objects.filter(sensor=OuterRef('pk'), actual=True)
-        return Sensor.objects.select_related('city').filter(disabled=False).annotate(
-            any_active_routes=Exists(not_collected_route_points),
+        return Sensor.objects.filter(disabled=False)
+
+    def get_queryset(self):
+        # Route flag & latest data time are denormalized into the sensor, see refresh_devices_map_flags()
+        return self.get_base_queryset().annotate(
+            any_active_routes=F('on_active_route'),
             low_battery_level=Case(
                 When(battery__lte=settings.LOW_BATTERY_STATUS_ICON_LEVEL_THRESHOLD, then=Value(True)),
                 default=Value(False),
                 output_field=BooleanField()),
-            latest_data_timestamp=Subquery(latest_data_timestamp.values('ctime')[:1]))
+            latest_data_timestamp=F('latest_data_at'))
 
     def filter_queryset(self, queryset):
-        if self.request.uac.company:
-            queryset = queryset.filter(company=self.request.uac.company)
+        queryset = self.scope_queryset(queryset)
 
         params = self.request.query_params
 
@@ -62,3 +90,23 @@ class SensorListAPIView(GenericAPIView):
 
         bounds = [self.request.query_params.get(k) for k in ['north', 'west', 'south', 'east']]
         return filter_queryset_by_bounds(queryset, bounds)
+
+
+class SensorTileAPIView(MapTileMixin, SensorListAPIView):
+    tile_fields = ('id', 'serial_number', 'fullness', 'battery', 'any_active_routes', 'low_battery_level')
+
+    def get(self, request, z, x, y):
+        return self.get_tile(request, z, x, y)
+
+    def get_queryset(self):
+        return super().get_queryset().distinct()
+
+
+class SensorNearbyAPIView(NearbyDevicesMixin, SensorListAPIView):
+    nearby_serializer_class = SensorNearbySerializer
+
+    def get(self, request):
+        return self.get_nearby(request)
+
+    def get_queryset(self):
+        return super().get_queryset().distinct()
@@ -5,7 +5,8 @@ class SensorsConfig(AppConfig):
     name = 'apps.sensors'
 
     def ready(self):
-        from apps.sensors.shared import register_notification_generators
+        from apps.sensors.shared import register_notification_generators, register_report_jobs
         # noinspection PyUnresolvedReferences
         import apps.sensors.signals  # noqa: F401
         register_notification_generators()
+        register_report_jobs()
@@ -0,0 +1,80 @@
+# Generated by Django 2.2.17 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_reportjob_reportjobchunk'),
+        ('sensors', '0035_auto_20221108_1249'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simbalance',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='batterylevel',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='temperature',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='error',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.AddField(
+            model_name='fullness',
+            name='company',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.Company'),
+        ),
+        migrations.RunSQL(
+            sql='UPDATE sensors_simbalance t SET company_id = d.company_id FROM sensors_sensor d WHERE t.sensor_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE sensors_batterylevel t SET company_id = d.company_id FROM sensors_sensor d WHERE t.sensor_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE sensors_temperature t SET company_id = d.company_id FROM sensors_sensor d WHERE t.sensor_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE sensors_error t SET company_id = d.company_id FROM sensors_sensor d WHERE t.sensor_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='UPDATE sensors_fullness t SET company_id = d.company_id FROM sensors_sensor d WHERE t.sensor_id = d.id',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='simbalance',
+            index=models.Index(fields=['company', 'ctime'], name='sensors_simbal_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='batterylevel',
+            index=models.Index(fields=['company', 'ctime'], name='sensors_battery_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='temperature',
+            index=models.Index(fields=['company', 'ctime'], name='sensors_temp_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='error',
+            index=models.Index(fields=['company', 'ctime'], name='sensors_error_company_ctime'),
+        ),
+        migrations.AddIndex(
+            model_name='fullness',
+            index=models.Index(fields=['company', 'ctime'], name='sensors_fullness_company_ctime'),
+        ),
+    ]
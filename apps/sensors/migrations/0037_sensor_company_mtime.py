@@ -0,0 +1,17 @@
+# Generated by Django 2.2.17 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0036_time_series_company'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensor',
+            index=models.Index(fields=['company', 'mtime'], name='sensors_sensor_company_mtime'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.17 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0107_container_map_flags'),
+        ('sensors', '0037_sensor_company_mtime'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensor',
+            name='on_active_route',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='has_active_errors',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sensor',
+            name='latest_data_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE sensors_sensor s SET
+                    on_active_route = EXISTS(
+                        SELECT 1 FROM app_routepoints p WHERE p.sensor_id = s.id AND p.status = 0),
+                    has_active_errors = EXISTS(
+                        SELECT 1 FROM sensors_error e WHERE e.sensor_id = s.id AND e.actual),
+                    latest_data_at = (
+                        SELECT MAX(f.ctime) FROM sensors_fullness f WHERE f.sensor_id = s.id AND f.actual)
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.17 on 2026-10-19 15:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0038_sensor_map_flags'),
+    ]
+
+    operations = [
+        # Geometry index is created by the spatial field itself, ensuring it's there for bounds search
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS sensors_sensor_location_id ON sensors_sensor USING GIST (location)',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        # Serves KNN ordering & radius search in meters
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS sensors_sensor_location_geography '
+                'ON sensors_sensor USING GIST ((location::geography))',
+            reverse_sql='DROP INDEX IF EXISTS sensors_sensor_location_geography',
+        ),
+    ]
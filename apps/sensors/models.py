@@ -237,6 +237,10 @@ class Sensor(models.Model):
     autogenerate_data = models.BooleanField(default=False)
     mount_type = models.CharField(max_length=16, choices=MOUNT_TYPES, default=HORIZONTAL_MOUNT_TYPE)
     disabled = models.BooleanField(default=False, verbose_name=_('disabled'))
+    # Map flags denormalized from related tables, see app.models.refresh_devices_map_flags()
+    on_active_route = models.BooleanField(default=False, editable=False)
+    has_active_errors = models.BooleanField(default=False, editable=False)
+    latest_data_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     sim_number = models.CharField(max_length=20, blank=True, validators=[RegexValidator(NUMBERS_ONLY_REGEX)],
                                   help_text=NUMBERS_ONLY_HELP_TEXT)
@@ -244,10 +248,15 @@ class Sensor(models.Model):
 
     class Meta:
         ordering = ['serial_number']
+        indexes = [models.Index(fields=['company', 'mtime'], name='sensors_sensor_company_mtime')]
 
     def __str__(self):
         return self.serial_number
 
+    def save(self, *args, **kwargs):
+        self.mtime = timezone.now()
+        super().save(*args, **kwargs)
+
 
 class SensorData(models.Model):
     sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE)
@@ -262,6 +271,8 @@ class SensorData(models.Model):
 
 class SimBalance(models.Model):
     sensor = models.ForeignKey(Sensor, verbose_name=_('sensor'), on_delete=models.CASCADE)
+    company = models.ForeignKey(
+        Company, related_name='+', null=True, editable=False, db_index=False, on_delete=models.CASCADE)
     ctime = models.DateTimeField(default=timezone.now)
     balance = models.IntegerField(default=0)
     actual = models.BooleanField(default=False, verbose_name=_('actual data'))
@@ -270,6 +281,7 @@ class SimBalance(models.Model):
         verbose_name = _('sim balance')
         verbose_name_plural = _('sim balance')
         ordering = ('ctime',)
+        indexes = [models.Index(fields=['company', 'ctime'], name='sensors_simbal_company_ctime')]
 
     def __str__(self):
         return '%s %s %s' % (self.sensor, self.balance, self.ctime)
@@ -277,15 +289,22 @@ class SimBalance(models.Model):
 
 class BatteryLevel(models.Model):
     sensor = models.ForeignKey(Sensor, verbose_name=_('sensor'), on_delete=models.CASCADE)
+    company = models.ForeignKey(
+        Company, related_name='+', null=True, editable=False, db_index=False, on_delete=models.CASCADE)
     ctime = models.DateTimeField(default=timezone.now)
     level = models.IntegerField(default=0)
     volts = models.FloatField(default=0)
     actual = models.BooleanField(default=False, verbose_name=_('actual data'))
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='sensors_battery_company_ctime')]
+
 
 class Temperature(models.Model):
     sensor = models.ForeignKey(
         Sensor, verbose_name=_('sensor'), related_name='temperature_table', on_delete=models.CASCADE)
+    company = models.ForeignKey(
+        Company, related_name='+', null=True, editable=False, db_index=False, on_delete=models.CASCADE)
     ctime = models.DateTimeField(default=timezone.now)
     value = models.IntegerField(default=0)
     actual = models.BooleanField(default=False, verbose_name=_('actual data'))
@@ -294,6 +313,7 @@ class Temperature(models.Model):
         verbose_name = _('temperature')
         verbose_name_plural = _('temperature')
         ordering = ('ctime',)
+        indexes = [models.Index(fields=['company', 'ctime'], name='sensors_temp_company_ctime')]
 
     def __str__(self):
         return '%s %s %s' % (self.sensor, self.value, self.ctime)
@@ -314,6 +334,8 @@ class ErrorType(models.Model):
 
 class Error(models.Model):
     sensor = models.ForeignKey(Sensor, verbose_name=_('sensor'), on_delete=models.CASCADE)
+    company = models.ForeignKey(
+        Company, related_name='+', null=True, editable=False, db_index=False, on_delete=models.CASCADE)
     error_type = models.ForeignKey(ErrorType, verbose_name=_('error type'), on_delete=models.CASCADE)
     ctime = models.DateTimeField(default=timezone.now)
     actual = models.BooleanField(default=False, verbose_name=_('actual data'))
@@ -322,6 +344,7 @@ class Error(models.Model):
         verbose_name = _('error')
         verbose_name_plural = _('errors')
         ordering = ('ctime',)
+        indexes = [models.Index(fields=['company', 'ctime'], name='sensors_error_company_ctime')]
 
     def __str__(self):
         return '%s %s %s' % (self.sensor, self.error_type, self.ctime)
@@ -330,12 +353,17 @@ class Error(models.Model):
 class Fullness(models.Model):
     sensor = models.ForeignKey(
         Sensor, verbose_name=_('sensor'), related_name='fullness_table', on_delete=models.CASCADE)
+    company = models.ForeignKey(
+        Company, related_name='+', null=True, editable=False, db_index=False, on_delete=models.CASCADE)
     ctime = models.DateTimeField(default=timezone.now)
     value = models.IntegerField(default=0)
     actual = models.BooleanField(default=False, verbose_name=_('actual data'))
     signal_amp = models.IntegerField(null=True, blank=True)
     parsing_metadata_json = JSONField(default=dict)
 
+    class Meta:
+        indexes = [models.Index(fields=['company', 'ctime'], name='sensors_fullness_company_ctime')]
+
 
 class SensorJob(models.Model):
     UPDATE_CONFIG_JOB_TYPE = 'UPDATE_CONFIG'
@@ -593,3 +621,7 @@ class SensorOnboardRequest(models.Model):
                                f"{self.network_types_to_sn[self.network_type]}-" \
                                f"{manufacturer_code}{str(date.today().year)[2:]}{sensor.id:05d}"
         sensor.save()
+
+
+# Models which rows carry a denormalized copy of their sensor's company
+COMPANY_DENORMALIZED_MODELS = (SimBalance, BatteryLevel, Temperature, Error, Fullness)
@@ -3,6 +3,7 @@ from django.db.models import Avg
 from django.http import HttpResponseForbidden
 from django.shortcuts import render
 
+from apps.core.aggregates import annotate_time_buckets
 from apps.core.reports import (
     check_report_access, BaseChartView, underline_columns, BaseReportDatatableView, FusionChartTypes,
     prepare_stacked_line_chart_result_json,
@@ -23,6 +24,7 @@ def report_battery_level(request):
         'report_name_i18n_key': 'battery_level',
         'table_data_url_name': 'reports:sensor:battery_level_table_data',
         'chart_data_url_name': 'reports:sensor:battery_level_chart_data',
+        'report_job_name': 'sensor:battery_level',
         'chart_type': FusionChartTypes.SCROLL_STACKED_COLUMN.value,
     })
     return render(request, 'sensors/reports/generic.html', context)
@@ -57,8 +59,7 @@ class BatteryLevelReportStackedChart(BaseChartView):
     def filter_queryset(self, qs):
         qs = common_filter_sensor_queryset(qs, self.request.GET, self.get_filter_qs_options())
 
-        qs = qs.extra({'day': "date_trunc('day', sensors_batterylevel.ctime)::date"}) \
-            .values('day').annotate(battery_level_avg=Avg('level')).order_by('day')
+        qs = annotate_time_buckets(qs, 'day', as_date=True, battery_level_avg=Avg('level'))
 
         return qs
 
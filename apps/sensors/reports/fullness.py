@@ -27,6 +27,7 @@ def report_fullness(request):
         'report_name_i18n_key': 'fullness',
         'table_data_url_name': 'reports:sensor:fullness_table_data',
         'chart_data_url_name': 'reports:sensor:fullness_chart_data',
+        'report_job_name': 'sensor:fullness',
         'chart_type': FusionChartTypes.SCROLL_STACKED_COLUMN.value,
     })
     return render(request, 'sensors/reports/fullness.html', context)
@@ -48,6 +49,7 @@ class FullnessReportList(BaseReportDatatableView):
     datatable_options = {
         'columns': columns
     }
+    extra_only_fields = ('parsing_metadata_json',)
 
     def filter_queryset(self, qs):
         qs = common_filter_sensor_queryset(qs, self.request.GET, self.get_filter_qs_options())
@@ -1,7 +1,9 @@
 from django.db.models import Q
 
 from apps.core.models import WasteType, Sectors
-from apps.core.reports import collect_common_request_context, filter_queryset_by_date_range, filter_qs_by_fullness
+from apps.core.reports import (
+    collect_common_request_context, filter_queryset_by_date_range, filter_qs_by_fullness, get_company_lookup,
+)
 from apps.sensors.models import ErrorType, Error
 from apps.sensors.shared import get_sensors_qs_for_request
 
@@ -54,10 +56,11 @@ def common_filter_sensor_queryset(qs, params_dict, options_dict):
     sector = params_dict.get('sector', None)
     q_search = params_dict.get('q_search', None)
 
+    company_lookup = get_company_lookup(qs.model, 'sensor')
     if company and company != '' and user_is_admin:
-        qs = qs.filter(sensor__company__id=company)
+        qs = qs.filter(**{company_lookup: company})
     elif not user_is_admin:
-        qs = qs.filter(sensor__company__id=user_company_id)
+        qs = qs.filter(**{company_lookup: user_company_id})
 
     if sensor and sensor != '':
         qs = qs.filter(sensor_id=sensor)
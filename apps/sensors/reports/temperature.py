@@ -3,6 +3,7 @@ from django.db.models import Avg
 from django.http import HttpResponseForbidden
 from django.shortcuts import render
 
+from apps.core.aggregates import annotate_time_buckets
 from apps.core.reports import (
     check_report_access, BaseChartView, underline_columns, BaseReportDatatableView, FusionChartTypes,
     prepare_temperature_chart_result_json,
@@ -23,6 +24,7 @@ def report_temperature(request):
         'report_name_i18n_key': 'temperature',
         'table_data_url_name': 'reports:sensor:temperature_table_data',
         'chart_data_url_name': 'reports:sensor:temperature_chart_data',
+        'report_job_name': 'sensor:temperature',
         'chart_type': FusionChartTypes.SCROLL_COLUMN.value,
     })
     return render(request, 'sensors/reports/generic.html', context)
@@ -53,8 +55,7 @@ class TemperatureReportStackedChart(BaseChartView):
     def filter_queryset(self, qs):
         qs = common_filter_sensor_queryset(qs, self.request.GET, self.get_filter_qs_options())
 
-        qs = qs.extra({'day': "date_trunc('day', sensors_temperature.ctime)::date"}).values('day').order_by('day')\
-            .annotate(temperature_avg=Avg('value'))
+        qs = annotate_time_buckets(qs, 'day', as_date=True, temperature_avg=Avg('value'))
 
         return qs
 
@@ -5,6 +5,7 @@ from typing import Optional
 
 from apps.core.utils import (
     notification_subject_generators, notification_message_generators, notification_link_generators,
+    report_job_chart_views,
 )
 from apps.sensors.models import SensorJob, Sensor
 from apps.sensors.utils import parse_sensor_message_payload, serialize_sensor_message_payload
@@ -42,6 +43,16 @@ def register_notification_generators():
         lambda n: _('Fire and/or high temperature detected')
 
 
+def register_report_jobs():
+    from apps.sensors.reports.battery_level import BatteryLevelReportStackedChart
+    from apps.sensors.reports.fullness import FullnessReportStackedChart
+    from apps.sensors.reports.temperature import TemperatureReportStackedChart
+
+    report_job_chart_views['sensor:fullness'] = FullnessReportStackedChart
+    report_job_chart_views['sensor:battery_level'] = BatteryLevelReportStackedChart
+    report_job_chart_views['sensor:temperature'] = TemperatureReportStackedChart
+
+
 @dataclass
 class ConfigureJobDS:
     pk: Optional[int]
@@ -1,12 +1,21 @@
 import binascii
 import os
 
-from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_init
 from django.dispatch import receiver
 from slugify import slugify
 
+from apps.core.helpers import CompanyDeviceProfile
 from apps.core.models import Company
-from apps.sensors.models import SensorSettingsProfile, SensorsAuthCredentials, VerneMQAuthAcl
+from apps.core.tasks import (
+    schedule_device_addition_delta, schedule_device_removal_delta, schedule_map_bounds_extension,
+    schedule_map_bounds_drop,
+)
+from app.redis_client import RedisClient
+from apps.sensors.models import (
+    SensorSettingsProfile, SensorsAuthCredentials, VerneMQAuthAcl, Sensor, COMPANY_DENORMALIZED_MODELS,
+)
 
 
 settings_fields = [f.name for f in SensorSettingsProfile._meta.get_fields() if f.name != 'id']
@@ -65,3 +74,75 @@ def create_sensors_auth(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=SensorsAuthCredentials)
 def delete_vernemq_auth_acl(sender, instance, using, **kwargs):
     VerneMQAuthAcl.objects.filter(username=instance.username).delete()
+
+
+def populate_sensor_company(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.company_id = instance.sensor.company_id
+
+
+for denormalized_model in COMPANY_DENORMALIZED_MODELS:
+    pre_save.connect(populate_sensor_company, sender=denormalized_model)
+
+
+@receiver(post_init, sender=Sensor)
+def remember_loaded_company(sender, instance, **kwargs):
+    # Reading the instance dict directly to avoid loading deferred field
+    instance.loaded_company_id = instance.__dict__.get('company_id', None)
+
+
+@receiver(post_save, sender=Sensor)
+@receiver(post_delete, sender=Sensor)
+def bump_map_data_version(sender, instance, **kwargs):
+    company_ids = {c for c in (instance.company_id, getattr(instance, 'loaded_company_id', None)) if c is not None}
+    transaction.on_commit(lambda: RedisClient().bump_map_data_version(*company_ids))
+
+
+@receiver(post_save, sender=Sensor)
+@receiver(post_delete, sender=Sensor)
+def track_removed_map_device(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete:
+        removed_from_company_id = instance.company_id
+    elif created or instance.loaded_company_id in (None, instance.company_id):
+        return
+    else:
+        removed_from_company_id = instance.loaded_company_id
+    device_id = instance.pk
+    transaction.on_commit(lambda: RedisClient().add_removed_map_device(
+        CompanyDeviceProfile.SENSOR.value, device_id, removed_from_company_id))
+    # Deleted devices are removed from the map of all devices as well, moved ones stay there
+    removed_from_groups = (removed_from_company_id, None) if signal is post_delete else (removed_from_company_id,)
+    schedule_device_removal_delta(CompanyDeviceProfile.SENSOR.value, device_id, *removed_from_groups)
+
+
+@receiver(post_save, sender=Sensor)
+def track_added_map_device(sender, instance, created, **kwargs):
+    # Connected before sync_time_series_company() which resets the loaded company
+    if created or instance.loaded_company_id not in (None, instance.company_id):
+        schedule_device_addition_delta(CompanyDeviceProfile.SENSOR.value, instance.pk)
+
+
+@receiver(post_save, sender=Sensor)
+@receiver(post_delete, sender=Sensor)
+def update_map_bounds(sender, instance, signal, created=False, update_fields=None, **kwargs):
+    # Connected before sync_time_series_company() which resets the loaded company. Data parsers extend bounds
+    # on their own, so partial saves are skipped.
+    if signal is post_delete:
+        schedule_map_bounds_drop(CompanyDeviceProfile.SENSOR.value, instance.company_id, None)
+        return
+    moved = instance.loaded_company_id not in (None, instance.company_id)
+    if moved:
+        schedule_map_bounds_drop(CompanyDeviceProfile.SENSOR.value, instance.loaded_company_id)
+    if instance.location is not None and (created or moved or update_fields is None):
+        schedule_map_bounds_extension(
+            CompanyDeviceProfile.SENSOR.value, instance.location.x, instance.location.y, instance.company_id)
+
+
+@receiver(post_save, sender=Sensor)
+def sync_time_series_company(sender, instance, created, **kwargs):
+    if created or instance.loaded_company_id is None or instance.loaded_company_id == instance.company_id:
+        return
+    instance.loaded_company_id = instance.company_id
+    from apps.sensors.tasks import sync_sensor_time_series_company
+    sensor_id = instance.pk
+    transaction.on_commit(lambda: sync_sensor_time_series_company.delay(sensor_id))
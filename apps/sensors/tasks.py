@@ -18,14 +18,19 @@ from django.utils import timezone
 from sentry_sdk import capture_message
 from typing import Optional
 
-from apps.core.helpers import get_unknown_city_country, execute_reverse_geocoding
+from app.redis_client import RedisClient
+from apps.core.helpers import get_unknown_city_country, execute_reverse_geocoding, CompanyDeviceProfile
 from apps.core.models import Company
 from apps.core.report_data_generation import BaseReportDataGenerator, SECONDS_PER_PERIOD
-from apps.core.tasks import NotificationPriorities, notification_levels_resolver, create_notification
+from apps.core.tasks import (
+    NotificationPriorities, notification_levels_resolver, create_notifications_bulk, schedule_device_state_delta,
+    schedule_coalesced_device_task, release_coalesced_device_task, get_device_conditions_to_notify,
+    schedule_map_bounds_extension,
+)
 from apps.sensors.shared import SensorsNotificationTypes, arrange_sensor_config_jobs
 from apps.sensors.models import (
     Sensor, SensorData, SimBalance, BatteryLevel, Temperature, Fullness, SensorSettingsProfile, SensorJob, ErrorType,
-    Error, CompanySensorsLicense, SensorOnboardRequest,
+    Error, CompanySensorsLicense, SensorOnboardRequest, COMPANY_DENORMALIZED_MODELS,
 )
 from apps.sensors.utils import build_sensor_connect_schedule, parse_sensor_message_payload
 
@@ -146,7 +151,15 @@ def onboard_new_sensor(hardware_id):
     SensorOnboardRequest.objects.create(hardware_identity=hardware_id)
 
 
-def process_sensor_data_dict(data, sensor, sensor_data_id=None):
+# Denormalized map flags (e.g. on_active_route) are refreshed separately and must not be overwritten by the parsers
+_SENSOR_DATA_FIELDS = (
+    'fullness', 'latest_data_at', 'battery', 'has_active_errors', 'temperature', 'sim_number', 'mtime',
+)
+
+
+def process_sensor_data_dict(data, sensor, sensor_data_id=None, ctime=None):
+    ctime = ctime or timezone.now()
+
     def detect_moisture(measurement_distance_begin_m, measured_range):
         moisture_distance_begin = measurement_distance_begin_m * 1000
         moisture_distance_end = moisture_distance_begin + sensor.container_type.moisture_threshold
@@ -203,11 +216,13 @@ def process_sensor_data_dict(data, sensor, sensor_data_id=None):
                     latest_moisture_free_fullness.value if latest_moisture_free_fullness else 0
             # Store values
             sensor.fullness = fullness_value
+            sensor.latest_data_at = ctime
             generate_time_series_record(
-                Fullness, sensor, value=fullness_value, signal_amp=signal_amp, parsing_metadata_json=parsing_metadata)
+                Fullness, sensor, value=fullness_value, signal_amp=signal_amp, parsing_metadata_json=parsing_metadata,
+                ctime=ctime)
     if 'batV' in data:
         sensor.battery = int(data['batV'])
-        generate_time_series_record(BatteryLevel, sensor, level=sensor.battery)
+        generate_time_series_record(BatteryLevel, sensor, level=sensor.battery, ctime=ctime)
     if 'rFlag' in data:
         error_code = int(data['rFlag'])
         try:
@@ -218,11 +233,12 @@ def process_sensor_data_dict(data, sensor, sensor_data_id=None):
             else:
                 logger.warning(f"Unrecognized error code '{error_code}' received")
         else:
-            generate_time_series_record(Error, sensor, error_type=error_type)
+            generate_time_series_record(Error, sensor, error_type=error_type, ctime=ctime)
+            sensor.has_active_errors = True
     if 'temp' in data:
         temperature = int(data['temp'])
         sensor.temperature = temperature
-        generate_time_series_record(Temperature, sensor, value=temperature)
+        generate_time_series_record(Temperature, sensor, value=temperature, ctime=ctime)
     if 'ICCID' in data:
         iccid_value_text = data['ICCID']
         if ICCID_NUMBER_REGEX.fullmatch(iccid_value_text):
@@ -230,7 +246,7 @@ def process_sensor_data_dict(data, sensor, sensor_data_id=None):
         else:
             logger.warning(f"Failed to parse ICCID text '{iccid_value_text}'")
 
-    sensor.save()
+    sensor.save(update_fields=_SENSOR_DATA_FIELDS)
 
 
 @shared_task
@@ -245,7 +261,10 @@ def parse_sensor_regular_data(sensor_data_id):
     with transaction.atomic():
         # Dropping current actual errors to free room for new ones
         sensor.error_set.filter(actual=True).update(actual=False)
+        sensor.has_active_errors = False
         process_sensor_data_dict(data, sensor, sensor_data.id)
+        schedule_device_state_delta(CompanyDeviceProfile.SENSOR.value, sensor.id)
+        schedule_sensor_status_notifications(sensor.id)
 
     logger.debug(f'Regular sensor data with ID {sensor_data_id} parsed successfully')
 
@@ -267,7 +286,7 @@ def reverse_geocode_sensor_location(sensor_id):
         sensor.country = country
     if city != unknown_city:
         sensor.city = city
-    sensor.save()
+    sensor.save(update_fields=['address', 'country', 'city', 'mtime'])
 
 
 def convert_nmea_value_to_decimal(nmea_value):
@@ -307,6 +326,8 @@ def parse_sensor_jobs_data(sensor_data_id):
                 sensor.location = new_sensor_location_str
                 if new_sensor_location_str != previous_sensor_location_str:
                     additional_tasks_to_execute.append((reverse_geocode_sensor_location, [sensor.id]))
+                    schedule_map_bounds_extension(CompanyDeviceProfile.SENSOR.value, long, lat, sensor.company_id)
+                    schedule_device_state_delta(CompanyDeviceProfile.SENSOR.value, sensor.id)
                 update_latest_sensor_job(
                     sensor,
                     SensorJob.GET_LOCATION_JOB_TYPE,
@@ -345,7 +366,7 @@ def parse_sensor_jobs_data(sensor_data_id):
                 f"Failed to found a fetch config job for the update stored as sensor data with ID {sensor_data_id}",
                 sensor_data.payload,
             )
-        sensor.save()
+        sensor.save(update_fields=['location', 'phone_number', 'mtime'])
 
     for task, args in additional_tasks_to_execute:
         task.delay(*args)
@@ -482,12 +503,13 @@ def execute_sensor_data_pipeline(topic, payload):
                 sensor_license = CompanySensorsLicense.objects.filter(company=sensor.company).order_by('-end').first()
                 license_is_valid = sensor_license.is_valid if sensor_license else False
                 if not license_is_valid:
-                    Sensor.objects.filter(company=sensor.company).update(disabled=True)
+                    Sensor.objects.filter(company=sensor.company).update(disabled=True, mtime=timezone.now())
+                    RedisClient().bump_map_data_version(sensor.company_id)
                     raise Warning(f"Company {sensor.company.id} has invalid or missing sensors license")
             stored_sensor_data = SensorData.objects.create(
                 sensor=sensor, topic=topic, payload=payload, data_json=json_payload)
 
-            chain(parse_sensor_regular_data.s(stored_sensor_data.id), generate_sensor_status_notifications.s()).delay()
+            parse_sensor_regular_data.delay(stored_sensor_data.id)
             chain(parse_sensor_jobs_data.s(stored_sensor_data.id), send_sensor_jobs.s()).delay()
 
 
@@ -634,24 +656,27 @@ def generate_report_data_for_sensors(sensors_qs, utc_now, record_generation_inte
             if error_type:
                 message['rFlag'] = error_type
 
-            models_to_update = [Fullness, BatteryLevel, Temperature]
-            if error_type:
-                models_to_update.append(Error)
             with transaction.atomic():
                 # Dropping current actual errors to free room for new ones
                 sensor.error_set.filter(actual=True).update(actual=False)
-                process_sensor_data_dict(message, sensor)
-                for model in models_to_update:
-                    model.objects.filter(sensor=sensor, actual=True).update(ctime=utc_now)
+                sensor.has_active_errors = False
+                process_sensor_data_dict(message, sensor, ctime=utc_now)
             if random.random() > 0.9:
-                generate_sensor_status_notifications.delay(sensor.id)
+                schedule_sensor_status_notifications(sensor.id)
         offset += page_size
 
         logger.debug("Report data was generated for %s sensors" % sensors_count)
 
 
+def schedule_sensor_status_notifications(sensor_id):
+    schedule_coalesced_device_task(
+        generate_sensor_status_notifications, CompanyDeviceProfile.SENSOR.value, sensor_id,
+        settings.DEVICE_STATUS_CHECK_COALESCE_SECONDS, sensor_id)
+
+
 @shared_task
 def generate_sensor_status_notifications(sensor_id):
+    release_coalesced_device_task(generate_sensor_status_notifications, CompanyDeviceProfile.SENSOR.value, sensor_id)
     try:
         sensor = Sensor.objects.select_related('company').get(pk=sensor_id)
     except Sensor.DoesNotExist:
@@ -661,11 +686,12 @@ def generate_sensor_status_notifications(sensor_id):
     if recipients.count() == 0:
         logger.debug(f"There's no receivers for sensor {sensor_id}/{sensor.serial_number} notifications")
 
-    def create_sensor_notification(
-            notification_type: SensorsNotificationTypes, priority: NotificationPriorities, **kwargs):
-        create_notification(
-            sensor, recipient=recipients, verb=notification_type.value,
-            level=notification_levels_resolver[priority].value, **kwargs)
+    # Notifications are collected per condition first, only edges of the conditions get notified about
+    conditions_notifications = {}
+
+    def add_sensor_notification(
+            condition, notification_type: SensorsNotificationTypes, priority: NotificationPriorities, **kwargs):
+        conditions_notifications[condition] = (notification_type, priority, kwargs)
 
     sensor_fullness_analysis = (p for ft, p in [
         (100, NotificationPriorities.HIGH),
@@ -677,17 +703,26 @@ def generate_sensor_status_notifications(sensor_id):
     except StopIteration:
         pass
     else:
-        create_sensor_notification(SensorsNotificationTypes.SENSOR_FULLNESS_ABOVE_THRESHOLD, notification_priority,
-                                   fullness_level=sensor.fullness)
+        add_sensor_notification('fullness', SensorsNotificationTypes.SENSOR_FULLNESS_ABOVE_THRESHOLD,
+                                notification_priority, fullness_level=sensor.fullness)
 
     if sensor.battery <= 30:
-        create_sensor_notification(SensorsNotificationTypes.SENSOR_BATTERY_BELOW_THRESHOLD, NotificationPriorities.LOW,
-                                   battery_level=sensor.battery)
+        add_sensor_notification('battery', SensorsNotificationTypes.SENSOR_BATTERY_BELOW_THRESHOLD,
+                                NotificationPriorities.LOW, battery_level=sensor.battery)
 
     sensor_actual_error_type_codes = \
         set(sensor.error_set.filter(actual=True).values_list('error_type__code', flat=True))
     if any(sensor_actual_error_type_codes.intersection([2])):
-        create_sensor_notification(SensorsNotificationTypes.SENSOR_FIRE_DETECTED, NotificationPriorities.HIGH)
+        add_sensor_notification('fire', SensorsNotificationTypes.SENSOR_FIRE_DETECTED, NotificationPriorities.HIGH)
+
+    conditions_to_notify = get_device_conditions_to_notify(
+        CompanyDeviceProfile.SENSOR.value, sensor_id,
+        {condition: notification[1] for condition, notification in conditions_notifications.items()})
+    for condition in conditions_to_notify:
+        notification_type, priority, kwargs = conditions_notifications[condition]
+        create_notifications_bulk(
+            sensor, recipients, notification_type.value,
+            notification_levels_resolver[priority].value, **kwargs)
 
 
 @shared_task
@@ -720,3 +755,17 @@ def query_sensors_configuration(*fields):
             current_page.values_list('pk', flat=True), {f: f for f in fields}, fields, add_fetch=True)
         offset += page_size
         logger.debug("Configuration query jobs generated for %s sensors" % sensors_count)
+
+
+@shared_task
+def sync_sensor_time_series_company(sensor_id):
+    try:
+        sensor = Sensor.objects.only('company_id').get(pk=sensor_id)
+    except Sensor.DoesNotExist:
+        raise Warning(f"Sensor with ID '{sensor_id}' does not exist")
+
+    for model in COMPANY_DENORMALIZED_MODELS:
+        updated_count = model.objects.filter(sensor_id=sensor_id)\
+            .exclude(company_id=sensor.company_id).update(company_id=sensor.company_id)
+        logger.debug(f"{updated_count} {model.__name__} records of sensor {sensor_id} moved "
+                     f"to company {sensor.company_id}")
@@ -1,6 +1,6 @@
 from django.apps import AppConfig
 
-from apps.trashbins.shared import register_notification_generators
+from apps.trashbins.shared import register_notification_generators, register_report_jobs
 
 
 class TrashbinsConfig(AppConfig):
@@ -8,3 +8,4 @@ class TrashbinsConfig(AppConfig):
 
     def ready(self):
         register_notification_generators()
+        register_report_jobs()
@@ -4,6 +4,7 @@ from django.http import HttpResponseForbidden
 from django.shortcuts import render
 
 from app.models import FullnessValues
+from apps.core.aggregates import annotate_time_buckets
 from apps.core.reports import (
     check_report_access, BaseChartView, underline_columns, BaseReportDatatableView, FusionChartTypes,
     prepare_stacked_line_chart_result_json,
@@ -23,6 +24,7 @@ def report_fullness(request):
         'report_name_i18n_key': 'fullness',
         'table_data_url_name': 'reports:trashbin:fullness_table_data',
         'chart_data_url_name': 'reports:trashbin:fullness_chart_data',
+        'report_job_name': 'trashbin:fullness',
         'chart_type': FusionChartTypes.SCROLL_STACKED_COLUMN.value,
     })
     return render(request, 'trashbins/reports/generic.html', context)
@@ -58,8 +60,7 @@ class FullnessReportStackedChart(BaseChartView):
     def filter_queryset(self, qs):
         qs = common_filter_trashbin_queryset(qs, self.request.GET, self.get_filter_qs_options())
 
-        qs = qs.extra({'day': "date_trunc('day', app_fullness.ctime)::date"}). \
-            values('day').order_by('day').annotate(fullness_max=Max('fullness_value'))
+        qs = annotate_time_buckets(qs, 'day', as_date=True, fullness_max=Max('fullness_value'))
 
         return qs
 
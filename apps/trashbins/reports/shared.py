@@ -1,7 +1,9 @@
 from django.db.models import Q
 
 from apps.core.models import Sectors, WasteType
-from apps.core.reports import collect_common_request_context, filter_queryset_by_date_range, filter_qs_by_fullness
+from apps.core.reports import (
+    collect_common_request_context, filter_queryset_by_date_range, filter_qs_by_fullness, get_company_lookup,
+)
 from app.models import ContainerType, Container, ErrorType, Equipment, Error
 
 
@@ -72,10 +74,11 @@ def common_filter_trashbin_queryset(qs, params_dict, options_dict):
     container_type = params_dict.get('container_type', None)
     q_search = params_dict.get('q_search', None)
 
+    company_lookup = get_company_lookup(qs.model, 'container')
     if company and company != '' and user_is_admin:
-        qs = qs.filter(container__company__id=company)
+        qs = qs.filter(**{company_lookup: company})
     elif not user_is_admin:
-        qs = qs.filter(container__company__id=user_company_id)
+        qs = qs.filter(**{company_lookup: user_company_id})
 
     if container and container != '':
         qs = qs.filter(container_id=container)
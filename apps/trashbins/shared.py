@@ -3,6 +3,7 @@ from django.utils.translation import ugettext as _
 
 from apps.core.utils import (
     notification_subject_generators, notification_message_generators, notification_link_generators,
+    report_job_chart_views,
 )
 
 
@@ -48,3 +49,13 @@ def register_notification_generators():
         lambda n: _('Trash receiver is blocked')
     notification_message_generators[TrashbinsNotificationTypes.TRASHBIN_DOORS_ARE_OPEN.value] = \
         lambda n: _('One or more doors are open')
+
+
+def register_report_jobs():
+    from apps.trashbins.reports.battery_level import BatteryLevelReportStackedChart
+    from apps.trashbins.reports.fullness import FullnessReportStackedChart
+    from apps.trashbins.reports.temperature import TemperatureReportStackedChart
+
+    report_job_chart_views['trashbin:fullness'] = FullnessReportStackedChart
+    report_job_chart_views['trashbin:battery_level'] = BatteryLevelReportStackedChart
+    report_job_chart_views['trashbin:temperature'] = TemperatureReportStackedChart
@@ -1,9 +1,14 @@
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from apps.core.helpers import CompanyDeviceProfile
 from apps.core.models import Company
-from apps.core.tasks import NotificationPriorities, notification_levels_resolver, create_notification
+from apps.core.tasks import (
+    NotificationPriorities, notification_levels_resolver, create_notifications_bulk, schedule_coalesced_device_task,
+    release_coalesced_device_task, get_device_conditions_to_notify,
+)
 from apps.trashbins.shared import TrashbinsNotificationTypes
 
 from app.models import Container
@@ -29,8 +34,16 @@ def disable_report_data_generation():
                  f"{companies_with_disabled_generation} expired subscriptions")
 
 
+def schedule_trashbin_status_notifications(trashbin_id):
+    schedule_coalesced_device_task(
+        generate_trashbin_status_notifications, CompanyDeviceProfile.TRASHBIN.value, trashbin_id,
+        settings.DEVICE_STATUS_CHECK_COALESCE_SECONDS, trashbin_id)
+
+
 @shared_task
 def generate_trashbin_status_notifications(trashbin_id):
+    release_coalesced_device_task(generate_trashbin_status_notifications, CompanyDeviceProfile.TRASHBIN.value,
+                                  trashbin_id)
     try:
         trashbin = Container.objects.select_related('company').prefetch_related('satellites').get(pk=trashbin_id)
     except Container.DoesNotExist:
@@ -40,53 +53,57 @@ def generate_trashbin_status_notifications(trashbin_id):
     if recipients.count() == 0:
         logger.debug(f"There's no receivers for trashbin {trashbin_id}/{trashbin.serial_number} notifications")
 
-    def create_trashbin_notification(notification_type: TrashbinsNotificationTypes,
-                                     priority: NotificationPriorities, trashbin_override=None, **kwargs):
-        create_notification(
-            trashbin_override or trashbin, recipient=recipients, verb=notification_type.value,
-            level=notification_levels_resolver[priority].value, **kwargs)
-
-    def find_full_trashbin(bin_to_check, fullness_threshold):
-        if bin_to_check.fullness >= fullness_threshold:
-            return bin_to_check
-        if not bin_to_check.is_master:
-            return None
-        try:
-            full_satellite = next(
-                (satellite for satellite in trashbin.satellites.all() if satellite.fullness >= fullness_threshold))
-        except StopIteration:
-            return None
-        return full_satellite
-
-    bins_fullness_analysis = ((find_full_trashbin(trashbin, ft), p) for ft, p in [
-        (100, NotificationPriorities.HIGH),
-        (90, NotificationPriorities.MEDIUM),
-        (75, NotificationPriorities.LOW),
-    ] if find_full_trashbin(trashbin, ft) is not None)
-    try:
-        full_bin, notification_priority = next(bins_fullness_analysis)
-    except StopIteration:
-        full_bin, notification_priority = None, None
-    if full_bin:
-        create_trashbin_notification(
-            TrashbinsNotificationTypes.TRASHBIN_FULLNESS_ABOVE_THRESHOLD, notification_priority,
-            trashbin_override=full_bin, fullness_level=full_bin.fullness)
+    # Notifications are collected per condition first, only edges of the conditions get notified about
+    conditions_notifications = {}
+
+    def add_trashbin_notification(condition, notification_type: TrashbinsNotificationTypes,
+                                  priority: NotificationPriorities, trashbin_override=None, **kwargs):
+        conditions_notifications[condition] = (notification_type, priority, trashbin_override or trashbin, kwargs)
+
+    def get_fullness_priority(bin_to_check):
+        return next((priority for fullness_threshold, priority in [
+            (100, NotificationPriorities.HIGH),
+            (90, NotificationPriorities.MEDIUM),
+            (75, NotificationPriorities.LOW),
+        ] if bin_to_check.fullness >= fullness_threshold), None)
+
+    # Every bin of the station has its own fullness condition, so filling up one doesn't mask another
+    station_bins = [trashbin] + (list(trashbin.satellites.all()) if trashbin.is_master else [])
+    for station_bin in station_bins:
+        fullness_priority = get_fullness_priority(station_bin)
+        if fullness_priority is not None:
+            add_trashbin_notification(
+                f'fullness:{station_bin.id}', TrashbinsNotificationTypes.TRASHBIN_FULLNESS_ABOVE_THRESHOLD,
+                fullness_priority, trashbin_override=station_bin, fullness_level=station_bin.fullness)
 
     if trashbin.battery <= 30:
-        create_trashbin_notification(TrashbinsNotificationTypes.TRASHBIN_BATTERY_BELOW_THRESHOLD,
-                                     NotificationPriorities.LOW, battery_level=trashbin.battery)
+        add_trashbin_notification('battery', TrashbinsNotificationTypes.TRASHBIN_BATTERY_BELOW_THRESHOLD,
+                                  NotificationPriorities.LOW, battery_level=trashbin.battery)
 
     trashbin_actual_error_type_codes = set(trashbin.errors.filter(actual=1).values_list('error_type__code', flat=True))
     if any(trashbin_actual_error_type_codes.intersection(['8', '9'])):
-        create_trashbin_notification(TrashbinsNotificationTypes.TRASHBIN_FIRE_DETECTED, NotificationPriorities.HIGH)
+        add_trashbin_notification(
+            'fire', TrashbinsNotificationTypes.TRASHBIN_FIRE_DETECTED, NotificationPriorities.HIGH)
     elif any(trashbin_actual_error_type_codes.intersection(['24'])):
-        create_trashbin_notification(
-            TrashbinsNotificationTypes.TRASHBIN_VANDALISM_DETECTED, NotificationPriorities.HIGH)
+        add_trashbin_notification(
+            'vandalism', TrashbinsNotificationTypes.TRASHBIN_VANDALISM_DETECTED, NotificationPriorities.HIGH)
     elif any(trashbin_actual_error_type_codes.intersection(['6'])):
-        create_trashbin_notification(
-            TrashbinsNotificationTypes.TRASHBIN_TRASH_RECEIVER_BLOCKED, NotificationPriorities.HIGH)
+        add_trashbin_notification(
+            'receiver_blocked', TrashbinsNotificationTypes.TRASHBIN_TRASH_RECEIVER_BLOCKED,
+            NotificationPriorities.HIGH)
     elif any(trashbin_actual_error_type_codes.intersection(['1', '2', '3', '4', '5'])):
-        create_trashbin_notification(TrashbinsNotificationTypes.TRASHBIN_DOORS_ARE_OPEN, NotificationPriorities.HIGH)
+        add_trashbin_notification(
+            'doors_open', TrashbinsNotificationTypes.TRASHBIN_DOORS_ARE_OPEN, NotificationPriorities.HIGH)
     elif any(trashbin_actual_error_type_codes.intersection(['18'])):
-        create_trashbin_notification(TrashbinsNotificationTypes.TRASHBIN_BATTERY_BELOW_THRESHOLD,
-                                     NotificationPriorities.MEDIUM, battery_level=trashbin.battery)
+        add_trashbin_notification(
+            'battery_error', TrashbinsNotificationTypes.TRASHBIN_BATTERY_BELOW_THRESHOLD,
+            NotificationPriorities.MEDIUM, battery_level=trashbin.battery)
+
+    conditions_to_notify = get_device_conditions_to_notify(
+        CompanyDeviceProfile.TRASHBIN.value, trashbin_id,
+        {condition: notification[1] for condition, notification in conditions_notifications.items()})
+    for condition in conditions_to_notify:
+        notification_type, priority, target_trashbin, kwargs = conditions_notifications[condition]
+        create_notifications_bulk(
+            target_trashbin, recipients, notification_type.value,
+            notification_levels_resolver[priority].value, **kwargs)
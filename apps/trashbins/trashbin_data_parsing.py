@@ -10,12 +10,22 @@ from operator import itemgetter
 from app.models import (
     Container, Error, ErrorType, FullnessValues, Temperature, Pressure, Location, SimBalance, Battery_Level, Humidity,
     AirQuality, FullnessStats, RoutePoints, ROUTE_STATUS_STARTED_BY_USER, ROUTE_STATUS_MOVING_HOME, Collection,
+    refresh_devices_map_flags,
 )
+from apps.core.helpers import CompanyDeviceProfile
+from apps.core.tasks import schedule_device_state_delta, schedule_map_bounds_extension
 from apps.trashbins.models import TrashReceiverStatistic
 
 
 logger = logging.getLogger('app_main')
 
+# Denormalized map flags (e.g. on_active_route) are refreshed separately and must not be overwritten by the parsers
+_MASTER_BIN_DATA_FIELDS = (
+    'has_active_errors', 'temperature', 'pressure', 'location', 'battery', 'humidity', 'air_quality', 'phone_number',
+    'fullness', 'data_mtime', 'mtime',
+)
+_SATELLITE_BIN_DATA_FIELDS = ('fullness', 'data_mtime', 'mtime')
+
 
 def is_trashbin_data_with_satellites(msg):
     version_parts = str(msg['version']).split('-')
@@ -105,6 +115,8 @@ def _parse_master_bin_data(data, container_id, autogenerated):
     trashbin = Container.objects.get(pk=container_id)
     # Dropping current actual errors to free room for new ones
     Error.objects.filter(container=trashbin, actual=1).update(actual=0)
+    trashbin.has_active_errors = False
+    location_updated = False
     for value_data in sorted_data:
         logger.debug("Parsing value in master bin data " + repr(value_data))
 
@@ -127,6 +139,7 @@ def _parse_master_bin_data(data, container_id, autogenerated):
                     else:
                         # Created error will be actual by default
                         Error.objects.create(container=trashbin, error_type=error_type, ctime=value['ctime'])
+                        trashbin.has_active_errors = True
         elif 'binFillingAfter' in value:
             earlier_bin_filling_before = [v for v in bin_filling_before_list if value['ctime'] > v['ctime']]
             bin_filling_before = earlier_bin_filling_before[0] if len(earlier_bin_filling_before) > 0 else None
@@ -153,6 +166,7 @@ def _parse_master_bin_data(data, container_id, autogenerated):
             latlong = ' '.join(reversed(value['location'].split()))
             updated_location = f"SRID=4326;POINT ({latlong})"
             trashbin.location = updated_location
+            location_updated = True
             _generate_time_series_record(Location, trashbin, ctime=value['ctime'], location=updated_location)
         elif 'simBalance' in value:
             logger.debug("got SIM balance text: " + str(value['simBalance']))
@@ -214,7 +228,10 @@ def _parse_master_bin_data(data, container_id, autogenerated):
         _generate_time_series_record(
             FullnessValues, trashbin, fullness_value=filling, ctime=bin_filling_value['ctime'], location=location)
     trashbin.data_mtime = timezone.now()
-    trashbin.save()
+    trashbin.save(update_fields=_MASTER_BIN_DATA_FIELDS)
+    if location_updated:
+        schedule_map_bounds_extension(
+            CompanyDeviceProfile.TRASHBIN.value, trashbin.location.x, trashbin.location.y, trashbin.company_id)
 
 
 def _parse_satellite_bin_data(data, container_id):
@@ -241,7 +258,7 @@ def _parse_satellite_bin_data(data, container_id):
             _generate_time_series_record(
                 FullnessValues, trashbin, fullness_value=filling, ctime=value['ctime'], location=location)
     trashbin.data_mtime = timezone.now()
-    trashbin.save()
+    trashbin.save(update_fields=_SATELLITE_BIN_DATA_FIELDS)
 
 
 def parse_trashbin_data_packet(msg, container_id):
@@ -249,6 +266,7 @@ def parse_trashbin_data_packet(msg, container_id):
     logger.debug("Got data from a trashbin to parse " + repr(msg))
 
     _parse_master_bin_data(msg['data'], container_id, 'autogenerated' in msg)
+    schedule_device_state_delta(CompanyDeviceProfile.TRASHBIN.value, container_id)
 
     if is_trashbin_data_with_satellites(msg):
         satellite_ids = []
@@ -260,6 +278,8 @@ def parse_trashbin_data_packet(msg, container_id):
                 logger.warning(f"Satellite with serial '{satellite_serial}'")
             else:
                 _parse_satellite_bin_data(satellite_msg['data'], satellite.id)
+                schedule_device_state_delta(CompanyDeviceProfile.TRASHBIN.value, satellite.id)
                 satellite_ids.append(satellite.id)
         if len(satellite_ids) > 0:
-            Container.objects.filter(pk__in=satellite_ids).update(master_bin=container_id)
+            Container.objects.filter(pk__in=satellite_ids).update(master_bin=container_id, mtime=timezone.now())
+            refresh_devices_map_flags(container_ids=[container_id])
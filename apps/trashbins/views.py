@@ -1,3 +1,5 @@
+from django.db.models import F
+from django.db.models.functions import TruncDate
 from django.shortcuts import get_object_or_404
 from django.utils.translation import ugettext_lazy as _
 
@@ -49,7 +51,7 @@ class TrashbinFullnessForecastView(BaseFullnessForecastView):
         fullness_range_latest = FullnessValues.objects\
             .filter(container=trashbin, ctime__gt=last_3_collections[0].ctime)\
             .order_by('-ctime') \
-            .extra({'day': "date_trunc('day', app_fullness.ctime)::date", 'value': 'fullness_value'})\
+            .annotate(day=TruncDate('ctime'), value=F('fullness_value'))\
             .values('day', 'value')[0:15]
         if fullness_range_latest.count() == 0:
             result[self.ERROR_MESSAGE_CONTEXT_KEY] = \
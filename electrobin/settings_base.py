@@ -211,9 +211,35 @@ custom_redis_port = os.environ.get('REDIS_PORT', None)
 if custom_redis_port:
     REDIS_PORT = int(custom_redis_port)
 
-ROUTE_TO_SEND_HASH = 'route_to_send'
+# Commands to drivers are kept until acknowledged by the app or the route is started or closed, each command expires
+# on its own
+PENDING_DRIVER_COMMANDS_HASH_PREFIX = 'pending_driver_commands'
+PENDING_DRIVER_COMMANDS_TTL_SECONDS = 7 * 24 * 60 * 60
 
-ONLINE_MOBILE_USERS_SET = 'online_mobile_users'
+# Presence keys are refreshed by connected sockets, so ones of crashed sockets expire on their own
+ONLINE_MOBILE_USERS_KEY_PREFIX = 'online_mobile_users'
+ONLINE_MOBILE_USERS_TTL_SECONDS = 90
+
+MAP_DATA_VERSIONS_HASH = 'map_data_versions'
+MAP_DATA_VERSIONS_ALL_KEY = 'all'
+
+MAP_REMOVED_DEVICES_ZSET_PREFIX = 'map_removed_devices'
+MAP_REMOVED_DEVICES_RETENTION_SECONDS = 24 * 60 * 60
+# Changes lookup window is widened to catch devices updated by transactions committed after cursor was issued
+MAP_CHANGES_CURSOR_OVERLAP_SECONDS = 60
+
+MAP_BOUNDS_HASH_PREFIX = 'map_bounds'
+
+UNREAD_NOTIFICATIONS_SET_PREFIX = 'unread_notifications'
+
+DEVICE_NOTIFICATION_STATES_HASH_PREFIX = 'device_notification_states'
+# Bursts of device messages are evaluated for status notifications once per window
+DEVICE_STATUS_CHECK_COALESCE_SECONDS = 30
+# Conditions which stay active are notified about again after the interval
+DEVICE_NOTIFICATIONS_RENOTIFY_INTERVAL_SECONDS = 24 * 60 * 60
+custom_device_notifications_renotify_interval = os.environ.get('DEVICE_NOTIFICATIONS_RENOTIFY_INTERVAL_SECONDS', None)
+if custom_device_notifications_renotify_interval:
+    DEVICE_NOTIFICATIONS_RENOTIFY_INTERVAL_SECONDS = int(custom_device_notifications_renotify_interval)
 
 # Misc
 
@@ -230,6 +256,23 @@ custom_low_battery_status_icon_level_threshold = os.environ.get('LOW_BATTERY_STA
 if custom_low_battery_status_icon_level_threshold:
     LOW_BATTERY_STATUS_ICON_LEVEL_THRESHOLD = int(custom_low_battery_status_icon_level_threshold)
 
+# Line & stacked charts are downsampled to this number of points
+CHART_MAX_POINTS = 1000
+custom_chart_max_points = os.environ.get('CHART_MAX_POINTS', None)
+if custom_chart_max_points:
+    CHART_MAX_POINTS = int(custom_chart_max_points)
+
+# Devices on map are returned as grid clusters below this zoom level
+MAP_CLUSTERING_MAX_ZOOM = 14
+custom_map_clustering_max_zoom = os.environ.get('MAP_CLUSTERING_MAX_ZOOM', None)
+if custom_map_clustering_max_zoom:
+    MAP_CLUSTERING_MAX_ZOOM = int(custom_map_clustering_max_zoom)
+
+MAP_CLUSTERS_PER_TILE = 4
+custom_map_clusters_per_tile = os.environ.get('MAP_CLUSTERS_PER_TILE', None)
+if custom_map_clusters_per_tile:
+    MAP_CLUSTERS_PER_TILE = int(custom_map_clusters_per_tile)
+
 ACCUM_MIN_VOLTAGE = 11.8
 custom_accum_min_voltage = os.environ.get('ACCUM_MIN_VOLTAGE', None)
 if custom_accum_min_voltage:
@@ -346,8 +389,16 @@ CHANNEL_LAYERS = {
     },
 }
 
-MOBILE_API_CONSUMERS_GROUP_NAME = 'mobile_api_consumers'
-NOTIFICATIONS_CONSUMERS_GROUP_NAME = 'notifications_consumers'
+# Route commands are delivered to per driver groups
+DRIVER_CONSUMERS_GROUP_PREFIX = 'driver'
+# Notifications are delivered to per user groups
+NOTIFICATIONS_CONSUMERS_GROUP_PREFIX = 'notifications_consumers'
+# Outbox events are dispatched in batches of that size
+OUTBOX_DISPATCH_BATCH_SIZE = 500
+DEVICE_STATE_CONSUMERS_GROUP_PREFIX = 'device_state_consumers'
+# Device state changes within the window are pushed to live maps as a single delta
+DEVICE_STATE_DELTA_COALESCE_SECONDS = 1
+PENDING_DEVICE_TASKS_KEY_PREFIX = 'pending_device_tasks'
 
 # Push notifications
 
@@ -358,6 +409,11 @@ PUSH_NOTIFICATIONS_SETTINGS = {
 
 NEW_ROUTE_PUSH_MESSAGE_CODE = 'new_route_push_message'
 
+# Pushes requested within the window are sent by a single multicast per message
+PUSH_BATCH_COALESCE_SECONDS = 1
+QUEUED_PUSHES_KEY_PREFIX = 'queued_pushes'
+MOBILE_APP_TRANSLATIONS_CACHE_SECONDS = 5 * 60
+
 DEFAULT_MESSAGES_BY_CODES = {
     'new_route_push_message': 'New route received',
 }
@@ -368,6 +424,28 @@ CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/4'
 
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Maintenance tasks, the database scheduler adds these to the stored periodic tasks on start
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-devices-map-flags': {
+        'task': 'app.tasks.reconcile_devices_map_flags',
+        'schedule': 60 * 60,
+    },
+    # Picks up outbox events whose dispatch task got lost or failed
+    'dispatch-outbox-events': {
+        'task': 'apps.core.tasks.dispatch_outbox_events',
+        'schedule': 60,
+    },
+    # Cached bounds are only extended by devices changes, this shrinks them
+    'refresh-map-bounds': {
+        'task': 'apps.main.tasks.refresh_map_bounds',
+        'schedule': 60 * 60,
+    },
+    'reconcile-unread-notifications': {
+        'task': 'apps.core.tasks.reconcile_unread_notifications',
+        'schedule': 24 * 60 * 60,
+    },
+}
+
 # Fake data generator settings
 
 DATA_GEN_TEMPERATURE_MIN, DATA_GEN_TEMPERATURE_MAX, DATA_GEN_TEMPERATURE_RANDOM_DELTA = 10, 30, 3  # Celsius
@@ -440,6 +518,16 @@ DEFAULT_FROM_EMAIL = 'Binology <support@binology.freshdesk.com>'
 
 ONESIGNAL_APP_ID = os.environ.get('ONESIGNAL_APP_ID', 'afeeb4f6-20af-4f42-b812-0e16e8591244')
 ONESIGNAL_REST_API_KEY = os.environ.get('ONESIGNAL_REST_API_KEY', 'YWVhMDVhZWMtY2U3Yy00YzFiLWJkOTItYmRiNWIwZWQ5N2Mz')
+# Overridable to point deliveries to a local stand-in
+ONESIGNAL_NOTIFICATIONS_URL = os.environ.get('ONESIGNAL_NOTIFICATIONS_URL', 'https://onesignal.com/api/v1/notifications')
+
+# Periodic notifications are delivered by a bounded pool of threads
+NOTIFICATIONS_DELIVERY_WORKERS = 8
+custom_notifications_delivery_workers = os.environ.get('NOTIFICATIONS_DELIVERY_WORKERS', None)
+if custom_notifications_delivery_workers:
+    NOTIFICATIONS_DELIVERY_WORKERS = int(custom_notifications_delivery_workers)
+# Runs with transient delivery failures after which a notification channel is given up on
+NOTIFICATIONS_DELIVERY_MAX_ATTEMPTS = 5
 
 # Django Notifications
 
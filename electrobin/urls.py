@@ -6,13 +6,15 @@ from django.shortcuts import redirect
 from django.urls import reverse_lazy, path
 from os import listdir
 
-from apps.sensors.api import SensorListAPIView
+from apps.sensors.api import SensorListAPIView, SensorTileAPIView, SensorNearbyAPIView
+from apps.core.api import DeviceMetricAggregatesAPIView
 from app.api import (
-    ContainerListAPIView, CitiesListAPIView, MobileApiObtainAuthToken, UserProfile, MobileAppTranslationView,
-    get_trashbin_auth_token, TrashbinDataView, TrashbinJobsView, GenericObtainAuthToken,
+    ContainerListAPIView, ContainerTileAPIView, ContainerNearbyAPIView, CitiesListAPIView, MobileApiObtainAuthToken,
+    UserProfile, MobileAppTranslationView, get_trashbin_auth_token, TrashbinDataView, TrashbinJobsView,
+    GenericObtainAuthToken,
 )
 from apps.core.helpers import CompanyDeviceProfile
-from apps.core.urls import account_urlpatterns
+from apps.core.urls import account_urlpatterns, report_jobs_urlpatterns
 from apps.core.views import (
     create_top_level_static_view, TOP_LEVEL_STATIC_DIR, NotificationsFeedDataView, NotificationsListView,
     FollowNotificationView, MarkAllNotificationsReadView, NotificationsSettingsFormView, switch_language,
@@ -109,7 +111,12 @@ api_urlpatterns = [
     url(r'^trashbin/get-token/', get_trashbin_auth_token),
     url(r'^trashbin/data/', TrashbinDataView.as_view()),
     url(r'^trashbin/jobs/', TrashbinJobsView.as_view()),
+    url(r'^containers/nearby/$', ContainerNearbyAPIView.as_view()),
     url(r'^sensors/$', SensorListAPIView.as_view()),
+    url(r'^sensors/nearby/$', SensorNearbyAPIView.as_view()),
+    url(r'^tiles/trashbin/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', ContainerTileAPIView.as_view()),
+    url(r'^tiles/sensor/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', SensorTileAPIView.as_view()),
+    url(r'^metrics/aggregates/$', DeviceMetricAggregatesAPIView.as_view()),
     url(r'^get-auth-token/', GenericObtainAuthToken.as_view(), name='api-get-token'),
     url(r'^$', lambda r: redirect(reverse_lazy('api-get-token')), name='api-root'),
 ]
@@ -319,6 +326,7 @@ main_urlconfig = [
     url(r'^drivers/', include(route_drivers_urlpatterns)),
     # Отчеты
     url(r'^reports/', include(reports_urlpatterns)),
+    path('report-jobs/', include(report_jobs_urlpatterns)),
     # Админка
     url(r'^admin/', admin.site.urls),
     # Аккаунт
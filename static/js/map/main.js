@@ -1,10 +1,12 @@
 var map;
 var markers = [];
 var mapRefreshInterval = 300000;
+var liveMapRefreshInterval = 900000;
 var animatedMarkersAppearance = false;
 var refreshMapInterval;
 var scaledMarkerImageSize;
 var markerClusterer;
+var gridClusterMarkers = [];
 var effectiveAutoCard = undefined;
 
 function addMarker(location, onClickHandler, pickable) {
@@ -41,6 +43,20 @@ function createMarkerClusterer(map, markers, avoidDrawClusters) {
   return clusterer;
 }
 
+function addGridClusterMarker(cluster) {
+  var marker = new google.maps.Marker({
+    position: {lat: cluster.location.y, lng: cluster.location.x},
+    label: {text: cluster.devices_count.toString(), fontSize: '15px'},
+    icon: {url: clusterImagesUrls[Math.min(Math.floor(Math.log10(cluster.devices_count)), 4)]},
+  });
+  marker.addListener('click', function () {
+    map.setCenter(marker.getPosition());
+    map.setZoom(map.getZoom() + 2);
+  });
+  marker.gridCluster = cluster;
+  return marker;
+}
+
 function refreshMarkerIcon(m) {
   var iconUrl = undefined;
   if (!!m.container) iconUrl = getBinImage(m.container, getCurrentCard());
@@ -59,12 +75,13 @@ function showDevices() {
   var filters = getFilters();
   var bounds = getBounds(map);
   if (typeof bounds === "undefined") return;
+  var zoom = 'zoom=' + map.getZoom();
 
   var binsRequest = fetchTrashbins
-    ? $.getJSON('/api/containers/?' + filters + '&' + bounds)
+    ? $.getJSON('/api/containers/?' + filters + '&' + bounds + '&' + zoom)
     : [ { stations: [], containers: [] } ];
   var sensorsRequest = fetchSensors
-    ? $.getJSON('/api/sensors/?' + filters + '&' + bounds)
+    ? $.getJSON('/api/sensors/?' + filters + '&' + bounds + '&' + zoom)
     : [ { sensors: [] } ];
 
   var autoCardMarker = undefined;
@@ -122,6 +139,13 @@ function showDevices() {
       }
     });
 
+    // Clusters computed on the server are shown as is, bypassing client side clustering
+    var oldGridClusterMarkers = gridClusterMarkers;
+    gridClusterMarkers = _.concat(containersResp[0].clusters || [], sensorsResp[0].clusters || [])
+      .map(addGridClusterMarker);
+    gridClusterMarkers.forEach(function (m) { m.setMap(map); });
+    oldGridClusterMarkers.forEach(function (m) { m.setMap(null); });
+
     if (!animatedMarkersAppearance) animatedMarkersAppearance = true;
 
     // Disallow clustering at highest zoom level to allow individual bins to be seen
@@ -152,6 +176,50 @@ function showDevices() {
   });
 }
 
+function applyDeviceStateDelta(delta) {
+  // Device sets are filtered server side, so added & removed devices are picked up by reloading them
+  if (delta.added || delta.removed) {
+    longDebouncedShowContainers();
+    return;
+  }
+  var isBin = delta.device_type === 'trashbin';
+  var device = isBin
+    ? (currentData ? findCurrentDataContainerById(delta.id) : undefined)
+    : _.get(_.find(markers, function (m) { return !!m.sensor && m.sensor.id === delta.id; }), 'sensor');
+  if (!device) return;
+
+  _.assign(device.fullness, delta.fullness);
+  device.battery = delta.battery;
+  device.any_active_errors = delta.any_active_errors;
+  device.any_active_routes = delta.any_active_routes;
+  var moved = device.location.x !== delta.location.x || device.location.y !== delta.location.y;
+  device.location = delta.location;
+
+  markers.forEach(function (m) {
+    var inStation = isBin && !!m.station && (m.station.master === delta.id || m.station.satellites.indexOf(delta.id) >= 0);
+    if (m.container !== device && m.sensor !== device && !inStation) return;
+    if (moved && !inStation) m.setPosition({lat: delta.location.y, lng: delta.location.x});
+    refreshMarkerIcon(m);
+  });
+}
+
+// Live updates cover devices state while the socket is open, so the periodic map refresh is slowed down
+// to just pick up changes which aren't streamed
+function subscribeToDeviceState() {
+  var deviceStateWs = new WebSocket(realtimeApiRootUrl + '/ws/device-state/' + realtimeApiAuthToken);
+  deviceStateWs.onopen = function () {
+    clearInterval(refreshMapInterval);
+    refreshMapInterval = setInterval(showDevices, liveMapRefreshInterval);
+  };
+  deviceStateWs.onmessage = function (msg) {
+    applyDeviceStateDelta(JSON.parse(msg.data));
+  };
+  deviceStateWs.onclose = function () {
+    clearInterval(refreshMapInterval);
+    refreshMapInterval = setInterval(showDevices, mapRefreshInterval);
+  };
+}
+
 var debouncedShowContainers = _.debounce(showDevices, 500);
 var longDebouncedShowContainers = _.debounce(showDevices, 1000);
 
@@ -298,6 +366,7 @@ $(document).ready(function () {
   refreshMapInterval = setInterval(function () {
     showDevices();
   }, mapRefreshInterval);
+  if (typeof realtimeApiAuthToken !== 'undefined') subscribeToDeviceState();
 
   if (typeof initCards === 'function') {
     initCards(function(devices) {
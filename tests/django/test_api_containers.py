@@ -46,6 +46,9 @@ class ApiContainersTests(TestCase):
         self.assertDictEqual({'x': 37, 'y': 55}, response_json['stations'][0]['location'])
         self.assertEqual(master_container.id, response_json['stations'][0]['master'])
         self.assertListEqual([satellite_container.id], response_json['stations'][0]['satellites'])
+        containers_master_ids = {c['id']: c['master_bin_id'] for c in response_json['containers']}
+        self.assertDictEqual(
+            {master_container.id: None, satellite_container.id: master_container.id}, containers_master_ids)
 
     def test_multiple_clusters_output(self):
         # ARRANGE
@@ -69,6 +72,36 @@ class ApiContainersTests(TestCase):
         self.assertEqual(master_container_two.id, response_json['stations'][1]['master'])
         self.assertListEqual([satellite_container_two.id], response_json['stations'][1]['satellites'])
 
+    def test_station_satellites_aggregated(self):
+        # ARRANGE
+        master_container = self._create_container()
+        satellite_ids = [self._create_container(
+            serial_number=f'bar_container_{i}', is_master=False, master_bin=master_container).id for i in range(3)]
+        # ACT
+        response = self.client.get('/api/containers/')
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        response_json = response.json()
+        self.assertEqual(1, len(response_json['stations']))
+        self.assertListEqual(sorted(satellite_ids), response_json['stations'][0]['satellites'])
+
+    def test_station_of_filtered_out_master_output(self):
+        # ARRANGE
+        other_waste_type = WasteType.objects.create(title='bar_waste_type', density=0.1)
+        master_container = self._create_container(waste_type=other_waste_type)
+        satellite_container = self._create_container(
+            serial_number='bar_container', is_master=False, master_bin=master_container)
+        # ACT
+        response = self.client.get('/api/containers/', {'waste_type': self.waste_type.id})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        response_json = response.json()
+        self.assertListEqual([satellite_container.id], [c['id'] for c in response_json['containers']])
+        self.assertEqual(1, len(response_json['stations']))
+        self.assertDictEqual({'x': 37, 'y': 55}, response_json['stations'][0]['location'])
+        self.assertEqual(master_container.id, response_json['stations'][0]['master'])
+        self.assertListEqual([satellite_container.id], response_json['stations'][0]['satellites'])
+
     def _create_container(self, **kwargs):
         container_args = {
             'serial_number': 'foo_container',
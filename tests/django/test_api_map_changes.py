@@ -0,0 +1,136 @@
+import time
+
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+from unittest import mock
+
+from apps.core.models import Sectors
+from app.models import Country, City, Company, ContainerType, WasteType, Container, Routes, Route, RoutePoints
+
+
+@override_settings(MAP_CHANGES_CURSOR_OVERLAP_SECONDS=0)
+class ApiMapChangesTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.sector = Sectors.objects.get(company=self.company)
+        self.container_type = ContainerType.objects.create(title='foo_container_type')
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        self.superuser = User.objects.create(username='foo_user', is_staff=True, is_superuser=True)
+        self.superuser.set_password('bar')
+        self.superuser.save()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='foo_user', password='bar'))
+        self.redis_client = mock.Mock(**{
+            'get_map_data_version.return_value': 1,
+            'get_removed_map_devices.return_value': [],
+        })
+        redis_client_patcher = mock.patch('apps.core.api.RedisClient', return_value=self.redis_client)
+        redis_client_patcher.start()
+        self.addCleanup(redis_client_patcher.stop)
+
+    def test_not_modified_until_data_version_bumped(self):
+        # ARRANGE
+        self._create_container('foo_container')
+        etag = self.client.get('/api/containers/')['ETag']
+        # ACT
+        not_modified_response = self.client.get('/api/containers/', HTTP_IF_NONE_MATCH=etag)
+        self.redis_client.get_map_data_version.return_value = 2
+        modified_response = self.client.get('/api/containers/', HTTP_IF_NONE_MATCH=etag)
+        # ASSERT
+        self.assertEqual(304, not_modified_response.status_code)
+        self.assertEqual(200, modified_response.status_code)
+        self.assertNotEqual(etag, modified_response['ETag'])
+        self.assertEqual(1, len(modified_response.json()['containers']))
+
+    def test_changes_since_cursor(self):
+        # ARRANGE
+        self._create_container('foo_container')
+        routed_container = self._create_container('bar_container')
+        Container.objects.update(mtime=timezone.now() - timedelta(hours=1))
+        since = time.time() - 60
+        self._create_route_point(routed_container)
+        # ACT
+        response = self.client.get('/api/containers/', {'since': since})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        response_json = response.json()
+        self.assertFalse(response_json['full'])
+        self.assertListEqual([routed_container.id], [c['id'] for c in response_json['containers']])
+        self.assertTrue(response_json['containers'][0]['any_active_routes'])
+        self.assertListEqual([], response_json['removed'])
+        self.assertGreater(response_json['cursor'], since)
+
+    def test_removed_devices_since_cursor(self):
+        # ARRANGE
+        other_waste_type = WasteType.objects.create(title='bar_waste_type', density=0.1)
+        container = self._create_container('foo_container')
+        Container.objects.update(mtime=timezone.now() - timedelta(hours=1))
+        since = time.time() - 60
+        container.waste_type = other_waste_type
+        container.save()
+        self.redis_client.get_removed_map_devices.return_value = [container.id + 1]
+        # ACT
+        response = self.client.get('/api/containers/', {'since': since, 'waste_type': self.waste_type.id})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertListEqual([], response.json()['containers'])
+        self.assertListEqual([container.id, container.id + 1], response.json()['removed'])
+
+    def test_expired_cursor_reloads_full_data(self):
+        # ARRANGE
+        self._create_container('foo_container')
+        Container.objects.update(mtime=timezone.now() - timedelta(days=2))
+        # ACT
+        with self.settings(MAP_REMOVED_DEVICES_RETENTION_SECONDS=24 * 60 * 60):
+            response = self.client.get('/api/containers/', {'since': time.time() - 2 * 24 * 60 * 60})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.json()['full'])
+        self.assertEqual(1, len(response.json()['containers']))
+        self.assertNotIn('removed', response.json())
+
+    def test_invalid_cursor(self):
+        # ACT
+        response = self.client.get('/api/containers/', {'since': 'foo'})
+        # ASSERT
+        self.assertEqual(400, response.status_code)
+        self.assertIn('since', response.json())
+
+    def test_route_points_changes_bump_data_version(self):
+        # ARRANGE
+        container = self._create_container('foo_container')
+        Container.objects.update(mtime=timezone.now() - timedelta(hours=1))
+        # ACT
+        with mock.patch('app.models.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('app.redis_client.RedisClient', return_value=self.redis_client), \
+                mock.patch('apps.core.tasks.schedule_device_state_delta'):
+            route_point = self._create_route_point(container)
+            created_mtime = Container.objects.get(pk=container.pk).mtime
+            route_point.delete()
+        # ASSERT
+        self.assertGreater(created_mtime, timezone.now() - timedelta(minutes=1))
+        self.assertFalse(Container.objects.get(pk=container.pk).on_active_route)
+        self.assertListEqual(
+            [mock.call(self.company.id)] * 2, self.redis_client.bump_map_data_version.call_args_list)
+
+    def test_password_update_touches_mtime(self):
+        # ACT
+        container = self._create_container('foo_container')
+        # ASSERT
+        self.assertEqual(container.mtime, Container.objects.get(pk=container.pk).mtime)
+
+    def _create_container(self, serial_number):
+        return Container.objects.create(
+            serial_number=serial_number, phone_number='-', container_type=self.container_type, is_master=True,
+            company=self.company, country=self.country, city=self.city, address='Foo Address', sector=self.sector,
+            waste_type=self.waste_type)
+
+    def _create_route_point(self, container):
+        base_route = Routes.objects.create(company=self.company)
+        route = Route.objects.create(user=self.superuser, route_json=[], parent_route=base_route)
+        return RoutePoints.objects.create(
+            user=self.superuser, container=container, parent_route=base_route, route=route)
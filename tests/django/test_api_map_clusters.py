@@ -0,0 +1,106 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client, override_settings
+
+from apps.core.models import Sectors
+from apps.sensors.models import Sensor, SensorSettingsProfile, ContainerType as SensorContainerType
+from app.models import Country, City, Company, ContainerType, WasteType, Container
+
+
+@override_settings(MAP_CLUSTERING_MAX_ZOOM=14, MAP_CLUSTERS_PER_TILE=4, LOW_BATTERY_STATUS_ICON_LEVEL_THRESHOLD=20)
+class ApiMapClustersTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.sector = Sectors.objects.get(company=self.company)
+        self.container_type = ContainerType.objects.create(title='foo_container_type')
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        self.other_waste_type = WasteType.objects.create(title='bar_waste_type', density=0.1)
+        superuser = User.objects.create(username='foo_user', is_staff=True, is_superuser=True)
+        superuser.set_password('bar')
+        superuser.save()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='foo_user', password='bar'))
+
+    def test_containers_grouped_into_grid_cells(self):
+        # ARRANGE
+        self._create_container('foo_1', 'SRID=4326;POINT (37.001 55.001)', fullness=10, battery=10)
+        self._create_container('foo_2', 'SRID=4326;POINT (37.003 55.003)', fullness=70, battery=90)
+        self._create_container('foo_3', 'SRID=4326;POINT (20 60)', fullness=30, battery=90)
+        # ACT
+        response = self.client.get('/api/containers/', {'zoom': 5})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        response_json = response.json()
+        self.assertListEqual([], response_json['containers'])
+        clusters = sorted(response_json['clusters'], key=lambda c: c['devices_count'])
+        self.assertEqual(2, len(clusters))
+        self.assertEqual(1, clusters[0]['devices_count'])
+        self.assertAlmostEqual(20, clusters[0]['location']['x'])
+        self.assertAlmostEqual(60, clusters[0]['location']['y'])
+        self.assertEqual(30, clusters[0]['max_fullness'])
+        self.assertEqual(2, clusters[1]['devices_count'])
+        self.assertAlmostEqual(37.002, clusters[1]['location']['x'])
+        self.assertAlmostEqual(55.002, clusters[1]['location']['y'])
+        self.assertEqual(70, clusters[1]['max_fullness'])
+        self.assertEqual(1, clusters[1]['low_battery_count'])
+        self.assertEqual(0, clusters[1]['errors_count'])
+
+    def test_clusters_follow_filters(self):
+        # ARRANGE
+        self._create_container('foo_1', 'SRID=4326;POINT (37.001 55.001)')
+        self._create_container('foo_2', 'SRID=4326;POINT (37.003 55.003)', waste_type=self.other_waste_type)
+        # ACT
+        response = self.client.get('/api/containers/', {'zoom': 5, 'waste_type': self.waste_type.id})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertListEqual([1], [c['devices_count'] for c in response.json()['clusters']])
+
+    def test_devices_returned_at_high_zoom(self):
+        # ARRANGE
+        self._create_container('foo_1', 'SRID=4326;POINT (37.001 55.001)')
+        for zoom in (14, 'foo'):
+            with self.subTest(zoom):
+                # ACT
+                response = self.client.get('/api/containers/', {'zoom': zoom})
+                # ASSERT
+                self.assertEqual(200, response.status_code)
+                self.assertNotIn('clusters', response.json())
+                self.assertEqual(1, len(response.json()['containers']))
+
+    def test_sensors_grouped_into_grid_cells(self):
+        # ARRANGE
+        settings_profile = SensorSettingsProfile.objects.create(name='foo_profile')
+        container_type = SensorContainerType.objects.create(volume=1)
+        for serial_number, location, disabled in (
+                ('foo_1', 'SRID=4326;POINT (37.001 55.001)', False),
+                ('foo_2', 'SRID=4326;POINT (37.003 55.003)', False),
+                ('foo_3', 'SRID=4326;POINT (37.002 55.002)', True)):
+            Sensor.objects.create(
+                serial_number=serial_number, hardware_identity=serial_number, company=self.company,
+                country=self.country, city=self.city, sector=self.sector, waste_type=self.waste_type,
+                location=location, settings_profile=settings_profile, container_type=container_type,
+                disabled=disabled)
+        # ACT
+        response = self.client.get('/api/sensors/', {'zoom': 5})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        response_json = response.json()
+        self.assertListEqual([], response_json['sensors'])
+        self.assertListEqual([2], [c['devices_count'] for c in response_json['clusters']])
+
+    def _create_container(self, serial_number, location, **kwargs):
+        container_args = {
+            'serial_number': serial_number,
+            'phone_number': '-',
+            'container_type': self.container_type,
+            'is_master': True,
+            'company': self.company, 'country': self.country,
+            'city': self.city,
+            'address': 'Foo Address',
+            'sector': self.sector,
+            'waste_type': self.waste_type,
+            'location': location,
+        }
+        container_args.update(kwargs)
+        return Container.objects.create(**container_args)
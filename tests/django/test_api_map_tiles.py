@@ -0,0 +1,83 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from unittest import mock
+
+from apps.core.models import Sectors
+from apps.sensors.models import Sensor, SensorSettingsProfile, ContainerType as SensorContainerType
+from app.models import Country, City, Company, ContainerType, WasteType, Container
+
+
+class ApiMapTilesTests(TestCase):
+    # Tile of zoom level 10 covering 37 E, 55 N
+    tile_url = '/api/tiles/trashbin/10/617/323.mvt'
+
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.sector = Sectors.objects.get(company=self.company)
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        Container.objects.create(
+            serial_number='foo_container', phone_number='-',
+            container_type=ContainerType.objects.create(title='foo_container_type'), is_master=True,
+            company=self.company, country=self.country, city=self.city, address='Foo Address', sector=self.sector,
+            waste_type=self.waste_type, location='SRID=4326;POINT (37 55)')
+        superuser = User.objects.create(username='foo_user', is_staff=True, is_superuser=True)
+        superuser.set_password('bar')
+        superuser.save()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='foo_user', password='bar'))
+        self.redis_client = mock.Mock(**{'get_map_data_version.return_value': 1})
+        redis_client_patcher = mock.patch('apps.core.api.RedisClient', return_value=self.redis_client)
+        redis_client_patcher.start()
+        self.addCleanup(redis_client_patcher.stop)
+
+    def test_tile_rendered(self):
+        # ACT
+        response = self.client.get(self.tile_url)
+        empty_response = self.client.get('/api/tiles/trashbin/10/0/0.mvt')
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/vnd.mapbox-vector-tile', response['Content-Type'])
+        self.assertIn(b'containers', response.content)
+        self.assertIn(b'foo_container', response.content)
+        self.assertEqual(200, empty_response.status_code)
+        self.assertEqual(b'', empty_response.content)
+
+    def test_sensors_tile_rendered(self):
+        # ARRANGE
+        Sensor.objects.create(
+            serial_number='foo_sensor', hardware_identity='foo_sensor', company=self.company, country=self.country,
+            city=self.city, sector=self.sector, waste_type=self.waste_type, location='SRID=4326;POINT (37 55)',
+            settings_profile=SensorSettingsProfile.objects.create(name='foo_profile'),
+            container_type=SensorContainerType.objects.create(volume=1))
+        # ACT
+        response = self.client.get('/api/tiles/sensor/10/617/323.mvt')
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertIn(b'sensors', response.content)
+        self.assertIn(b'foo_sensor', response.content)
+
+    def test_tile_out_of_range(self):
+        for url in ('/api/tiles/trashbin/1/2/0.mvt', '/api/tiles/trashbin/23/0/0.mvt'):
+            with self.subTest(url):
+                # ACT
+                response = self.client.get(url)
+                # ASSERT
+                self.assertEqual(404, response.status_code)
+
+    def test_not_modified_until_data_version_bumped(self):
+        # ARRANGE
+        etag = self.client.get(self.tile_url)['ETag']
+        # ACT
+        with mock.patch('apps.core.api.render_mvt_tile') as render_mock:
+            not_modified_response = self.client.get(self.tile_url, HTTP_IF_NONE_MATCH=etag)
+        other_tile_response = self.client.get('/api/tiles/trashbin/10/617/324.mvt', HTTP_IF_NONE_MATCH=etag)
+        self.redis_client.get_map_data_version.return_value = 2
+        modified_response = self.client.get(self.tile_url, HTTP_IF_NONE_MATCH=etag)
+        # ASSERT
+        self.assertEqual(304, not_modified_response.status_code)
+        render_mock.assert_not_called()
+        self.assertEqual(200, other_tile_response.status_code)
+        self.assertEqual(200, modified_response.status_code)
+        self.assertNotEqual(etag, modified_response['ETag'])
@@ -0,0 +1,104 @@
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.utils import timezone
+
+from apps.core.models import Sectors
+from app.models import Country, City, Company, ContainerType, WasteType, Container, FullnessValues
+
+
+class ApiMetricAggregatesTests(TestCase):
+    url = '/api/metrics/aggregates/'
+
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.other_city = City.objects.create(country=self.country, title='bar_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.sector = Sectors.objects.get(company=self.company)
+        self.container_type = ContainerType.objects.create(title='foo_container_type')
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        superuser = User.objects.create(username='foo_user', is_staff=True, is_superuser=True)
+        superuser.set_password('bar')
+        superuser.save()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='foo_user', password='bar'))
+
+    def test_daily_average_per_device(self):
+        # ARRANGE
+        container = self._create_container('foo_container', self.city)
+        self._create_fullness(container, datetime(2020, 1, 1, 10), 20)
+        self._create_fullness(container, datetime(2020, 1, 1, 20), 40)
+        self._create_fullness(container, datetime(2020, 1, 2, 10), 60)
+        # ACT
+        response = self.client.get(self.url, {
+            'metric': 'fullness', 'from': '2020-01-01T00:00:00Z', 'to': '2020-01-03T00:00:00Z'})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertListEqual([
+            {'bucket': '2020-01-01T00:00:00+00:00', 'device': container.id, 'avg': 30},
+            {'bucket': '2020-01-02T00:00:00+00:00', 'device': container.id, 'avg': 60},
+        ], response.json()['results'])
+
+    def test_filter_by_cities_list(self):
+        # ARRANGE
+        container = self._create_container('foo_container', self.city)
+        other_container = self._create_container('bar_container', self.other_city)
+        self._create_fullness(container, datetime(2020, 1, 1, 10), 20)
+        self._create_fullness(other_container, datetime(2020, 1, 1, 10), 40)
+        # ACT
+        response = self.client.get(self.url, {
+            'metric': 'fullness', 'from': '2020-01-01T00:00:00Z', 'to': '2020-01-03T00:00:00Z',
+            'city': f'{self.city.id},{self.other_city.id}', 'group_by_device': 'false'})
+        only_city_response = self.client.get(self.url, {
+            'metric': 'fullness', 'from': '2020-01-01T00:00:00Z', 'to': '2020-01-03T00:00:00Z',
+            'city': str(self.other_city.id)})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertListEqual([{'bucket': '2020-01-01T00:00:00+00:00', 'avg': 30}], response.json()['results'])
+        self.assertEqual(200, only_city_response.status_code)
+        self.assertListEqual([other_container.id], [r['device'] for r in only_city_response.json()['results']])
+
+    def test_invalid_ids_lists(self):
+        for param_name in ('company', 'city', 'waste_type', 'devices'):
+            with self.subTest(param_name):
+                # ACT
+                response = self.client.get(self.url, {
+                    'metric': 'fullness', 'from': '2020-01-01T00:00:00Z', param_name: '1,foo'})
+                # ASSERT
+                self.assertEqual(400, response.status_code)
+                self.assertIn(param_name, response.json())
+
+    def test_invalid_datetimes(self):
+        for param_name, value in (('from', 'foo'), ('from', '2020-13-01T00:00'), ('to', '2020-01-32T00:00')):
+            with self.subTest(f'{param_name}={value}'):
+                # ARRANGE
+                params = {'metric': 'fullness', 'from': '2020-01-01T00:00:00Z'}
+                params[param_name] = value
+                # ACT
+                response = self.client.get(self.url, params)
+                # ASSERT
+                self.assertEqual(400, response.status_code)
+                self.assertIn(param_name, response.json())
+
+    def test_not_modified(self):
+        # ARRANGE
+        container = self._create_container('foo_container', self.city)
+        self._create_fullness(container, datetime(2020, 1, 1, 10), 20)
+        params = {'metric': 'fullness', 'from': '2020-01-01T00:00:00Z', 'to': '2020-01-03T00:00:00Z'}
+        etag = self.client.get(self.url, params)['ETag']
+        # ACT
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        # ASSERT
+        self.assertEqual(304, response.status_code)
+
+    def _create_container(self, serial_number, city):
+        return Container.objects.create(
+            serial_number=serial_number, phone_number='-', container_type=self.container_type,
+            company=self.company, country=self.country, city=city, address='Foo Address', sector=self.sector,
+            waste_type=self.waste_type)
+
+    @staticmethod
+    def _create_fullness(container, ctime, value):
+        FullnessValues.objects.create(
+            container=container, ctime=timezone.make_aware(ctime, timezone.utc), fullness_value=value)
@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+
+from apps.core.models import Sectors
+from apps.sensors.models import Sensor, SensorSettingsProfile, ContainerType as SensorContainerType
+from app.models import Country, City, Company, ContainerType, WasteType, Container
+
+
+class ApiNearbyTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.sector = Sectors.objects.get(company=self.company)
+        self.container_type = ContainerType.objects.create(title='foo_container_type')
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        superuser = User.objects.create(username='foo_user', is_staff=True, is_superuser=True)
+        superuser.set_password('bar')
+        superuser.save()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='foo_user', password='bar'))
+
+    def test_containers_ordered_by_distance(self):
+        # ARRANGE
+        far_container = self._create_container('foo_far', 'SRID=4326;POINT (20 60)')
+        near_container = self._create_container('foo_near', 'SRID=4326;POINT (37.01 55)')
+        closest_container = self._create_container('foo_closest', 'SRID=4326;POINT (37 55)')
+        # ACT
+        response = self.client.get('/api/containers/nearby/', {'lng': 37, 'lat': 55})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        containers = response.json()['containers']
+        self.assertListEqual(
+            [closest_container.id, near_container.id, far_container.id], [c['id'] for c in containers])
+        self.assertAlmostEqual(0, containers[0]['distance'], delta=1)
+        # 0.01 degree of longitude at 55 degrees of latitude
+        self.assertAlmostEqual(640, containers[1]['distance'], delta=10)
+
+    def test_containers_within_radius_and_limit(self):
+        # ARRANGE
+        self._create_container('foo_far', 'SRID=4326;POINT (20 60)')
+        near_container = self._create_container('foo_near', 'SRID=4326;POINT (37.01 55)')
+        closest_container = self._create_container('foo_closest', 'SRID=4326;POINT (37 55)')
+        # ACT
+        radius_response = self.client.get('/api/containers/nearby/', {'lng': 37, 'lat': 55, 'radius': 1000})
+        limit_response = self.client.get('/api/containers/nearby/', {'lng': 37, 'lat': 55, 'limit': 1})
+        # ASSERT
+        self.assertEqual(200, radius_response.status_code)
+        self.assertListEqual(
+            [closest_container.id, near_container.id], [c['id'] for c in radius_response.json()['containers']])
+        self.assertEqual(200, limit_response.status_code)
+        self.assertListEqual([closest_container.id], [c['id'] for c in limit_response.json()['containers']])
+
+    def test_invalid_params(self):
+        for params, param_name in (
+                ({'lat': 55}, 'lng'),
+                ({'lng': 'foo', 'lat': 55}, 'lng'),
+                ({'lng': 37, 'lat': 100}, 'lat'),
+                ({'lng': 37, 'lat': 55, 'radius': -1}, 'radius'),
+                ({'lng': 37, 'lat': 55, 'limit': 0}, 'limit'),
+                ({'lng': 37, 'lat': 55, 'limit': 'foo'}, 'limit')):
+            with self.subTest(params):
+                # ACT
+                response = self.client.get('/api/containers/nearby/', params)
+                # ASSERT
+                self.assertEqual(400, response.status_code)
+                self.assertIn(param_name, response.json())
+
+    def test_disabled_sensors_skipped(self):
+        # ARRANGE
+        settings_profile = SensorSettingsProfile.objects.create(name='foo_profile')
+        container_type = SensorContainerType.objects.create(volume=1)
+        sensors = [Sensor.objects.create(
+            serial_number=serial_number, hardware_identity=serial_number, company=self.company,
+            country=self.country, city=self.city, sector=self.sector, waste_type=self.waste_type,
+            location=location, settings_profile=settings_profile, container_type=container_type,
+            disabled=disabled) for serial_number, location, disabled in (
+                ('foo_near', 'SRID=4326;POINT (37.01 55)', False),
+                ('foo_closest', 'SRID=4326;POINT (37 55)', True),
+                ('foo_far', 'SRID=4326;POINT (20 60)', False))]
+        # ACT
+        response = self.client.get('/api/sensors/nearby/', {'lng': 37, 'lat': 55})
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        self.assertListEqual([sensors[0].id, sensors[2].id], [s['id'] for s in response.json()['sensors']])
+
+    def _create_container(self, serial_number, location):
+        return Container.objects.create(
+            serial_number=serial_number, phone_number='-', container_type=self.container_type, is_master=True,
+            company=self.company, country=self.country, city=self.city, address='Foo Address', sector=self.sector,
+            waste_type=self.waste_type, location=location)
@@ -0,0 +1,55 @@
+from django.test import TestCase
+from django.utils import translation
+
+from apps.core.models import Sectors
+from apps.core.serializers import DeviceValuesSerializer
+from app.models import Country, City, Company, ContainerType, WasteType, Container
+
+
+class DeviceValuesSerializerTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title_en='foo_city', title_ru='')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.sector = Sectors.objects.get(company=self.company)
+        self.container = Container.objects.create(
+            serial_number='foo_container', phone_number='-',
+            container_type=ContainerType.objects.create(title='foo_container_type'), company=self.company,
+            country=self.country, city=self.city, address='Foo Address', sector=self.sector,
+            waste_type=WasteType.objects.create(title='foo_waste_type', density=0.1),
+            location='SRID=4326;POINT (37 55)')
+
+    def test_device_output(self):
+        # ACT
+        data = DeviceValuesSerializer(Container.objects.all()).data
+        # ASSERT
+        self.assertEqual(1, len(data))
+        self.assertEqual(self.container.id, data[0]['id'])
+        self.assertDictEqual({'id': self.city.id, 'title': 'foo_city'}, data[0]['city'])
+        self.assertDictEqual({'id': self.sector.id, 'name': self.sector.name}, data[0]['sector'])
+        self.assertDictEqual({'x': 37, 'y': 55}, data[0]['location'])
+
+    def test_device_without_sector_and_city(self):
+        # ARRANGE
+        row = dict.fromkeys(DeviceValuesSerializer.fields + ('location_x', 'location_y', 'city_title'))
+        # ACT
+        result = DeviceValuesSerializer(Container.objects.none()).to_representation(row)
+        # ASSERT
+        self.assertIsNone(result['sector'])
+        self.assertIsNone(result['city'])
+
+    def test_city_title_translated(self):
+        # ARRANGE
+        City.objects.filter(pk=self.city.pk).update(title_ru='bar_city')
+        # ACT
+        with translation.override('ru'):
+            data = DeviceValuesSerializer(Container.objects.all()).data
+        # ASSERT
+        self.assertEqual('bar_city', data[0]['city']['title'])
+
+    def test_city_title_falls_back_to_default_language(self):
+        # ACT
+        with translation.override('ru'):
+            data = DeviceValuesSerializer(Container.objects.all()).data
+        # ASSERT
+        self.assertEqual('foo_city', data[0]['city']['title'])
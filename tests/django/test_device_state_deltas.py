@@ -0,0 +1,94 @@
+from django.test import TestCase
+from unittest import mock
+
+from apps.core.helpers import CompanyDeviceProfile
+from apps.core.models import Sectors
+from apps.core.tasks import send_device_state_delta, send_device_removal_delta
+from apps.sensors.models import Sensor, SensorSettingsProfile, ContainerType as SensorContainerType
+from app.models import Country, City, Company, ContainerType, WasteType, Container, refresh_devices_map_flags
+
+
+class DeviceStateDeltasTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.other_company = Company.objects.create(name='bar_company', country=self.country)
+        self.sector = Sectors.objects.get(company=self.company)
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        self.sensor = Sensor.objects.create(
+            serial_number='foo_sensor', hardware_identity='foo_sensor', company=self.company, country=self.country,
+            city=self.city, sector=self.sector, waste_type=self.waste_type,
+            settings_profile=SensorSettingsProfile.objects.create(name='foo_profile'),
+            container_type=SensorContainerType.objects.create(volume=1))
+        for patcher in (
+                mock.patch('django.db.transaction.on_commit', side_effect=lambda func: func()),
+                mock.patch('app.signals.RedisClient'),
+                mock.patch('apps.sensors.signals.RedisClient'),
+                mock.patch('apps.core.tasks.RedisClient')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        state_delay_patcher = mock.patch('apps.core.tasks.send_device_state_delta.delay')
+        self.state_delay_mock = state_delay_patcher.start()
+        self.addCleanup(state_delay_patcher.stop)
+        removal_delay_patcher = mock.patch('apps.core.tasks.send_device_removal_delta.delay')
+        self.removal_delay_mock = removal_delay_patcher.start()
+        self.addCleanup(removal_delay_patcher.stop)
+
+    def test_flags_refresh_sends_deltas(self):
+        # ARRANGE
+        container = self._create_container()
+        # ACT
+        with mock.patch('apps.core.tasks.schedule_device_state_delta') as schedule_mock, \
+                mock.patch('app.redis_client.RedisClient'):
+            refresh_devices_map_flags([container.id], [self.sensor.id])
+        # ASSERT
+        self.assertListEqual([
+            mock.call(CompanyDeviceProfile.TRASHBIN.value, container.id),
+            mock.call(CompanyDeviceProfile.SENSOR.value, self.sensor.id),
+        ], schedule_mock.call_args_list)
+
+    def test_created_and_deleted_device_deltas(self):
+        # ACT
+        container = self._create_container()
+        container_id = container.id
+        container.delete()
+        # ASSERT
+        self.state_delay_mock.assert_called_once_with(CompanyDeviceProfile.TRASHBIN.value, container_id, True)
+        self.removal_delay_mock.assert_called_once_with(
+            CompanyDeviceProfile.TRASHBIN.value, container_id, self.company.id, None)
+
+    def test_moved_device_deltas(self):
+        # ARRANGE
+        sensor = Sensor.objects.get(pk=self.sensor.pk)
+        # ACT
+        with mock.patch('apps.sensors.tasks.sync_sensor_time_series_company.delay'):
+            sensor.save()
+            sensor.company = self.other_company
+            sensor.sector = Sectors.objects.get(company=self.other_company)
+            sensor.save()
+        # ASSERT
+        self.state_delay_mock.assert_called_once_with(CompanyDeviceProfile.SENSOR.value, self.sensor.id, True)
+        self.removal_delay_mock.assert_called_once_with(CompanyDeviceProfile.SENSOR.value, self.sensor.id, self.company.id)
+
+    def test_delta_sent_to_groups(self):
+        # ACT
+        with mock.patch('apps.core.tasks._send_device_state_delta_to_groups') as send_mock, \
+                mock.patch('apps.core.tasks.release_coalesced_device_task'):
+            send_device_state_delta(CompanyDeviceProfile.SENSOR.value, self.sensor.id, True)
+            send_device_removal_delta(CompanyDeviceProfile.SENSOR.value, self.sensor.id, self.company.id, None)
+        # ASSERT
+        (added_delta, added_groups), _ = send_mock.call_args_list[0]
+        self.assertTrue(added_delta['added'])
+        self.assertEqual(self.sensor.id, added_delta['id'])
+        self.assertSetEqual({self.company.id, None}, added_groups)
+        send_mock.assert_called_with(
+            {'device_type': CompanyDeviceProfile.SENSOR.value, 'id': self.sensor.id, 'removed': True},
+            (self.company.id, None))
+
+    def _create_container(self):
+        return Container.objects.create(
+            serial_number='foo_container', phone_number='-',
+            container_type=ContainerType.objects.create(title='foo_container_type'), company=self.company,
+            country=self.country, city=self.city, address='Foo Address', sector=self.sector,
+            waste_type=self.waste_type)
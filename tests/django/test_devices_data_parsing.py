@@ -0,0 +1,74 @@
+from datetime import datetime
+from django.test import TestCase
+from django.utils import timezone
+from unittest import mock
+
+from apps.core.models import Sectors
+from apps.sensors.models import (
+    Sensor, SensorSettingsProfile, ContainerType as SensorContainerType, Fullness as SensorFullness,
+    Temperature as SensorTemperature,
+)
+from apps.sensors.tasks import process_sensor_data_dict
+from apps.trashbins import trashbin_data_parsing
+from app.models import Country, City, Company, ContainerType, WasteType, Container, FullnessValues
+
+
+class DevicesDataParsingTests(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='foo_country')
+        city = City.objects.create(country=country, title='foo_city')
+        company = Company.objects.create(name='foo_company', country=country)
+        sector = Sectors.objects.get(company=company)
+        waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        self.sensor = Sensor.objects.create(
+            serial_number='foo_sensor', hardware_identity='foo_sensor', company=company, country=country, city=city,
+            sector=sector, waste_type=waste_type,
+            settings_profile=SensorSettingsProfile.objects.create(name='foo_profile'),
+            container_type=SensorContainerType.objects.create(volume=1, horizontal_mount_max_range=1))
+        self.container = Container.objects.create(
+            serial_number='foo_container', phone_number='-',
+            container_type=ContainerType.objects.create(title='foo_container_type'), company=company,
+            country=country, city=city, address='Foo Address', sector=sector, waste_type=waste_type)
+
+    def test_sensor_data_keeps_map_flags(self):
+        # ARRANGE
+        stale_sensor = Sensor.objects.get(pk=self.sensor.pk)
+        Sensor.objects.filter(pk=self.sensor.pk).update(on_active_route=True)
+        # ACT
+        process_sensor_data_dict({'binFill': '500', 'batV': '90', 'temp': '20'}, stale_sensor)
+        # ASSERT
+        sensor = Sensor.objects.get(pk=self.sensor.pk)
+        self.assertTrue(sensor.on_active_route)
+        self.assertEqual(90, sensor.battery)
+        self.assertEqual(20, sensor.temperature)
+        self.assertIsNotNone(sensor.latest_data_at)
+
+    def test_sensor_data_backdated(self):
+        # ARRANGE
+        ctime = timezone.make_aware(datetime(2020, 1, 1, 10), timezone.utc)
+        # ACT
+        process_sensor_data_dict({'binFill': '500', 'temp': '20'}, self.sensor, ctime=ctime)
+        # ASSERT
+        self.assertEqual(ctime, Sensor.objects.get(pk=self.sensor.pk).latest_data_at)
+        self.assertEqual(ctime, SensorFullness.objects.get(sensor=self.sensor, actual=True).ctime)
+        self.assertEqual(ctime, SensorTemperature.objects.get(sensor=self.sensor, actual=True).ctime)
+
+    def test_trashbin_data_keeps_map_flags(self):
+        # ARRANGE
+        generate_time_series_record = trashbin_data_parsing._generate_time_series_record
+
+        def generate_with_concurrent_route(model, container, **kwargs):
+            generate_time_series_record(model, container, **kwargs)
+            Container.objects.filter(pk=container.pk).update(on_active_route=True, satellites_count=2)
+
+        ctime = timezone.make_aware(datetime(2020, 1, 1, 10), timezone.utc)
+        # ACT
+        with mock.patch('apps.trashbins.trashbin_data_parsing._generate_time_series_record',
+                        side_effect=generate_with_concurrent_route):
+            trashbin_data_parsing._parse_satellite_bin_data([{'binFilling': 40, 'ctime': ctime}], self.container.pk)
+        # ASSERT
+        container = Container.objects.get(pk=self.container.pk)
+        self.assertTrue(container.on_active_route)
+        self.assertEqual(2, container.satellites_count)
+        self.assertEqual(40, container.fullness)
+        self.assertEqual(40, FullnessValues.objects.get(container=container, actual=1).fullness_value)
@@ -0,0 +1,55 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase
+from unittest import mock
+
+from apps.core.views import send_driver_command
+from app.consumers import MobileApiConsumer
+from app.models import Country, Company, Routes, Route
+
+
+class DriverCommandsTests(TestCase):
+    def setUp(self):
+        self.driver = User.objects.create(username='foo_driver')
+        company = Company.objects.create(name='foo_company', country=Country.objects.create(name='foo_country'))
+        self.route = Route.objects.create(
+            user=self.driver, route_json=[], parent_route=Routes.objects.create(company=company))
+
+    def test_route_commands_dropped_once_handled(self):
+        # ARRANGE
+        consumer = MobileApiConsumer({'user': self.driver})
+        # ACT
+        with mock.patch('app.consumers.RedisClient') as redis_client_mock:
+            consumer._cmd_start_route({'route_id': self.route.id})
+            consumer._cmd_route_complete({'route_id': self.route.id})
+        # ASSERT
+        self.assertListEqual([
+            mock.call(self.driver.id, [f'new_route-{self.route.id}']),
+            mock.call(self.driver.id, [f'new_route-{self.route.id}', f'abort_route-{self.route.id}']),
+        ], redis_client_mock.return_value.drop_driver_commands.call_args_list)
+
+    def test_disconnect_without_presence(self):
+        # ARRANGE
+        calls = []
+
+        async def record_call(*args):
+            calls.append(args)
+
+        consumer = MobileApiConsumer({'user': self.driver})
+        consumer.channel_name = 'foo_channel'
+        consumer.channel_layer = mock.Mock(group_discard=record_call)
+        consumer.driver_id = self.driver.id
+        # ACT
+        with mock.patch('app.consumers.logout', side_effect=record_call):
+            async_to_sync(consumer.disconnect)(1000)
+        # ASSERT
+        self.assertListEqual([(f'driver-{self.driver.id}', 'foo_channel'), (consumer.scope,)], calls)
+
+    def test_superseded_commands_replaced(self):
+        # ACT
+        with mock.patch('apps.core.views.RedisClient') as redis_client_mock, \
+                mock.patch('apps.core.views.get_channel_layer'), mock.patch('apps.core.views.async_to_sync'):
+            send_driver_command(self.driver.id, 'abort_route', self.route.id, superseded_actions=('new_route',))
+        # ASSERT
+        redis_client_mock.return_value.queue_driver_command.assert_called_once_with(
+            self.driver.id, f'abort_route-{self.route.id}', mock.ANY, [f'new_route-{self.route.id}'])
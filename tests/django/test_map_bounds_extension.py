@@ -0,0 +1,123 @@
+from datetime import datetime
+from django.test import TestCase
+from django.utils import timezone
+from redis.exceptions import RedisError
+from unittest import mock
+
+from apps.core.helpers import CompanyDeviceProfile
+from apps.core.models import Sectors
+from apps.core.tasks import schedule_map_bounds_extension, schedule_map_bounds_drop
+from apps.sensors.models import Sensor, SensorData, SensorSettingsProfile, ContainerType as SensorContainerType
+from apps.sensors.tasks import parse_sensor_jobs_data
+from apps.trashbins import trashbin_data_parsing
+from app.models import Country, City, Company, ContainerType, WasteType, Container
+
+
+class MapBoundsExtensionTests(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='foo_country')
+        city = City.objects.create(country=country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=country)
+        sector = Sectors.objects.get(company=self.company)
+        waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        self.sensor = Sensor.objects.create(
+            serial_number='foo_sensor', hardware_identity='foo_sensor', company=self.company, country=country,
+            city=city, sector=sector, waste_type=waste_type,
+            settings_profile=SensorSettingsProfile.objects.create(name='foo_profile'),
+            container_type=SensorContainerType.objects.create(volume=1))
+        self.container = Container.objects.create(
+            serial_number='foo_container', phone_number='-',
+            container_type=ContainerType.objects.create(title='foo_container_type'), company=self.company,
+            country=country, city=city, address='Foo Address', sector=sector, waste_type=waste_type)
+        redis_client_patcher = mock.patch('apps.core.tasks.RedisClient')
+        self.redis_client = redis_client_patcher.start().return_value
+        self.addCleanup(redis_client_patcher.stop)
+
+    def test_bounds_extended_once_committed(self):
+        # ARRANGE
+        callbacks = []
+        # ACT
+        with mock.patch('apps.core.tasks.transaction.on_commit', side_effect=callbacks.append):
+            schedule_map_bounds_extension(CompanyDeviceProfile.SENSOR.value, 37, 55, self.company.id)
+        self.redis_client.extend_map_bounds.assert_not_called()
+        for callback in callbacks:
+            callback()
+        # ASSERT
+        self.redis_client.extend_map_bounds.assert_called_once_with(
+            CompanyDeviceProfile.SENSOR.value, 37, 55, self.company.id)
+
+    def test_redis_errors_ignored(self):
+        # ARRANGE
+        self.redis_client.extend_map_bounds.side_effect = RedisError()
+        # ACT
+        with mock.patch('apps.core.tasks.transaction.on_commit', side_effect=lambda func: func()):
+            schedule_map_bounds_extension(CompanyDeviceProfile.SENSOR.value, 37, 55, self.company.id)
+        # ASSERT
+        self.redis_client.extend_map_bounds.assert_called_once()
+
+    def test_bounds_dropped_once_committed(self):
+        # ACT
+        with mock.patch('apps.core.tasks.transaction.on_commit', side_effect=lambda func: func()):
+            schedule_map_bounds_drop(CompanyDeviceProfile.SENSOR.value, self.company.id, None)
+        # ASSERT
+        self.redis_client.drop_map_bounds.assert_called_once_with(CompanyDeviceProfile.SENSOR.value, self.company.id, None)
+
+    def test_device_changes_update_bounds(self):
+        # ARRANGE
+        other_company = Company.objects.create(name='bar_company', country=self.company.country)
+        container = Container.objects.get(pk=self.container.pk)
+        trashbin = CompanyDeviceProfile.TRASHBIN.value
+        # ACT
+        with mock.patch('app.signals.schedule_map_bounds_extension') as extension_mock, \
+                mock.patch('app.signals.schedule_map_bounds_drop') as drop_mock, \
+                mock.patch('app.tasks.sync_container_time_series_company.delay'):
+            container.location = 'SRID=4326;POINT (37 55)'
+            container.save()
+            container.save(update_fields=['location'])
+            container.company = other_company
+            container.sector = Sectors.objects.get(company=other_company)
+            container.save()
+            container.delete()
+        # ASSERT
+        self.assertListEqual([
+            mock.call(trashbin, 37, 55, self.company.id),
+            mock.call(trashbin, 37, 55, other_company.id),
+        ], extension_mock.call_args_list)
+        self.assertListEqual([
+            mock.call(trashbin, self.company.id),
+            mock.call(trashbin, other_company.id, None),
+        ], drop_mock.call_args_list)
+
+    def test_sensor_location_update_schedules_extension(self):
+        # ARRANGE
+        sensor_data = SensorData.objects.create(
+            sensor=self.sensor, topic='foo', payload='foo', data_json={'gps': '$GPGGA,5500.0000,N,03700.0000,E'})
+        # ACT
+        with mock.patch('apps.sensors.tasks.schedule_map_bounds_extension') as schedule_mock, \
+                mock.patch('apps.sensors.tasks.reverse_geocode_sensor_location.delay'):
+            parse_sensor_jobs_data(sensor_data.id)
+        # ASSERT
+        schedule_mock.assert_called_once_with(CompanyDeviceProfile.SENSOR.value, 37, 55, self.company.id)
+        sensor = Sensor.objects.get(pk=self.sensor.pk)
+        self.assertAlmostEqual(37, sensor.location.x)
+        self.assertAlmostEqual(55, sensor.location.y)
+
+    def test_trashbin_location_update_schedules_extension(self):
+        # ARRANGE
+        ctime = timezone.make_aware(datetime(2020, 1, 1, 10), timezone.utc)
+        # ACT
+        with mock.patch('apps.trashbins.trashbin_data_parsing.schedule_map_bounds_extension') as schedule_mock:
+            trashbin_data_parsing._parse_master_bin_data(
+                [{'location': '55 37', 'ctime': ctime}], self.container.pk, False)
+        # ASSERT
+        schedule_mock.assert_called_once_with(CompanyDeviceProfile.TRASHBIN.value, 37, 55, self.company.id)
+
+    def test_redis_not_hit_before_commit(self):
+        # ARRANGE
+        sensor_data = SensorData.objects.create(
+            sensor=self.sensor, topic='foo', payload='foo', data_json={'gps': '$GPGGA,5500.0000,N,03700.0000,E'})
+        # ACT
+        with mock.patch('apps.sensors.tasks.reverse_geocode_sensor_location.delay'):
+            parse_sensor_jobs_data(sensor_data.id)
+        # ASSERT
+        self.redis_client.extend_map_bounds.assert_not_called()
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from notifications.models import Notification
+from unittest import mock
+
+from apps.core.models import UsersToCompany, NotificationDelivery
+from apps.core.tasks import _send_notifications_page, _send_ses_bulk_email, _send_onesignal_notification
+from app.models import Country, Company
+
+
+@mock.patch.dict('apps.core.utils.notification_subject_generators', {'foo_verb': lambda n: 'Foo subject'})
+@mock.patch.dict('apps.core.utils.notification_message_generators', {'foo_verb': lambda n: 'Foo message'})
+@mock.patch.dict('apps.core.utils.notification_link_generators', {'foo_verb': lambda n: '/foo/'})
+class NotificationsDeliveryTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='foo_company', country=Country.objects.create(name='foo_country'))
+        self.users = []
+        for username in ('foo_user', 'bar_user'):
+            user = User.objects.create(username=username, email=f'{username}@example.com')
+            UsersToCompany.objects.create(user=user, company=self.company, role=UsersToCompany.OPERATOR_ROLE)
+            self.users.append(user)
+        for user in self.users:
+            Notification.objects.create(recipient=user, actor=self.company, verb='foo_verb')
+
+    def test_failed_channel_sent_again(self):
+        # ARRANGE
+        failed_user, delivered_user = self.users
+        # ACT
+        with mock.patch('apps.core.tasks._send_onesignal_notification', return_value=([], [])), \
+                mock.patch('apps.core.tasks._send_ses_bulk_email', return_value=([failed_user.id], [])):
+            self._send_page()
+        with mock.patch('apps.core.tasks._send_onesignal_notification', return_value=([], [])) as push_mock, \
+                mock.patch('apps.core.tasks._send_ses_bulk_email', return_value=([], [])) as email_mock:
+            self._send_page(emailed=False)
+        # ASSERT
+        push_mock.assert_not_called()
+        self.assertListEqual([failed_user.id], [recipient_id for recipient_id, _ in email_mock.call_args[0][2]])
+        delivery = NotificationDelivery.objects.get(notification__recipient=failed_user)
+        self.assertTupleEqual((NotificationDelivery.STATUS_SENT, NotificationDelivery.STATUS_SENT, 1),
+                              (delivery.push_status, delivery.email_status, delivery.attempts))
+        self.assertFalse(Notification.objects.filter(emailed=False).exists())
+
+    def test_failed_batch_recipients_kept_unsent(self):
+        # ACT
+        with mock.patch('apps.core.tasks._send_onesignal_notification', side_effect=OSError()), \
+                mock.patch('apps.core.tasks._send_ses_bulk_email', return_value=([], [])):
+            self._send_page()
+        # ASSERT
+        self.assertFalse(Notification.objects.filter(emailed=True).exists())
+        self.assertFalse(NotificationDelivery.objects.exclude(push_status=NotificationDelivery.STATUS_PENDING).exists())
+
+    def test_rejected_deliveries_not_retried(self):
+        # ACT
+        with mock.patch('apps.core.tasks._send_onesignal_notification',
+                        return_value=([], [user.id for user in self.users])), \
+                mock.patch('apps.core.tasks._send_ses_bulk_email', return_value=([], [])):
+            self._send_page()
+        # ASSERT
+        self.assertFalse(Notification.objects.filter(emailed=False).exists())
+        self.assertFalse(NotificationDelivery.objects.exclude(push_status=NotificationDelivery.STATUS_FAILED).exists())
+
+    @override_settings(NOTIFICATIONS_DELIVERY_MAX_ATTEMPTS=2)
+    def test_delivery_given_up_after_max_attempts(self):
+        # ACT
+        with mock.patch('apps.core.tasks._send_onesignal_notification', side_effect=OSError()) as push_mock, \
+                mock.patch('apps.core.tasks._send_ses_bulk_email', return_value=([], [])) as email_mock:
+            self._send_page()
+            self._send_page(emailed=False)
+        # ASSERT
+        self.assertEqual(2, push_mock.call_count)
+        self.assertEqual(1, email_mock.call_count)
+        self.assertFalse(Notification.objects.filter(emailed=False).exists())
+        self.assertFalse(NotificationDelivery.objects.exclude(
+            push_status=NotificationDelivery.STATUS_FAILED, email_status=NotificationDelivery.STATUS_SENT,
+            attempts=2).exists())
+
+    def test_delivered_recipients_marked(self):
+        # ACT
+        with mock.patch('apps.core.tasks._send_onesignal_notification', return_value=([], [])) as push_mock, \
+                mock.patch('apps.core.tasks._send_ses_bulk_email', return_value=([], [])):
+            self._send_page()
+        # ASSERT
+        push_mock.assert_called_once_with(
+            mock.ANY, ('Foo subject', 'Foo message', '/foo/'), [user.id for user in self.users])
+        self.assertFalse(Notification.objects.filter(emailed=False).exists())
+
+    def test_failed_email_statuses_mapped_to_recipients(self):
+        # ARRANGE
+        ses_client = mock.Mock(**{'send_bulk_templated_email.return_value': {
+            'Status': [{'Status': 'Success'}, {'Status': 'MessageRejected'}, {'Status': 'TransientFailure'}],
+        }})
+        # ACT
+        failed_recipient_ids = _send_ses_bulk_email(ses_client, 'foo_template', [(1, {}), (2, {}), (3, {})])
+        # ASSERT
+        self.assertTupleEqual(([3], [2]), failed_recipient_ids)
+
+    def test_push_client_errors_not_retried(self):
+        for status_code, expected_result in ((400, ([], [1])), (429, ([1], [])), (503, ([1], []))):
+            with self.subTest(status_code=status_code):
+                # ARRANGE
+                http_session = mock.Mock(**{'post.return_value': mock.Mock(status_code=status_code, text='')})
+                # ACT
+                result = _send_onesignal_notification(http_session, ('Foo subject', 'Foo message', '/foo/'), [1])
+                # ASSERT
+                self.assertTupleEqual(expected_result, result)
+
+    def _send_page(self, **filters):
+        notifications = list(Notification.objects.filter(**filters).select_related('recipient__user_to_company__company')
+                             .prefetch_related('actor').order_by('id'))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            _send_notifications_page(notifications, mock.Mock(), mock.Mock(), executor)
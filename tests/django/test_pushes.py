@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from push_notifications.models import GCMDevice
+from unittest import mock
+
+from app.models import MobileAppUserLanguage
+from app.tasks import send_pushes
+
+
+class PushesTests(TestCase):
+    def test_push_sent_per_localized_message(self):
+        # ARRANGE
+        devices_by_lang = {}
+        for username, lang in (('foo_user', 'ru'), ('bar_user', 'ru'), ('baz_user', None)):
+            user = User.objects.create(username=username)
+            if lang is not None:
+                MobileAppUserLanguage.objects.create(user=user, lang=lang)
+            device = GCMDevice.objects.create(user=user, registration_id=username, cloud_message_type='FCM')
+            devices_by_lang.setdefault(lang, []).append(device.id)
+        # ACT
+        with mock.patch('app.tasks._get_mobile_app_translations', return_value={'ru': 'Foo message'}), \
+                mock.patch('app.tasks.send_push_message.delay') as delay_mock:
+            send_pushes('new_route_push_message', list(User.objects.values_list('id', flat=True)))
+        # ASSERT
+        self.assertCountEqual([
+            mock.call('Foo message', devices_by_lang['ru']),
+            mock.call('New route received', devices_by_lang[None]),
+        ], delay_mock.call_args_list)
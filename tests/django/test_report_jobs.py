@@ -0,0 +1,133 @@
+import pytz
+
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.utils import timezone
+from unittest import mock
+
+from apps.core.models import Country, Company, UsersToCompany, ReportJob, ReportJobChunk
+from apps.core.reports import filter_queryset_by_date_range
+from apps.core.tasks import execute_report_job_chunk, split_report_job_params, start_report_job
+
+
+class _TimezoneRecordingView:
+    def __init__(self, recorded):
+        self.recorded = recorded
+        self.model = ReportJob
+
+    def filter_queryset(self, qs):
+        self.recorded.append(timezone.get_current_timezone_name())
+        return [{'day': datetime(2020, 1, 1, tzinfo=pytz.utc), 'value': 1}]
+
+
+class _FailingView(_TimezoneRecordingView):
+    def filter_queryset(self, qs):
+        raise ValueError('foo_error')
+
+
+class ReportJobTasksTests(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='foo_country')
+        company = Company.objects.create(name='foo_company', country=country, timezone='UTC')
+        self.user = User.objects.create(username='foo_user')
+        UsersToCompany.objects.create(
+            user=self.user, company=company, role=UsersToCompany.OPERATOR_ROLE, timezone='Asia/Yekaterinburg')
+
+    def test_chunk_executed_in_job_timezone(self):
+        # ARRANGE
+        job = self._create_job(timezone='Asia/Yekaterinburg', chunks_count=2)
+        recorded_timezones = []
+        # ACT
+        with mock.patch('apps.core.tasks._build_report_job_chart_view',
+                        return_value=_TimezoneRecordingView(recorded_timezones)):
+            execute_report_job_chunk(job.chunks.first().id)
+        # ASSERT
+        self.assertListEqual(['Asia/Yekaterinburg'], recorded_timezones)
+        self.assertEqual('UTC', timezone.get_current_timezone_name())
+        job.refresh_from_db()
+        self.assertEqual(1, job.chunks_done)
+        self.assertEqual([{'day': '2020-01-01T00:00:00+00:00', 'value': 1}], job.chunks.first().result)
+
+    def test_chunks_skipped_after_sibling_failed(self):
+        # ARRANGE
+        job = self._create_job(timezone='Asia/Yekaterinburg', chunks_count=2)
+        first_chunk_id, second_chunk_id = job.chunks.values_list('id', flat=True)
+        recorded_timezones = []
+        # ACT
+        with mock.patch('apps.core.tasks._build_report_job_chart_view', return_value=_FailingView([])):
+            with self.assertRaises(ValueError):
+                execute_report_job_chunk(first_chunk_id)
+        with mock.patch('apps.core.tasks._build_report_job_chart_view',
+                        return_value=_TimezoneRecordingView(recorded_timezones)):
+            with self.assertRaises(Warning):
+                execute_report_job_chunk(second_chunk_id)
+        # ASSERT
+        job.refresh_from_db()
+        self.assertEqual(ReportJob.STATUS_FAILED, job.status)
+        self.assertEqual('foo_error', job.error_message)
+        self.assertEqual(0, job.chunks_done)
+        self.assertListEqual([], recorded_timezones)
+
+    def test_empty_period_job_failed(self):
+        # ARRANGE
+        job = ReportJob.objects.create(
+            user=self.user, report_name='foo_report', timezone='UTC', params={
+                'date_range': 'date_period',
+                'datetime_from': '2021-02-01 00:00:00',
+                'datetime_to': '2021-01-01 00:00:00',
+            })
+        # ACT
+        with mock.patch('apps.core.tasks.execute_report_job_chunk.delay') as delay_mock:
+            start_report_job(job.id)
+        # ASSERT
+        job.refresh_from_db()
+        self.assertEqual(ReportJob.STATUS_FAILED, job.status)
+        self.assertFalse(job.chunks.exists())
+        delay_mock.assert_not_called()
+
+    def test_chunks_cover_whole_period(self):
+        # ARRANGE
+        params = {
+            'date_range': 'date_period',
+            'datetime_from': '2021-01-15 00:00:00',
+            'datetime_to': '2021-02-10 00:00:00',
+        }
+        # Time-series-like record made within the last second of the month
+        ReportJob.objects.create(
+            user=self.user, report_name='foo_report', params={}, timezone='UTC',
+            ctime=timezone.make_aware(datetime(2021, 1, 31, 23, 59, 59, 500000)))
+        # ACT
+        chunks_params = split_report_job_params(params)
+        # ASSERT
+        self.assertEqual('2021-01-31 23:59:59.999999', chunks_params[0]['datetime_to'])
+        self.assertListEqual([1, 0], [
+            filter_queryset_by_date_range(ReportJob.objects.all(), chunk_params, {'filter_by_actual': False}).count()
+            for chunk_params in chunks_params
+        ])
+
+    def test_inverted_period_rejected(self):
+        # ARRANGE
+        client = Client()
+        client.force_login(self.user)
+        # ACT
+        with mock.patch('apps.core.views.check_report_access', return_value=True), \
+                mock.patch.dict('apps.core.utils.report_job_chart_views', {'foo_report': object}), \
+                mock.patch('apps.core.views.start_report_job.delay') as delay_mock:
+            response = client.post('/report-jobs/create/', {
+                'report': 'foo_report',
+                'date_range': 'date_period',
+                'datetime_from': '2021-02-01 00:00:00',
+                'datetime_to': '2021-01-01 00:00:00',
+            })
+        # ASSERT
+        self.assertEqual(400, response.status_code)
+        self.assertFalse(ReportJob.objects.exists())
+        delay_mock.assert_not_called()
+
+    def _create_job(self, timezone, chunks_count):
+        job = ReportJob.objects.create(
+            user=self.user, report_name='foo_report', params={}, timezone=timezone,
+            status=ReportJob.STATUS_IN_PROGRESS, chunks_total=chunks_count)
+        ReportJobChunk.objects.bulk_create([ReportJobChunk(job=job, index=index) for index in range(chunks_count)])
+        return job
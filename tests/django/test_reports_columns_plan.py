@@ -0,0 +1,105 @@
+from django.test import TestCase, RequestFactory
+from unittest import mock
+
+from apps.core.models import Sectors
+from apps.sensors.models import (
+    Sensor, SensorSettingsProfile, ContainerType as SensorContainerType, ErrorType as SensorErrorType,
+    Fullness as SensorFullness, BatteryLevel as SensorBatteryLevel, Temperature as SensorTemperature,
+    Error as SensorError,
+)
+from apps.sensors.reports import (
+    battery_level as sensors_battery_level, errors as sensors_errors, fullness as sensors_fullness,
+    temperature as sensors_temperature,
+)
+from apps.trashbins.reports import (
+    battery_level as trashbins_battery_level, errors as trashbins_errors, fullness as trashbins_fullness,
+    temperature as trashbins_temperature,
+)
+from app.models import (
+    Country, City, Company, ContainerType, WasteType, Container, ErrorType, FullnessValues, Battery_Level,
+    Temperature, Error,
+)
+
+
+class ReportColumnsPlanTests(TestCase):
+    rows_count = 3
+
+    def setUp(self):
+        country = Country.objects.create(name='foo_country')
+        city = City.objects.create(country=country, title='foo_city')
+        company = Company.objects.create(name='foo_company', country=country)
+        sector = Sectors.objects.get(company=company)
+        waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        self.container = Container.objects.create(
+            serial_number='foo_container', phone_number='-', container_type=ContainerType.objects.create(title='foo'),
+            company=company, country=country, city=city, address='Foo Address', sector=sector,
+            waste_type=waste_type)
+        self.sensor = Sensor.objects.create(
+            serial_number='foo_sensor', hardware_identity='foo_sensor', company=company, country=country, city=city,
+            address='Foo Address', sector=sector, waste_type=waste_type,
+            settings_profile=SensorSettingsProfile.objects.create(name='foo_profile'),
+            container_type=SensorContainerType.objects.create(volume=1))
+        self.error_type = ErrorType.objects.create(code='1', title='foo_error')
+        self.sensor_error_type = SensorErrorType.objects.create(code=1, title='foo_error')
+
+    def test_trashbin_report_tables(self):
+        # ARRANGE
+        views_rows = (
+            (trashbins_battery_level.BatteryLevelReportList, lambda: Battery_Level(container=self.container)),
+            (trashbins_errors.ErrorsReportList, lambda: Error(container=self.container, error_type=self.error_type)),
+            (trashbins_fullness.FullnessReportList, lambda: FullnessValues(container=self.container)),
+            (trashbins_temperature.TemperatureReportList, lambda: Temperature(container=self.container)),
+        )
+        # ACT & ASSERT
+        for view_class, create_row in views_rows:
+            with self.subTest(view_class.__module__):
+                self._assert_single_query_rendering(view_class, create_row)
+
+    def test_sensor_report_tables(self):
+        # ARRANGE
+        views_rows = (
+            (sensors_battery_level.BatteryLevelReportList, lambda: SensorBatteryLevel(sensor=self.sensor)),
+            (sensors_errors.ErrorsReportList,
+             lambda: SensorError(sensor=self.sensor, error_type=self.sensor_error_type)),
+            (sensors_fullness.FullnessReportList, lambda: SensorFullness(
+                sensor=self.sensor, parsing_metadata_json={
+                    'any_measurement_moisture': True, 'latest_moisture_free_fullness': 10})),
+            (sensors_temperature.TemperatureReportList, lambda: SensorTemperature(sensor=self.sensor)),
+        )
+        # ACT & ASSERT
+        for view_class, create_row in views_rows:
+            with self.subTest(view_class.__module__):
+                self._assert_single_query_rendering(view_class, create_row)
+
+    def test_overridden_render_column_without_declared_fields_not_pushed_down(self):
+        # ARRANGE
+        class OverridingReportList(trashbins_fullness.FullnessReportList):
+            def render_column(self, row, column):
+                return row.container.phone_number if column == 'container.address' else \
+                    super().render_column(row, column)
+
+        view = self._create_view(OverridingReportList)
+        qs = FullnessValues.objects.select_related('container')
+        # ACT
+        with mock.patch('django_datatables_view.base_datatable_view.BaseDatatableView.paging',
+                        side_effect=lambda paged_qs: paged_qs):
+            paged_qs = view.paging(qs)
+        # ASSERT
+        self.assertEqual(set(), paged_qs.query.deferred_loading[0])
+
+    def _assert_single_query_rendering(self, view_class, create_row):
+        view_class.model.objects.bulk_create([create_row() for _ in range(self.rows_count)])
+        view = self._create_view(view_class)
+        _, related_paths, only_fields = view.get_columns_plan()
+        self.assertIsNotNone(only_fields)
+        qs = view.model.objects.select_related(*related_paths).only(*only_fields)
+        with self.assertNumQueries(1):
+            rows = view.prepare_results(qs)
+        self.assertEqual(self.rows_count, len(rows))
+
+    @staticmethod
+    def _create_view(view_class):
+        view = view_class()
+        view.request = RequestFactory().get('/', {'exclude_moisture': 'true'})
+        view.request.uac = mock.Mock(**{'check_feature_enabled.return_value': False})
+        return view
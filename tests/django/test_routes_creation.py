@@ -0,0 +1,112 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from functools import partial
+from unittest import mock
+
+from apps.core.models import Sectors, UsersToCompany
+from app.models import (
+    Country, City, Company, ContainerType, WasteType, Container, Routes, Route, RoutePoints, RoutesDrivers,
+    ROUTE_STATUS_ABORTED_BY_OPERATOR,
+)
+
+
+class RoutesCreationTests(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='foo_country')
+        city = City.objects.create(country=country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=country)
+        self.containers = [
+            Container.objects.create(
+                serial_number=serial_number, phone_number='-',
+                container_type=ContainerType.objects.create(title=f'{serial_number}_type'), company=self.company,
+                country=country, city=city, address='Foo Address', sector=Sectors.objects.get(company=self.company),
+                waste_type=WasteType.objects.create(title=f'{serial_number}_waste_type', density=0.1))
+            for serial_number in ('foo_container', 'bar_container', 'baz_container')
+        ]
+        self.drivers = []
+        for username in ('foo_driver', 'bar_driver'):
+            driver = User.objects.create(username=username)
+            UsersToCompany.objects.create(user=driver, company=self.company, role=UsersToCompany.DRIVER_ROLE)
+            self.drivers.append(driver)
+        superuser = User.objects.create(username='foo_user', is_staff=True, is_superuser=True)
+        superuser.set_password('bar')
+        superuser.save()
+        self.client = Client()
+        self.assertTrue(self.client.login(username='foo_user', password='bar'))
+
+    def test_aborted_routes_commands_queued(self):
+        # ARRANGE
+        driver = self.drivers[0]
+        aborted_route = Route.objects.create(
+            user=driver, route_json=[], parent_route=Routes.objects.create(company=self.company))
+        commands_mock = mock.Mock()
+        # ACT
+        with mock.patch('apps.core.views.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('apps.core.views.refresh_devices_map_flags'), \
+                mock.patch('app.models.refresh_devices_map_flags'), \
+                mock.patch('apps.core.views.send_driver_command', commands_mock.send_driver_command), \
+                mock.patch('apps.core.views.send_route', commands_mock.send_route):
+            self._post_routes({driver.id: [self.containers[0]]})
+        # ASSERT
+        self.assertListEqual([
+            mock.call.send_driver_command(
+                driver.id, 'abort_route', aborted_route.id, superseded_actions=('new_route',)),
+            mock.call.send_route(Route.objects.exclude(pk=aborted_route.pk).get()),
+        ], commands_mock.mock_calls)
+
+    def test_drivers_routes_replaced(self):
+        # ARRANGE
+        earlier_base_route = Routes.objects.create(company=self.company)
+        earlier_routes = []
+        for driver in self.drivers:
+            earlier_route = Route.objects.create(user=driver, route_json=[], parent_route=earlier_base_route)
+            RoutesDrivers.objects.create(base_route=earlier_base_route, route=earlier_route, driver=driver)
+            RoutePoints.objects.create(
+                user=driver, container=self.containers[2], parent_route=earlier_base_route, route=earlier_route)
+            earlier_routes.append(earlier_route)
+        foo_driver, bar_driver = self.drivers
+        # ACT
+        with mock.patch('apps.core.views.transaction.on_commit') as on_commit_mock, \
+                mock.patch('apps.core.views.send_route') as send_route_mock:
+            response = self._post_routes({
+                foo_driver.id: [self.containers[0]],
+                bar_driver.id: [self.containers[1]],
+            })
+        # ASSERT
+        self.assertEqual(200, response.status_code)
+        for earlier_route in earlier_routes:
+            earlier_route.refresh_from_db()
+            self.assertEqual(ROUTE_STATUS_ABORTED_BY_OPERATOR, earlier_route.status)
+        self.assertFalse(RoutesDrivers.objects.filter(finish_time__isnull=True).exists())
+        self.assertFalse(RoutePoints.objects.filter(route__in=earlier_routes, mtime__isnull=True).exists())
+        earlier_base_route.refresh_from_db()
+        self.assertIsNotNone(earlier_base_route.finish_time)
+        routes = list(Route.objects.exclude(pk__in=[r.pk for r in earlier_routes]))
+        self.assertCountEqual([
+            (foo_driver.id, self.containers[0].id),
+            (bar_driver.id, self.containers[1].id),
+        ], RoutePoints.objects.filter(route__in=routes, mtime__isnull=True).values_list('user_id', 'container_id'))
+        self.assertListEqual(
+            [True, True, False],
+            [Container.objects.get(pk=container.pk).on_active_route for container in self.containers])
+        # Routes are sent to the drivers only once committed
+        send_route_mock.assert_not_called()
+        self.assertCountEqual([(route,) for route in routes], [
+            callback.args for (callback,), _ in on_commit_mock.call_args_list
+            if isinstance(callback, partial) and callback.func is send_route_mock
+        ])
+
+    def _post_routes(self, containers_by_driver):
+        return self.client.post('/routes/create/', json.dumps({'data': [
+            {'id': driver_id, 'points': [{
+                'id': container.id,
+                'city': {'title': 'foo_city'},
+                'fullness': {'value': 80},
+                'address': container.address,
+                'serial_number': container.serial_number,
+                'location': {'x': container.location.x, 'y': container.location.y},
+            } for container in containers]}
+            for driver_id, containers in containers_by_driver.items()
+        ]}), content_type='application/json')
@@ -0,0 +1,39 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from unittest import mock
+
+from apps.core.models import Sectors
+from apps.sensors.admin import enable_sensors_action, disable_sensors_action
+from apps.sensors.models import Sensor, SensorSettingsProfile, ContainerType as SensorContainerType
+from app.models import Country, City, Company, WasteType
+
+
+class SensorsAdminActionsTests(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='foo_country')
+        city = City.objects.create(country=country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=country)
+        self.sensor = Sensor.objects.create(
+            serial_number='foo_sensor', hardware_identity='foo_sensor', company=self.company, country=country,
+            city=city, sector=Sectors.objects.get(company=self.company),
+            waste_type=WasteType.objects.create(title='foo_waste_type', density=0.1),
+            settings_profile=SensorSettingsProfile.objects.create(name='foo_profile'),
+            container_type=SensorContainerType.objects.create(volume=1))
+
+    def test_map_changes_tracked(self):
+        for action, disabled in ((disable_sensors_action, True), (enable_sensors_action, False)):
+            with self.subTest(action.__name__):
+                # ARRANGE
+                stale_mtime = timezone.now() - timedelta(hours=1)
+                Sensor.objects.update(mtime=stale_mtime)
+                # ACT
+                with mock.patch('apps.sensors.admin.transaction.on_commit', side_effect=lambda func: func()), \
+                        mock.patch('apps.sensors.admin.RedisClient') as redis_client_mock, \
+                        mock.patch('apps.sensors.admin.messages'):
+                    action(None, None, Sensor.objects.all())
+                # ASSERT
+                sensor = Sensor.objects.get(pk=self.sensor.pk)
+                self.assertEqual(disabled, sensor.disabled)
+                self.assertGreater(sensor.mtime, stale_mtime)
+                redis_client_mock.return_value.bump_map_data_version.assert_called_once_with(self.company.id)
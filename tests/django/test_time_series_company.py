@@ -0,0 +1,109 @@
+from django.test import TestCase
+from unittest import mock
+
+from apps.core.models import Sectors
+from apps.sensors.models import (
+    Sensor, SensorSettingsProfile, ContainerType as SensorContainerType, Fullness as SensorFullness,
+)
+from apps.sensors.tasks import sync_sensor_time_series_company
+from app.models import Country, City, Company, ContainerType, WasteType, Container, FullnessValues
+from app.tasks import sync_container_time_series_company
+
+
+class TimeSeriesCompanyTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.other_company = Company.objects.create(name='bar_company', country=self.country)
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        self.container = Container.objects.create(
+            serial_number='foo_container', phone_number='-',
+            container_type=ContainerType.objects.create(title='foo_container_type'), company=self.company,
+            country=self.country, city=self.city, address='Foo Address',
+            sector=Sectors.objects.get(company=self.company), waste_type=self.waste_type)
+        self.sensor = Sensor.objects.create(
+            serial_number='foo_sensor', hardware_identity='foo_sensor', company=self.company, country=self.country,
+            city=self.city, address='Foo Address', sector=Sectors.objects.get(company=self.company),
+            waste_type=self.waste_type, settings_profile=SensorSettingsProfile.objects.create(name='foo_profile'),
+            container_type=SensorContainerType.objects.create(volume=1))
+
+    def test_company_populated_on_insert(self):
+        # ACT
+        fullness = FullnessValues.objects.create(container=self.container, fullness_value=10)
+        sensor_fullness = SensorFullness.objects.create(sensor=self.sensor, value=10)
+        # ASSERT
+        self.assertEqual(self.company.id, FullnessValues.objects.get(pk=fullness.pk).company_id)
+        self.assertEqual(self.company.id, SensorFullness.objects.get(pk=sensor_fullness.pk).company_id)
+
+    def test_company_kept_on_update(self):
+        # ARRANGE
+        fullness = FullnessValues.objects.create(container=self.container, fullness_value=10)
+        Container.objects.filter(pk=self.container.pk).update(company=self.other_company)
+        fullness = FullnessValues.objects.get(pk=fullness.pk)
+        # ACT
+        fullness.fullness_value = 20
+        fullness.save()
+        # ASSERT
+        self.assertEqual(self.company.id, FullnessValues.objects.get(pk=fullness.pk).company_id)
+
+    def test_container_move_schedules_sync(self):
+        # ARRANGE
+        container = Container.objects.get(pk=self.container.pk)
+        # ACT
+        with mock.patch('app.signals.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('app.signals.RedisClient'), \
+                mock.patch('app.signals.schedule_device_addition_delta'), \
+                mock.patch('app.signals.schedule_device_removal_delta'), \
+                mock.patch('app.signals.schedule_map_bounds_drop'), \
+                mock.patch('app.signals.schedule_map_bounds_extension'), \
+                mock.patch('app.tasks.sync_container_time_series_company.delay') as delay_mock:
+            container.save()
+            container.company = self.other_company
+            container.sector = Sectors.objects.get(company=self.other_company)
+            container.save()
+        # ASSERT
+        delay_mock.assert_called_once_with(self.container.pk)
+
+    def test_sensor_move_schedules_sync(self):
+        # ARRANGE
+        sensor = Sensor.objects.get(pk=self.sensor.pk)
+        # ACT
+        with mock.patch('apps.sensors.signals.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('apps.sensors.signals.RedisClient'), \
+                mock.patch('apps.sensors.signals.schedule_device_addition_delta'), \
+                mock.patch('apps.sensors.signals.schedule_device_removal_delta'), \
+                mock.patch('apps.sensors.signals.schedule_map_bounds_drop'), \
+                mock.patch('apps.sensors.signals.schedule_map_bounds_extension'), \
+                mock.patch('apps.sensors.tasks.sync_sensor_time_series_company.delay') as delay_mock:
+            sensor.save()
+            sensor.company = self.other_company
+            sensor.sector = Sectors.objects.get(company=self.other_company)
+            sensor.save()
+        # ASSERT
+        delay_mock.assert_called_once_with(self.sensor.pk)
+
+    def test_container_rows_backfilled(self):
+        # ARRANGE
+        FullnessValues.objects.create(container=self.container, fullness_value=10)
+        # Bulk inserts skip the pre_save receivers, like rows predating the column
+        FullnessValues.objects.bulk_create([FullnessValues(container=self.container, fullness_value=20)])
+        Container.objects.filter(pk=self.container.pk).update(company=self.other_company)
+        # ACT
+        sync_container_time_series_company(self.container.pk)
+        # ASSERT
+        self.assertListEqual(
+            [self.other_company.id] * 2,
+            list(FullnessValues.objects.filter(container=self.container).values_list('company_id', flat=True)))
+
+    def test_sensor_rows_backfilled(self):
+        # ARRANGE
+        SensorFullness.objects.create(sensor=self.sensor, value=10)
+        SensorFullness.objects.bulk_create([SensorFullness(sensor=self.sensor, value=20)])
+        Sensor.objects.filter(pk=self.sensor.pk).update(company=self.other_company)
+        # ACT
+        sync_sensor_time_series_company(self.sensor.pk)
+        # ASSERT
+        self.assertListEqual(
+            [self.other_company.id] * 2,
+            list(SensorFullness.objects.filter(sensor=self.sensor).values_list('company_id', flat=True)))
@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from unittest import mock
+
+from apps.core.models import Sectors, UsersToCompany
+from apps.core.tasks import NotificationLevels
+from apps.trashbins.shared import TrashbinsNotificationTypes
+from apps.trashbins.tasks import generate_trashbin_status_notifications
+from app.models import Country, City, Company, ContainerType, WasteType, Container
+
+
+class TrashbinStatusNotificationsTests(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='foo_country')
+        self.city = City.objects.create(country=self.country, title='foo_city')
+        self.company = Company.objects.create(name='foo_company', country=self.country)
+        self.container_type = ContainerType.objects.create(title='foo_container_type')
+        self.waste_type = WasteType.objects.create(title='foo_waste_type', density=0.1)
+        UsersToCompany.objects.create(
+            user=User.objects.create(username='foo_user'), company=self.company, role=UsersToCompany.OPERATOR_ROLE)
+
+    def test_fullness_notified_per_station_bin(self):
+        # ARRANGE
+        master_bin = self._create_container('foo_master', 80)
+        full_satellite = self._create_container('foo_satellite', 100, master_bin=master_bin)
+        self._create_container('bar_satellite', 50, master_bin=master_bin)
+        # ACT
+        with mock.patch('apps.trashbins.tasks.release_coalesced_device_task'), \
+                mock.patch('apps.core.tasks.RedisClient') as redis_client_mock, \
+                mock.patch('apps.trashbins.tasks.create_notifications_bulk') as create_mock:
+            redis_client_mock.return_value.get_device_notification_states.return_value = {}
+            generate_trashbin_status_notifications(master_bin.id)
+        # ASSERT
+        redis_client_mock.return_value.set_device_notification_states.assert_called_once_with(
+            mock.ANY, master_bin.id, {
+                f'fullness:{master_bin.id}': mock.ANY,
+                f'fullness:{full_satellite.id}': mock.ANY,
+            })
+        self.assertCountEqual([
+            mock.call(master_bin, mock.ANY, TrashbinsNotificationTypes.TRASHBIN_FULLNESS_ABOVE_THRESHOLD.value,
+                      NotificationLevels.INFO.value, fullness_level=80),
+            mock.call(full_satellite, mock.ANY, TrashbinsNotificationTypes.TRASHBIN_FULLNESS_ABOVE_THRESHOLD.value,
+                      NotificationLevels.ERROR.value, fullness_level=100),
+        ], create_mock.call_args_list)
+
+    def _create_container(self, serial_number, fullness, master_bin=None):
+        return Container.objects.create(
+            serial_number=serial_number, phone_number='-', container_type=self.container_type, company=self.company,
+            country=self.country, city=self.city, address='Foo Address',
+            sector=Sectors.objects.get(company=self.company), waste_type=self.waste_type, fullness=fullness,
+            battery=100, is_master=master_bin is None, master_bin=master_bin)
@@ -0,0 +1,117 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from notifications.models import Notification
+from redis.exceptions import RedisError
+from unittest import mock
+
+from apps.core.models import OutboxEvent
+from apps.core.tasks import get_unread_notifications_count, create_notifications_bulk, dispatch_outbox_events
+from app.models import Country, Company
+
+
+class UnreadNotificationsTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='foo_company', country=Country.objects.create(name='foo_country'))
+        self.user = User.objects.create(username='foo_user', is_staff=True, is_superuser=True)
+        self.user.set_password('bar')
+        self.user.save()
+        self.other_user = User.objects.create(username='bar_user')
+        redis_client_patcher = mock.patch('apps.core.tasks.RedisClient')
+        self.redis_client = redis_client_patcher.start().return_value
+        self.addCleanup(redis_client_patcher.stop)
+
+    def test_count_filled_from_db(self):
+        # ARRANGE
+        unread_ids = [self._create_notification(self.user).id for _ in range(2)]
+        self._create_notification(self.user, unread=False)
+        self._create_notification(self.other_user)
+        self.redis_client.get_unread_notifications_count.side_effect = [None, 2]
+        # ACT
+        count = get_unread_notifications_count(self.user.id)
+        # ASSERT
+        self.assertEqual(2, count)
+        self.assertListEqual([
+            mock.call.get_unread_notifications_count(self.user.id),
+            mock.call.start_unread_notifications_filling(self.user.id),
+            mock.call.finish_unread_notifications_filling(self.user.id, mock.ANY),
+            mock.call.get_unread_notifications_count(self.user.id),
+        ], self.redis_client.mock_calls)
+        self.assertCountEqual(unread_ids, self.redis_client.finish_unread_notifications_filling.call_args[0][1])
+
+    def test_filled_count_read(self):
+        # ARRANGE
+        self.redis_client.get_unread_notifications_count.return_value = 3
+        # ACT
+        count = get_unread_notifications_count(self.user.id)
+        # ASSERT
+        self.assertEqual(3, count)
+        self.redis_client.start_unread_notifications_filling.assert_not_called()
+
+    def test_count_read_from_db_on_redis_errors(self):
+        # ARRANGE
+        self._create_notification(self.user)
+        self.redis_client.get_unread_notifications_count.side_effect = RedisError()
+        # ACT
+        count = get_unread_notifications_count(self.user.id)
+        # ASSERT
+        self.assertEqual(1, count)
+
+    def test_new_notifications_recorded_by_ids(self):
+        # ARRANGE
+        notification_ids = create_notifications_bulk(self.company, [self.user, self.other_user], 'foo_verb', 'info')
+        # ACT
+        with mock.patch('apps.core.tasks.async_to_sync'):
+            dispatch_outbox_events()
+        # ASSERT
+        self.redis_client.add_unread_notifications.assert_called_once_with(
+            {self.user.id: [notification_ids[0]], self.other_user.id: [notification_ids[1]]})
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_batch_dispatched_again(self):
+        # ARRANGE
+        notification_ids = create_notifications_bulk(self.company, [self.user], 'foo_verb', 'info')
+        # ACT
+        with mock.patch('apps.core.tasks.async_to_sync', side_effect=OSError()), self.assertRaises(OSError):
+            dispatch_outbox_events()
+        with mock.patch('apps.core.tasks.async_to_sync'):
+            dispatch_outbox_events()
+        # ASSERT
+        self.assertListEqual(
+            [mock.call({self.user.id: notification_ids})] * 2, self.redis_client.add_unread_notifications.call_args_list)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_read_notifications_removed(self):
+        # ARRANGE
+        notification_ids = [self._create_notification(self.user).id for _ in range(3)]
+        client = Client()
+        self.assertTrue(client.login(username='foo_user', password='bar'))
+        # ACT
+        with mock.patch('apps.core.views.RedisClient') as views_redis_client_mock:
+            client.get(f'/notifications/{notification_ids[0]}/follow/')
+            client.get('/notifications/mark-all-read/')
+        # ASSERT
+        self.assertListEqual([
+            mock.call().remove_unread_notifications(self.user.id, [notification_ids[0]]),
+            mock.call().remove_unread_notifications(self.user.id, mock.ANY),
+        ], [c for c in views_redis_client_mock.mock_calls if c != mock.call()])
+        self.assertCountEqual(
+            notification_ids[1:], views_redis_client_mock.return_value.remove_unread_notifications.call_args[0][1])
+        self.assertFalse(Notification.objects.filter(recipient=self.user, unread=True).exists())
+
+    def test_read_notifications_kept_on_redis_errors(self):
+        # ARRANGE
+        notification = self._create_notification(self.user)
+        client = Client()
+        self.assertTrue(client.login(username='foo_user', password='bar'))
+        # ACT
+        with mock.patch('apps.core.views.RedisClient') as views_redis_client_mock:
+            views_redis_client_mock.return_value.remove_unread_notifications.side_effect = RedisError()
+            follow_response = client.get(f'/notifications/{notification.id}/follow/')
+            mark_all_response = client.get('/notifications/mark-all-read/')
+        # ASSERT
+        self.assertEqual(302, follow_response.status_code)
+        self.assertEqual(302, mark_all_response.status_code)
+        self.assertFalse(Notification.objects.get(pk=notification.pk).unread)
+
+    def _create_notification(self, recipient, unread=True):
+        return Notification.objects.create(recipient=recipient, actor=self.company, verb='foo_verb', unread=unread)
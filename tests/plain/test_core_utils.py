@@ -1,6 +1,11 @@
 import unittest
 
-from apps.core.utils import split_value_among_segments
+from datetime import datetime
+
+from apps.core.utils import (
+    split_value_among_segments, split_period_by_months, lttb_downsample_indices, get_tile_mercator_bounds,
+    mercator_to_lng_lat, resolve_condition_notification, WEB_MERCATOR_HALF_SIZE,
+)
 
 
 def get_segment_value_setter(segment_values):
@@ -49,3 +54,119 @@ class FillStackedChartDatasetsTests(unittest.TestCase):
         # ASSERT
         self.assertEqual(5, segment_values[0])
         self.assertEqual(7, segment_values[1])
+
+
+class SplitPeriodByMonthsTests(unittest.TestCase):
+    def test_period_within_single_month(self):
+        # ARRANGE
+        period_start, period_end = datetime(2021, 3, 5, 10, 0, 0), datetime(2021, 3, 20, 18, 0, 0)
+        # ACT
+        chunks = split_period_by_months(period_start, period_end)
+        # ASSERT
+        self.assertEqual([(period_start, period_end)], chunks)
+
+    def test_period_across_year_boundary(self):
+        # ARRANGE
+        period_start, period_end = datetime(2020, 11, 15, 0, 0, 0), datetime(2021, 1, 10, 12, 0, 0)
+        # ACT
+        chunks = split_period_by_months(period_start, period_end)
+        # ASSERT
+        self.assertEqual([
+            (period_start, datetime(2020, 11, 30, 23, 59, 59, 999999)),
+            (datetime(2020, 12, 1, 0, 0, 0), datetime(2020, 12, 31, 23, 59, 59, 999999)),
+            (datetime(2021, 1, 1, 0, 0, 0), period_end),
+        ], chunks)
+
+    def test_empty_period(self):
+        # ACT
+        chunks = split_period_by_months(datetime(2021, 2, 1), datetime(2021, 1, 1))
+        # ASSERT
+        self.assertEqual([], chunks)
+
+
+class LttbDownsampleIndicesTests(unittest.TestCase):
+    def test_keeps_all_points_below_threshold(self):
+        # ACT
+        indices = lttb_downsample_indices([1, 2, 3], 10)
+        # ASSERT
+        self.assertEqual([0, 1, 2], list(indices))
+
+    def test_keeps_edges_and_peaks(self):
+        # ARRANGE
+        values = [10] * 1000
+        values[337] = 95
+        values[712] = None
+        # ACT
+        indices = list(lttb_downsample_indices(values, 50))
+        # ASSERT
+        self.assertEqual(50, len(indices))
+        self.assertEqual(0, indices[0])
+        self.assertEqual(999, indices[-1])
+        self.assertIn(337, indices)
+        self.assertIn(712, indices)
+        self.assertEqual(sorted(indices), indices)
+
+
+class TileBoundsTests(unittest.TestCase):
+    def test_root_tile_covers_whole_world(self):
+        # ACT
+        bounds = get_tile_mercator_bounds(0, 0, 0)
+        # ASSERT
+        self.assertEqual(
+            (-WEB_MERCATOR_HALF_SIZE, -WEB_MERCATOR_HALF_SIZE, WEB_MERCATOR_HALF_SIZE, WEB_MERCATOR_HALF_SIZE), bounds)
+
+    def test_tile_with_buffer(self):
+        # ACT
+        west, south, east, north = get_tile_mercator_bounds(1, 1, 0, buffer_ratio=0.5)
+        # ASSERT
+        self.assertAlmostEqual(-WEB_MERCATOR_HALF_SIZE / 2, west)
+        self.assertAlmostEqual(-WEB_MERCATOR_HALF_SIZE / 2, south)
+        self.assertAlmostEqual(WEB_MERCATOR_HALF_SIZE * 1.5, east)
+        self.assertAlmostEqual(WEB_MERCATOR_HALF_SIZE * 1.5, north)
+
+    def test_mercator_to_lng_lat(self):
+        # ACT
+        lng, lat = mercator_to_lng_lat(WEB_MERCATOR_HALF_SIZE, WEB_MERCATOR_HALF_SIZE)
+        # ASSERT
+        self.assertAlmostEqual(180, lng)
+        self.assertAlmostEqual(85.0511, lat, places=4)
+
+
+class ResolveConditionNotificationTests(unittest.TestCase):
+    def test_notifies_when_condition_gets_active(self):
+        # ACT
+        notify, state = resolve_condition_notification(None, 3, 100, 60)
+        # ASSERT
+        self.assertTrue(notify)
+        self.assertEqual([3, 100], state)
+
+    def test_clears_inactive_condition(self):
+        # ACT
+        notify, state = resolve_condition_notification([3, 100], None, 110, 60)
+        # ASSERT
+        self.assertFalse(notify)
+        self.assertIsNone(state)
+
+    def test_skips_condition_staying_active(self):
+        # ACT
+        notify, state = resolve_condition_notification([3, 100], 3, 110, 60)
+        # ASSERT
+        self.assertFalse(notify)
+        self.assertEqual([3, 100], state)
+
+    def test_notifies_on_escalation_and_renotify_interval(self):
+        # ACT
+        escalation_result = resolve_condition_notification([3, 100], 1, 110, 60)
+        renotify_result = resolve_condition_notification([3, 100], 3, 160, 60)
+        # ASSERT
+        self.assertEqual((True, [1, 110]), escalation_result)
+        self.assertEqual((True, [3, 160]), renotify_result)
+
+    def test_remembers_deescalation(self):
+        # ARRANGE
+        _, state = resolve_condition_notification([1, 100], 3, 110, 60)
+        # ACT
+        notify, state = resolve_condition_notification(state, 1, 120, 60)
+        # ASSERT
+        self.assertTrue(notify)
+        self.assertEqual([1, 120], state)
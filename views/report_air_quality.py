@@ -7,10 +7,11 @@ from django.shortcuts import render
 from apps.core.models import FeatureFlag
 from app.models import AirQuality
 from app.tables import AirQualityTable
+from apps.core.aggregates import annotate_time_buckets
 from .shared import (
     collect_common_request_context, underline_columns, filter_columns, BaseReportDatatableView,
     COMMON_STACKED_LINE_CHART_SETTINGS, calculate_line_chart_max_height, BaseChartView, check_report_access,
-    fill_stacked_chart_datasets,
+    fill_stacked_chart_datasets, downsample_chart_items,
 )
 
 
@@ -49,12 +50,12 @@ class AirQualityReportStackedChart(BaseChartView):
     def filter_queryset(self, qs):
         qs = super(AirQualityReportStackedChart, self).filter_queryset(qs)
 
-        qs = qs.extra({'day': "date_trunc('day', app_airquality.ctime)::date"})\
-            .values('day').order_by('day').annotate(air_quality_avg=Avg('air_quality_value'))
+        qs = annotate_time_buckets(qs, 'day', as_date=True, air_quality_avg=Avg('air_quality_value'))
 
         return qs
 
     def prepare_result_json(self, qs):
+        qs = downsample_chart_items(qs, 'air_quality_avg')
         json_data = {'chart': COMMON_STACKED_LINE_CHART_SETTINGS.copy()}
         y_max = 0
 
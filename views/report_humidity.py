@@ -6,9 +6,11 @@ from django.shortcuts import render
 
 from app.models import Humidity
 from app.tables import HumidityTable
+from apps.core.aggregates import annotate_time_buckets
 from .shared import (
     collect_common_request_context, underline_columns, filter_columns, BaseReportDatatableView,
     COMMON_LINE_CHART_SETTINGS, calculate_line_chart_max_height, BaseChartView, check_report_access,
+    downsample_chart_items,
 )
 
 
@@ -47,12 +49,12 @@ class HumidityReportStackedChart(BaseChartView):
     def filter_queryset(self, qs):
         qs = super(HumidityReportStackedChart, self).filter_queryset(qs)
 
-        qs = qs.extra({'day': "date_trunc('day', app_humidity.ctime)::date"})\
-            .values('day').order_by('day').annotate(humidity_avg=Avg('humidity_value'))
+        qs = annotate_time_buckets(qs, 'day', as_date=True, humidity_avg=Avg('humidity_value'))
 
         return qs
 
     def prepare_result_json(self, qs):
+        qs = downsample_chart_items(qs, 'humidity_avg')
         json_data = {'chart': COMMON_LINE_CHART_SETTINGS.copy()}
         y_max = 0
 
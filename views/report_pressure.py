@@ -7,9 +7,11 @@ from django.utils.translation import ugettext_lazy as _
 
 from app.models import Pressure
 from app.tables import PressureTable
+from apps.core.aggregates import annotate_time_buckets
 from .shared import (
     collect_common_request_context, underline_columns, filter_columns, BaseReportDatatableView,
     COMMON_LINE_CHART_SETTINGS, BaseChartView, check_report_access,
+    downsample_chart_items,
 )
 
 
@@ -50,12 +52,12 @@ class PressureReportStackedChart(BaseChartView):
     def filter_queryset(self, qs):
         qs = super(PressureReportStackedChart, self).filter_queryset(qs)
 
-        qs = qs.extra({'day': "date_trunc('day', app_pressure.ctime)::date"})\
-            .values('day').order_by('day').annotate(Pressure_avg=Avg('pressure_value'))
+        qs = annotate_time_buckets(qs, 'day', as_date=True, Pressure_avg=Avg('pressure_value'))
 
         return qs
 
     def prepare_result_json(self, qs):
+        qs = downsample_chart_items(qs, 'Pressure_avg')
         json_data = {'chart': COMMON_LINE_CHART_SETTINGS.copy()}
         json_data['chart'].update({
             "yAxisMaxValue": 780,
@@ -6,6 +6,7 @@ from apps.core.reports import filter_queryset_by_date_range  # noqa: F401
 from apps.core.reports import fill_stacked_chart_datasets  # noqa: F401
 from apps.core.reports import COMMON_STACKED_LINE_CHART_SETTINGS  # noqa: F401
 from apps.core.reports import calculate_line_chart_max_height  # noqa: F401
+from apps.core.reports import downsample_chart_items  # noqa: F401
 from apps.core.reports import default_render_column  # noqa: F401
 from apps.core.reports import TIMESINCE_STRINGS  # noqa: F401
 from apps.core.reports import filter_columns  # noqa: F401